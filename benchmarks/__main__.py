@@ -0,0 +1,99 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> __main__
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/20 3:40 下午
+@Desc   ：运行全部CPU基准 不需要网络和账号
+python -m benchmarks --save before.json
+python -m benchmarks --compare before.json --threshold 0.15
+==================================================
+"""
+import os
+import sys
+import json
+import subprocess
+import argparse
+import platform
+from typing import Dict
+from benchmarks import bench_auth, bench_requests, bench_parsing
+from benchmarks.common import measure
+
+# 与被测代码无关的固定负载 用于抵消不同机器(CI)之间的速度差异
+CALIBRATION = 'calibration'
+
+
+def _calibrate() -> float:
+    return measure(lambda: sum(range(10000)), 200, 15)
+
+
+def run_all(quick: bool = False) -> Dict[str, float]:
+    """返回 {场景: 每次调用的秒数} quick时减少次数 结果波动更大"""
+    scale = 5 if quick else 1
+    result = {CALIBRATION: _calibrate()}
+    for name, (_, after) in bench_auth.run(number=5000 // scale, repeat=15 // scale).items():
+        result[f'auth.{name}'] = 1 / after
+    result['auth.presign_many'] = 1 / bench_auth.run_presign(repeat=15 // scale)
+    for name, seconds in bench_requests.run(number=2000 // scale, repeat=7).items():
+        result[f'requests.{name}'] = seconds
+    for name, seconds in bench_parsing.run(number=20 // scale, repeat=7).items():
+        result[f'parsing.{name}'] = seconds
+    return result
+
+
+def compare(base: Dict[str, float], result: Dict[str, float], threshold: float) -> int:
+    """打印与基准结果的对比 返回变慢超过threshold的场景数
+    两次结果都有calibration时按其比例折算 比较的是相对于机器速度的耗时
+    """
+    speed = 1.0
+    if base.get(CALIBRATION) and result.get(CALIBRATION):
+        speed = result[CALIBRATION] / base[CALIBRATION]
+        print(f'本机相对基准的耗时比例 x{speed:.2f}')
+    regressions = 0
+    for name, seconds in result.items():
+        if name == CALIBRATION:
+            continue
+        before = base.get(name)
+        if before is None:
+            print(f'{name:<44} {seconds * 1e6:>10.1f}us  (new)')
+            continue
+        ratio = seconds / (before * speed)
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f'{name:<44} {before * 1e6:>10.1f}us -> {seconds * 1e6:>10.1f}us  '
+              f'x{ratio:.2f}{flag}')
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    parser.add_argument('--save', help='把结果写入json文件')
+    parser.add_argument('--compare', help='与之前保存的json结果比较')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='比较时变慢超过该比例视为退化 默认0.15')
+    parser.add_argument('--quick', action='store_true', help='减少次数 用于快速检查')
+    args = parser.parse_args(argv)
+
+    result = run_all(args.quick)
+    if args.save:
+        with open(args.save, 'w', encoding='utf8') as f:
+            json.dump({'python': platform.python_version(), 'results': result}, f, indent=1)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf8') as f:
+            base = json.load(f)
+        if base.get('python') != platform.python_version():
+            print(f'注意: 基准结果来自python {base.get("python")}')
+        return 1 if compare(base['results'], result, args.threshold) else 0
+    for name, seconds in result.items():
+        print(f'{name:<44} {seconds * 1e6:>10.1f}us')
+    return 0
+
+
+if __name__ == '__main__':
+    # 字符串hash随机化会改变dict和set的布局 同一代码的耗时可相差30%以上
+    if os.environ.get('PYTHONHASHSEED') != '0':
+        sys.exit(subprocess.call([sys.executable, '-m', 'benchmarks'] + sys.argv[1:],
+                                 env=dict(os.environ, PYTHONHASHSEED='0')))
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> bench_auth
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/5 2:10 下午
+@Desc   ：Auth签名速度 python -m benchmarks.bench_auth
+==================================================
+"""
+import hmac
+import base64
+import hashlib
+import timeit
+from datetime import datetime
+from httpx import Request
+from oss.auth import Auth
+
+LEGACY_SUB_RESOURCE = tuple(sorted(Auth.SubResource))
+
+
+def legacy_signature(auth: Auth, request: Request, *, bucket: str = None) -> None:
+    """优化前的签名实现 仅用于对比"""
+    ct_type = request.headers.get('content-type', '')
+    ct_md5 = request.headers.get('content-md5', '')
+    oss_headers = {}
+    for key in sorted(request.headers.keys()):
+        if key.startswith('x-oss-'):
+            oss_headers[key] = request.headers.get(key)
+    oss_headers = '\n'.join(f'{k.strip()}:{v.strip()}' for k, v in oss_headers.items())
+    if oss_headers:
+        oss_headers += '\n'
+    date = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
+    path = f'{request.url.path}?'
+    _query = {}
+    for query in request.url.query.decode("utf8").split('&'):
+        if '=' not in query:
+            if query in LEGACY_SUB_RESOURCE:
+                path += query
+            continue
+        k, v = query.split('=', 1)
+        if k in LEGACY_SUB_RESOURCE:
+            _query[k] = v
+    bucket = bucket if bucket else auth.bucket
+    path += '&'.join([f'{k}={v}' for k, v in _query.items()])
+    path = path.strip('?')
+    sign = hmac.new(
+        bytes(auth.accessKeySecret, 'utf8'),
+        bytes(f'{request.method}\n{ct_md5}\n{ct_type}\n{date}\n{oss_headers}/{bucket}{path}', 'utf8'),
+        hashlib.sha1
+    )
+    sign = base64.b64encode(sign.digest()).decode('utf8')
+    request.headers['Authorization'] = f'OSS {auth.accessKeyId}:{sign}'
+    request.headers['Date'] = date
+
+
+REQUESTS = {
+    'get': Request('GET', 'https://bucket.oss-cn-hangzhou.aliyuncs.com/dir/file.txt'),
+    'put_headers': Request('PUT', 'https://bucket.oss-cn-hangzhou.aliyuncs.com/dir/file.txt',
+                           headers={'Content-Type': 'text/plain', 'x-oss-object-acl': 'private',
+                                    'x-oss-meta-author': 'sw', 'x-oss-storage-class': 'IA'}),
+    'upload_part': Request('PUT', 'https://bucket.oss-cn-hangzhou.aliyuncs.com/big.bin'
+                                  '?partNumber=12&uploadId=0004B9895DBBB6EC98E36'),
+}
+
+
+def run(number: int = 5000, repeat: int = 15) -> dict:
+    """返回 {场景: (优化前每秒签名数, 优化后每秒签名数)}"""
+    auth = Auth('AccessKeyId', 'AccessKeySecret', 'bucket', 'oss-cn-hangzhou.aliyuncs.com')
+    result = {}
+    for name, request in REQUESTS.items():
+        before = min(timeit.repeat(lambda: legacy_signature(auth, request),
+                                   number=number, repeat=repeat))
+        after = min(timeit.repeat(lambda: auth.signature(request),
+                                  number=number, repeat=repeat))
+        result[name] = (number / before, number / after)
+    return result
+
+
+def run_presign(count: int = 10000, repeat: int = 15) -> float:
+    """返回presign_many每秒生成的URL数"""
+    auth = Auth('AccessKeyId', 'AccessKeySecret', 'bucket', 'oss-cn-hangzhou.aliyuncs.com')
+    keys = [f'images/2021/{i:06d}.jpg' for i in range(count)]
+    params = {'x-oss-process': 'image/resize,w_200'}
+    cost = min(timeit.repeat(lambda: auth.presign_many(keys, params=params),
+                             number=1, repeat=repeat))
+    return count / cost
+
+
+if __name__ == '__main__':
+    for name, (before, after) in run().items():
+        print(f'{name:<12} before {before:>10,.0f}/s  after {after:>10,.0f}/s  x{after / before:.2f}')
+    print(f'{"presign":<12} {run_presign():>10,.0f} urls/s')
@@ -0,0 +1,192 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> bench_e2e
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/22 4:30 下午
+@Desc   ：使用oss.emulator的端到端吞吐和尾延迟测试 经过完整的Session、重试和httpx客户端
+python -m benchmarks.bench_e2e --latency 0.02 --jitter 0.005 --bandwidth 50 --throttle-rate 0.01
+耗时包含模拟的网络延迟 与机器相关 不参与python -m benchmarks的回归比较
+==================================================
+"""
+import os
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from oss.bucket import Bucket, AsyncBucket
+from oss.emulator import Emulator
+from oss.metrics import MetricsAggregator
+from oss.object import ObjectClient, ObjectAsyncClient
+from oss.retry import RetryPolicy
+from oss.session import Session, AsyncSession
+from benchmarks.common import ENDPOINT, make_auth
+
+MB = 1024 * 1024
+# 场景 -> 统计延迟使用的操作名
+OPERATIONS = {'put': 'PutObject', 'get': 'GetObject', 'list': 'ListObjects',
+              'multipart': 'UploadPart'}
+
+
+def make_emulator(args: argparse.Namespace) -> Emulator:
+    auth = make_auth()
+    return Emulator({auth.accessKeyId: auth.accessKeySecret}, endpoint=ENDPOINT,
+                    latency=args.latency, jitter=args.jitter,
+                    bandwidth=args.bandwidth * MB if args.bandwidth else None,
+                    error_rate=args.error_rate, throttle_rate=args.throttle_rate, seed=args.seed)
+
+
+def _row(client: str, scenario: str, seconds: float, items: int, size: int,
+         metrics: MetricsAggregator) -> Dict[str, object]:
+    """一个场景的结果 items为完成的文件数(list为列出的文件数) size为传输的字节数"""
+    summary = metrics.summary()
+    latency = summary.get(OPERATIONS[scenario], {}).get('latency', {})
+    return {'client': client, 'scenario': scenario, 'items': items, 'seconds': seconds,
+            'items_per_s': items / seconds if seconds else 0.0,
+            'mb_per_s': size / MB / seconds if seconds else 0.0,
+            'requests': sum(s['count'] for s in summary.values()),
+            'retries': sum(s['retries'] for s in summary.values()),
+            'errors': sum(s['errors'] for s in summary.values()),
+            'p50': latency.get('p50', 0.0), 'p99': latency.get('p99', 0.0),
+            'max': latency.get('max', 0.0)}
+
+
+def run_sync(args: argparse.Namespace, path: str) -> List[Dict[str, object]]:
+    """同步客户端 并发通过线程池实现"""
+    metrics = MetricsAggregator()
+    auth = make_auth()
+    data = os.urandom(args.size)
+    keys = [f'bench/{i:06d}' for i in range(args.count)]
+    rows = []
+    with Session(transport=make_emulator(args), hooks=[metrics], retry=RetryPolicy(),
+                 max_connections=args.concurrency) as session:
+        client = ObjectClient(auth, session)
+        bucket = Bucket(auth, session)
+
+        def timed(scenario: str, func, items: int, size: int):
+            metrics.reset()
+            start = time.perf_counter()
+            func()
+            rows.append(_row('sync', scenario, time.perf_counter() - start, items, size, metrics))
+
+        def each(func):
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                for resp in pool.map(func, keys):
+                    resp.raise_for_status()
+
+        def upload():
+            for i in range(args.multipart_count):
+                client.upload_file(f'multipart/{i}', path, part_size=args.part_size * MB,
+                                   concurrency=args.concurrency).raise_for_status()
+
+        timed('put', lambda: each(lambda key: client.put_object(key, data)),
+              args.count, args.count * args.size)
+        timed('get', lambda: each(client.get_object), args.count, args.count * args.size)
+        timed('list', lambda: sum(1 for _ in bucket.iter_objects(
+            prefix='bench/', page_size=args.page_size)), args.count, 0)
+        timed('multipart', upload, args.multipart_count,
+              args.multipart_count * os.path.getsize(path))
+    return rows
+
+
+async def run_async(args: argparse.Namespace, path: str) -> List[Dict[str, object]]:
+    """异步客户端 并发数由信号量限制"""
+    metrics = MetricsAggregator()
+    auth = make_auth()
+    data = os.urandom(args.size)
+    keys = [f'bench/{i:06d}' for i in range(args.count)]
+    rows = []
+    session = AsyncSession(transport=make_emulator(args), hooks=[metrics], retry=RetryPolicy(),
+                           max_connections=args.concurrency)
+    client = ObjectAsyncClient(auth, session)
+    bucket = AsyncBucket(auth, session)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def timed(scenario: str, coro, items: int, size: int):
+        metrics.reset()
+        start = time.perf_counter()
+        await coro
+        rows.append(_row('async', scenario, time.perf_counter() - start, items, size, metrics))
+
+    async def limited(func, key: str):
+        async with semaphore:
+            (await func(key)).raise_for_status()
+
+    async def each(func):
+        await asyncio.gather(*(limited(func, key) for key in keys))
+
+    async def listing():
+        async for _ in bucket.iter_objects(prefix='bench/', page_size=args.page_size):
+            pass
+
+    async def upload():
+        for i in range(args.multipart_count):
+            resp = await client.upload_file(f'multipart/{i}', path, part_size=args.part_size * MB,
+                                            concurrency=args.concurrency)
+            resp.raise_for_status()
+
+    try:
+        await timed('put', each(lambda key: client.put_object(key, data)),
+                    args.count, args.count * args.size)
+        await timed('get', each(client.get_object), args.count, args.count * args.size)
+        await timed('list', listing(), args.count, 0)
+        await timed('multipart', upload(), args.multipart_count,
+                    args.multipart_count * os.path.getsize(path))
+    finally:
+        await session.aclose()
+    return rows
+
+
+def report(rows: List[Dict[str, object]]) -> str:
+    lines = [f'{"client":<7}{"scenario":<11}{"items":>7}{"seconds":>9}{"items/s":>10}'
+             f'{"MB/s":>9}{"reqs":>7}{"retries":>9}{"errors":>8}'
+             f'{"p50 ms":>9}{"p99 ms":>9}{"max ms":>9}']
+    for row in rows:
+        lines.append(f'{row["client"]:<7}{row["scenario"]:<11}{row["items"]:>7}'
+                     f'{row["seconds"]:>9.2f}{row["items_per_s"]:>10.1f}{row["mb_per_s"]:>9.1f}'
+                     f'{row["requests"]:>7}{row["retries"]:>9}{row["errors"]:>8}'
+                     f'{row["p50"] * 1000:>9.1f}{row["p99"] * 1000:>9.1f}'
+                     f'{row["max"] * 1000:>9.1f}')
+    return '\n'.join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.bench_e2e')
+    parser.add_argument('--client', choices=('sync', 'async', 'both'), default='both')
+    parser.add_argument('--count', type=int, default=500, help='put/get的文件数')
+    parser.add_argument('--size', type=int, default=64 * 1024, help='put/get的文件字节数')
+    parser.add_argument('--page-size', type=int, default=100, help='list每页的文件数')
+    parser.add_argument('--multipart-size', type=int, default=32, help='分片上传的文件MB')
+    parser.add_argument('--multipart-count', type=int, default=2, help='分片上传的文件数')
+    parser.add_argument('--part-size', type=int, default=4, help='分片MB')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.01, help='每个请求的固定延迟秒数')
+    parser.add_argument('--jitter', type=float, default=0.0, help='指数分布随机延迟的均值秒数')
+    parser.add_argument('--bandwidth', type=float, default=None, help='单个请求的带宽上限MB/s')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='500的概率')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='503限流的概率')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='把结果写入json文件')
+    args = parser.parse_args(argv)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'multipart.bin')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(args.multipart_size * MB))
+        if args.client in ('sync', 'both'):
+            rows.extend(run_sync(args, path))
+        if args.client in ('async', 'both'):
+            rows.extend(asyncio.run(run_async(args, path)))
+    print(report(rows))
+    if args.json:
+        with open(args.json, 'w', encoding='utf8') as f:
+            json.dump({'args': vars(args), 'results': rows}, f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,116 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> bench_parsing
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/20 2:20 下午
+@Desc   ：响应解析的开销 python -m benchmarks.bench_parsing
+==================================================
+"""
+import zlib
+import struct
+from typing import Dict
+from urllib.parse import quote
+from xml.etree import ElementTree
+from oss.models import (parse_list_objects, ListObjectsParser, parse_list_buckets,
+                        parse_bucket_info, parse_error, parse_upload_id)
+from oss.select import SelectStream, DATA_FRAME, END_FRAME
+from benchmarks.common import measure
+
+LIST_OBJECTS = (
+    '<?xml version="1.0" encoding="UTF-8"?><ListBucketResult><Name>bucket</Name>'
+    '<Prefix>dir/</Prefix><Marker></Marker><MaxKeys>1000</MaxKeys><Delimiter></Delimiter>'
+    '<EncodingType>url</EncodingType><IsTruncated>true</IsTruncated>'
+    '<NextMarker>dir%2Fsub%2Ffile-000999.txt</NextMarker>'
+    + ''.join(f'<Contents><Key>{quote(f"dir/sub/file-{i:06d}.txt")}</Key>'
+              '<LastModified>2021-02-13T06:40:00.000Z</LastModified>'
+              '<ETag>"5B3C1A2E053D763E1B002CC607C5A0FE"</ETag><Type>Normal</Type>'
+              f'<Size>{i * 37}</Size><StorageClass>Standard</StorageClass>'
+              '<Owner><ID>00220120222</ID><DisplayName>sw</DisplayName></Owner></Contents>'
+              for i in range(1000))
+    + '</ListBucketResult>').encode()
+LIST_BUCKETS = (
+    '<?xml version="1.0" encoding="UTF-8"?><ListAllMyBucketsResult>'
+    '<Owner><ID>512</ID><DisplayName>sw</DisplayName></Owner><Buckets>'
+    + ''.join(f'<Bucket><CreationDate>2021-01-21T02:00:00.000Z</CreationDate>'
+              f'<ExtranetEndpoint>oss-cn-hangzhou.aliyuncs.com</ExtranetEndpoint>'
+              f'<IntranetEndpoint>oss-cn-hangzhou-internal.aliyuncs.com</IntranetEndpoint>'
+              f'<Location>oss-cn-hangzhou</Location><Name>app-{i:03d}</Name>'
+              f'<Region>cn-hangzhou</Region><StorageClass>Standard</StorageClass></Bucket>'
+              for i in range(100))
+    + '</Buckets></ListAllMyBucketsResult>').encode()
+BUCKET_INFO = (
+    b'<?xml version="1.0" encoding="UTF-8"?><BucketInfo><Bucket>'
+    b'<CreationDate>2021-01-21T02:00:00.000Z</CreationDate>'
+    b'<ExtranetEndpoint>oss-cn-hangzhou.aliyuncs.com</ExtranetEndpoint>'
+    b'<Location>oss-cn-hangzhou</Location><Name>app-1</Name><StorageClass>Standard'
+    b'</StorageClass><Owner><DisplayName>sw</DisplayName><ID>512</ID></Owner>'
+    b'<AccessControlList><Grant>private</Grant></AccessControlList>'
+    b'<DataRedundancyType>LRS</DataRedundancyType></Bucket></BucketInfo>')
+ERROR = (b'<?xml version="1.0" encoding="UTF-8"?><Error><Code>NoSuchKey</Code>'
+         b'<Message>The specified key does not exist.</Message>'
+         b'<RequestId>5C3D9175B6FC201293AD4890</RequestId>'
+         b'<HostId>bucket.oss-cn-hangzhou.aliyuncs.com</HostId></Error>')
+INITIATE = (b'<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult>'
+            b'<Bucket>bucket</Bucket><Key>big.bin</Key>'
+            b'<UploadId>0004B9895DBBB6EC98E36</UploadId></InitiateMultipartUploadResult>')
+
+
+def _frame(type_: int, payload: bytes) -> bytes:
+    return (struct.pack('>II4x', (1 << 24) | type_, len(payload)) + payload +
+            struct.pack('>I', zlib.crc32(payload)))
+
+
+# 1MB的SelectObject结果 每帧64条记录
+_RECORDS = b''.join(b'%d,user-%06d,2021-02-13,%d\n' % (i, i, i * 7) for i in range(64))
+SELECT_BODY = b''.join(_frame(DATA_FRAME, struct.pack('>Q', i) + _RECORDS)
+                       for i in range((1 << 20) // len(_RECORDS)))
+SELECT_BODY += _frame(END_FRAME, struct.pack('>QQI', 1 << 20, 1 << 20, 200))
+CHUNK = 64 * 1024
+
+
+def _dom_dict(content: bytes):
+    """常见的写法 完整的DOM树再逐个转为dict 作为对比"""
+    root = ElementTree.fromstring(content)
+    return [{child.tag: child.text for child in node} for node in root.iterfind('Contents')]
+
+
+def _pull_list_objects():
+    parser = ListObjectsParser()
+    for i in range(0, len(LIST_OBJECTS), CHUNK):
+        parser.feed(LIST_OBJECTS[i:i + CHUNK])
+    return parser.close()
+
+
+def _select(delimiter: bytes = None):
+    stream = SelectStream(delimiter)
+    for i in range(0, len(SELECT_BODY), CHUNK):
+        stream.feed(SELECT_BODY[i:i + CHUNK])
+    return stream.close()
+
+
+CASES = {
+    'list_objects_1000.dom_dict': lambda: _dom_dict(LIST_OBJECTS),
+    'list_objects_1000.dom': lambda: parse_list_objects(LIST_OBJECTS),
+    'list_objects_1000.pull': _pull_list_objects,
+    'list_buckets_100': lambda: parse_list_buckets(LIST_BUCKETS),
+    'bucket_info': lambda: parse_bucket_info(BUCKET_INFO),
+    'error': lambda: parse_error(ERROR, 404),
+    'upload_id': lambda: parse_upload_id(INITIATE),
+    'select_1mb.frames': _select,
+    'select_1mb.records': lambda: _select(b'\n'),
+}
+
+
+def run(number: int = 20, repeat: int = 7) -> Dict[str, float]:
+    """返回 {场景: 每次解析的秒数} 小文档按比例增加次数"""
+    result = {}
+    for name, case in CASES.items():
+        scale = 1 if name.startswith(('list_objects', 'select')) else 100
+        result[name] = measure(case, number * scale, repeat)
+    return result
+
+
+if __name__ == '__main__':
+    for name, seconds in run().items():
+        print(f'{name:<30} {seconds * 1e6:>10.1f}us')
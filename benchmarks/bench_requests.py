@@ -0,0 +1,73 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> bench_requests
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/20 11:00 上午
+@Desc   ：各客户端方法构建请求的开销 python -m benchmarks.bench_requests
+==================================================
+"""
+import httpx
+from typing import Dict
+from oss.bucket import Bucket, AsyncBucket
+from oss.object import ObjectClient, ObjectAsyncClient
+from benchmarks.common import (make_auth, CannedSession, AsyncCannedSession,
+                               measure, measure_async)
+
+DATA = b'x' * 1024
+KEYS = [f'logs/2021/02/{i:04d}.log' for i in range(100)]
+PARTS = [(i, f'"{i:032X}"') for i in range(1, 101)]
+INITIATE = (b'<InitiateMultipartUploadResult><Bucket>bucket</Bucket><Key>big.bin</Key>'
+            b'<UploadId>0004B9895DBBB6EC98E36</UploadId></InitiateMultipartUploadResult>')
+
+
+def respond(request: httpx.Request) -> httpx.Response:
+    if request.method == 'POST' and 'uploads' in request.url.params:
+        return httpx.Response(200, content=INITIATE, request=request)
+    return httpx.Response(200, headers={'ETag': '"5B3C1A2E053D763E1B002CC607C5A0FE"'},
+                          request=request)
+
+
+# 同步和异步客户端共用 异步客户端返回coroutine
+CASES = {
+    'get_object': lambda c, b: c.get_object('dir/file.txt'),
+    'get_object_range': lambda c, b: c.get_object('dir/file.txt', 'bytes=0-1023'),
+    'head_object': lambda c, b: c.head_object('dir/file.txt'),
+    'put_object': lambda c, b: c.put_object('dir/file.txt', DATA),
+    'copy_object': lambda c, b: c.copy_object('/bucket/dir/src.txt', 'dir/dst.txt'),
+    'append_object': lambda c, b: c.append_object('dir/app.log', DATA, 1024),
+    'delete_object': lambda c, b: c.delete_object('dir/file.txt'),
+    'put_object_acl': lambda c, b: c.put_object_acl('dir/file.txt', 'private'),
+    'initiate_multipart': lambda c, b: c._initiate_multipart_upload('big.bin'),
+    'upload_part': lambda c, b: c.upload_part('big.bin', '0004B9895DBBB6EC98E36', 3, DATA),
+    'complete_multipart_100': lambda c, b: c.complete_multipart_upload(
+        'big.bin', '0004B9895DBBB6EC98E36', PARTS),
+    'delete_objects_100': lambda c, b: c.delete_objects(KEYS),
+    'get_bucket': lambda c, b: b.get_bucket(prefix='logs/', max_count=100, delimiter='/'),
+    'get_bucket_info': lambda c, b: b.get_bucket_info(),
+    'get_bucket_acl': lambda c, b: b.get_bucket_acl(),
+}
+
+
+def run(number: int = 2000, repeat: int = 7) -> Dict[str, float]:
+    """返回 {场景: 每次调用的秒数} 场景名前缀sync/async区分客户端"""
+    auth = make_auth()
+    session = CannedSession(respond)
+    client, bucket = ObjectClient(auth, session, verify=False), Bucket(auth, session)
+    async_session = AsyncCannedSession(respond)
+    async_client = ObjectAsyncClient(auth, async_session, verify=False)
+    async_bucket = AsyncBucket(auth, async_session)
+    result = {}
+    for name, case in CASES.items():
+        result[f'sync.{name}'] = measure(lambda: case(client, bucket), number, repeat)
+        result[f'async.{name}'] = measure_async(lambda: case(async_client, async_bucket),
+                                                number, repeat)
+    return result
+
+
+if __name__ == '__main__':
+    result = run()
+    for name in CASES:
+        sync, async_ = result[f'sync.{name}'], result[f'async.{name}']
+        print(f'{name:<24} sync {sync * 1e6:>8.1f}us  async {async_ * 1e6:>8.1f}us  '
+              f'x{async_ / sync:.2f}')
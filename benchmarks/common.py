@@ -0,0 +1,73 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> common
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/20 10:10 上午
+@Desc   ：基准测试的公共部分 预设响应的Session和计时
+==================================================
+"""
+import gc
+import time
+import timeit
+import asyncio
+import httpx
+from typing import Callable, Awaitable
+from oss.auth import Auth
+from oss.session import Session, AsyncSession
+
+ENDPOINT = 'oss-cn-hangzhou.aliyuncs.com'
+
+
+def make_auth() -> Auth:
+    return Auth('AccessKeyId', 'AccessKeySecret', 'bucket', ENDPOINT)
+
+
+class CannedSession(Session):
+    """不经过网络和httpx传输层 签名后直接返回responder生成的响应
+    只测量客户端方法本身构建请求、签名和处理响应的开销
+    """
+
+    def __init__(self, responder: Callable[[httpx.Request], httpx.Response]):
+        super().__init__(retry=None)
+        self.responder = responder
+
+    def send(self, auth: Auth, request: httpx.Request, *, bucket: str = None,
+             stream: bool = False, idempotent: bool = None) -> httpx.Response:
+        auth.signature(request, bucket=bucket)
+        return self.responder(request)
+
+
+class AsyncCannedSession(AsyncSession):
+    def __init__(self, responder: Callable[[httpx.Request], httpx.Response]):
+        super().__init__(retry=None)
+        self.responder = responder
+
+    async def send(self, auth: Auth, request: httpx.Request, *, bucket: str = None,
+                   stream: bool = False, idempotent: bool = None) -> httpx.Response:
+        auth.signature(request, bucket=bucket)
+        return self.responder(request)
+
+
+def measure(func: Callable[[], object], number: int, repeat: int) -> float:
+    """返回每次调用的秒数 取repeat轮中最快的一轮 减少其他进程的干扰"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def measure_async(func: Callable[[], Awaitable], number: int, repeat: int) -> float:
+    """同measure 在同一个事件循环中连续await 计时期间关闭gc"""
+    async def run_once() -> float:
+        start = time.perf_counter()
+        for _ in range(number):
+            await func()
+        return time.perf_counter() - start
+
+    loop = asyncio.new_event_loop()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return min(loop.run_until_complete(run_once()) for _ in range(repeat)) / number
+    finally:
+        if enabled:
+            gc.enable()
+        loop.close()
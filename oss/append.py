@@ -0,0 +1,209 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> append
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/11 10:30 上午
+@Desc   ：基于append_object的缓冲写入
+==================================================
+"""
+import time
+import asyncio
+from typing import Optional
+from httpx import Response
+from oss.crc import crc64
+from oss.object import ObjectClient, ObjectAsyncClient
+
+
+class AppendConflictError(IOError):
+    """追加位置冲突且无法确定缓冲的数据是否已经写入 通常是其他客户端同时在追加"""
+
+    def __init__(self, target: str, position: int, length: int):
+        super().__init__(f'{target} 期望长度{position} 实际长度{length}')
+        self.target = target
+        self.position = position
+        self.length = length
+
+
+class AppendWriter:
+    """把多次小的写入合并为一次append_object请求的类文件对象
+    缓冲数据达到buffer_size或最早一次写入超过max_delay秒时发送
+    同步版本只在write时检查max_delay 没有新的写入时数据会一直留在缓冲中 需要调用flush或close
+    异步版本由后台定时发送 定时发送的异常在下一次write/flush/close时抛出
+    位置冲突(409)时根据文件当前长度和CRC64判断 只在确定未写入时重新追加 避免重复写入
+    with AppendWriter(client, 'logs/app.log') as f:
+        f.write(b'line\\n')
+    """
+
+    def __init__(self, client: ObjectClient, target: str, position: int = None,
+                 buffer_size: int = 1024 * 1024, max_delay: float = 1.0, **kwargs):
+        """
+        :param client: ObjectClient或ObjectAsyncClient
+        :param target: OSS文件路径 必须是Appendable Object或不存在
+        :param position: 追加的起始位置 不指定时首次发送前通过head_object获取
+        :param buffer_size: 缓冲的最大字节数
+        :param max_delay: 缓冲数据最长等待秒数
+        :param kwargs: 传给append_object的其他参数
+        """
+        self.client = client
+        self.target = target
+        self.position = position
+        self.buffer_size = buffer_size
+        self.max_delay = max_delay
+        self.kwargs = kwargs
+        self.requests = 0
+        self.closed = False
+        self._buffer = bytearray()
+        self._first_write = None
+        self._crc = 0 if position == 0 else None
+
+    def _buffered(self, data: bytes) -> bool:
+        """写入缓冲 返回是否需要发送"""
+        if self.closed:
+            raise ValueError('I/O operation on closed AppendWriter')
+        if not self._buffer:
+            self._first_write = time.monotonic()
+        self._buffer += data
+        return self._expired()
+
+    def _expired(self) -> bool:
+        return bool(self._buffer) and (
+            len(self._buffer) >= self.buffer_size
+            or time.monotonic() - self._first_write >= self.max_delay)
+
+    @staticmethod
+    def _length(resp: Response) -> int:
+        if resp.status_code == 404:
+            return 0
+        resp.raise_for_status()
+        return int(resp.headers['Content-Length'])
+
+    def _start(self, head: Response) -> None:
+        """首次发送前由head_object确定起始位置和已有内容的CRC64"""
+        self.position = self._length(head)
+        crc = head.headers.get('x-oss-hash-crc64ecma')
+        self._crc = 0 if self.position == 0 else (int(crc) if crc is not None else None)
+
+    def _advance(self, position: int, crc: Optional[str], size: int) -> None:
+        self.position = position
+        self._crc = int(crc) if crc is not None else None
+        del self._buffer[:size]
+        self._first_write = time.monotonic() if self._buffer else None
+
+    def _appended(self, resp: Response, size: int) -> None:
+        resp.raise_for_status()
+        self.requests += 1
+        self._advance(int(resp.headers['x-oss-next-append-position']),
+                      resp.headers.get('x-oss-hash-crc64ecma'), size)
+
+    def _written(self, head: Response, data: bytes) -> bool:
+        """位置冲突后判断data是否已经写入
+        长度等于position时未写入 返回False 重新追加
+        长度等于position+len(data)且CRC64一致时视为之前的请求已成功 返回True
+        其他情况抛出AppendConflictError
+        """
+        length = self._length(head)
+        if length == self.position:
+            return False
+        crc = head.headers.get('x-oss-hash-crc64ecma')
+        if length == self.position + len(data) and (
+                crc is None or self._crc is None or int(crc) == crc64(data, self._crc)):
+            self._advance(length, crc, len(data))
+            return True
+        raise AppendConflictError(self.target, self.position, length)
+
+    def write(self, data: bytes) -> int:
+        if self._buffered(data):
+            self.flush()
+        return len(data)
+
+    def flush(self) -> None:
+        """发送缓冲的数据"""
+        if not self._buffer:
+            return
+        data = bytes(self._buffer)
+        if self.position is None:
+            self._start(self.client.head_object(self.target))
+        resp = self.client.append_object(self.target, data, self.position, **self.kwargs)
+        if resp.status_code == 409:
+            if self._written(self.client.head_object(self.target), data):
+                return
+            resp = self.client.append_object(self.target, data, self.position, **self.kwargs)
+        self._appended(resp, len(data))
+
+    def close(self) -> None:
+        if not self.closed:
+            self.flush()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncAppendWriter(AppendWriter):
+    """AppendWriter的异步版本 write/flush/close均需await"""
+
+    def __init__(self, client: ObjectAsyncClient, target: str, position: int = None,
+                 buffer_size: int = 1024 * 1024, max_delay: float = 1.0, **kwargs):
+        super().__init__(client, target, position, buffer_size, max_delay, **kwargs)
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._error = None
+
+    def _raise_pending(self) -> None:
+        """抛出后台定时发送时的异常"""
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
+
+    async def write(self, data: bytes) -> int:
+        self._raise_pending()
+        if self._buffered(data):
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.ensure_future(self._flush_later())
+        return len(data)
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(self.max_delay)
+            self._timer = None
+            await self.flush()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self._error = e
+
+    async def flush(self) -> None:
+        self._raise_pending()
+        async with self._lock:
+            if not self._buffer:
+                return
+            data = bytes(self._buffer)
+            if self.position is None:
+                self._start(await self.client.head_object(self.target))
+            resp = await self.client.append_object(self.target, data, self.position, **self.kwargs)
+            if resp.status_code == 409:
+                if self._written(await self.client.head_object(self.target), data):
+                    return
+                resp = await self.client.append_object(self.target, data, self.position,
+                                                       **self.kwargs)
+            self._appended(resp, len(data))
+
+    async def close(self) -> None:
+        if self.closed:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        self.closed = True
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
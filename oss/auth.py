@@ -10,23 +10,29 @@ https://help.aliyun.com/document_detail/31950.html
 """
 
 import hmac
+import time
 import base64
 import hashlib
-from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List
+from urllib.parse import quote, unquote, urlencode
+from email.utils import formatdate
+from binascii import b2a_base64
 from httpx import Request
 
 
 class Auth:
-    SubResource = ('acl', 'uploads', 'location', 'cors', 'logging', 'website',
-                   'referer', 'lifecycle', 'delete', 'append', 'tagging',
-                   'objectMeta', 'uploadId', 'partNumber', 'security-token',
-                   'position', 'img', 'style', 'styleName', 'replication',
-                   'replicationProgress', 'replicationLocation', 'cname',
-                   'bucketInfo', 'comp', 'qos', 'live', 'status', 'vod',
-                   'startTime', 'endTime', 'symlink', 'x-oss-process',
-                   'response-content-type', 'response-content-language',
-                   'response-expires', 'response-cache-control',
-                   'response-content-disposition', 'response-content-encoding')
+    SubResource = frozenset((
+        'acl', 'uploads', 'location', 'cors', 'logging', 'website',
+        'referer', 'lifecycle', 'delete', 'append', 'tagging',
+        'objectMeta', 'uploadId', 'partNumber', 'security-token',
+        'position', 'img', 'style', 'styleName', 'replication',
+        'replicationProgress', 'replicationLocation', 'cname',
+        'bucketInfo', 'comp', 'qos', 'live', 'status', 'vod',
+        'startTime', 'endTime', 'symlink', 'x-oss-process',
+        'response-content-type', 'response-content-language',
+        'response-expires', 'response-cache-control',
+        'response-content-disposition', 'response-content-encoding'))
 
     def __init__(self, accessKeyId: str, accessKeySecret: str,
                  bucket: str, endpoint: str):
@@ -34,40 +40,132 @@ class Auth:
         self.accessKeySecret = accessKeySecret
         self.bucket = bucket
         self.endpoint = endpoint
+        self._hmac = None
+        self._hmac_secret = None
+        self._date = (0, '')
+
+    def _keyed_hmac(self) -> hmac.HMAC:
+        """已设置密钥的HMAC-SHA1 签名时复制其内部状态而不是重新计算密钥"""
+        if self._hmac_secret is not self.accessKeySecret:
+            self._hmac = hmac.new(bytes(self.accessKeySecret, 'utf8'), digestmod=hashlib.sha1)
+            self._hmac_secret = self.accessKeySecret
+        return self._hmac
+
+    def _sign(self, message: bytes) -> str:
+        h = self._keyed_hmac().copy()
+        h.update(message)
+        return base64.b64encode(h.digest()).decode('utf8')
+
+    def _gmt_date(self) -> str:
+        """当前GMT时间 同一秒内复用已格式化的字符串"""
+        now = int(time.time())
+        cached = self._date
+        if cached[0] != now:
+            cached = self._date = (now, formatdate(now, usegmt=True))
+        return cached[1]
+
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def canonical_query(query: str) -> str:
+        """从查询字符串中提取需要签名的子资源 按名称排序后以&连接"""
+        if not query:
+            return ''
+        resources = []
+        for item in query.split('&'):
+            k, _, v = item.partition('=')
+            if k in Auth.SubResource:
+                resources.append((k, unquote(v)) if v else (k, ''))
+        if not resources:
+            return ''
+        resources.sort()
+        return '?' + '&'.join(f'{k}={v}' if v else k for k, v in resources)
+
+    @classmethod
+    def canonical_params(cls, params: Dict[str, str] = None) -> str:
+        """从未编码的参数字典中提取需要签名的子资源"""
+        if not params:
+            return ''
+        resources = sorted((k, str(v) if v is not None else '')
+                           for k, v in params.items() if k in cls.SubResource)
+        if not resources:
+            return ''
+        return '?' + '&'.join(f'{k}={v}' if v else k for k, v in resources)
+
+    def presign(self, method: str, key: str, expires: int = 3600,
+                params: Dict[str, str] = None, *, bucket: str = None) -> str:
+        """生成在URL中包含签名的访问地址 阿里云文档时间 2020-09-17 10:11
+        https://help.aliyun.com/document_detail/31952.html
+        :param method: 请求方法 如GET PUT
+        :param key: 文件路径
+        :param expires: 从当前起的有效秒数
+        :param params: 其他查询参数 如x-oss-process、response-content-type、security-token
+        :param bucket: 指定bucket
+        :return:
+        """
+        return self.presign_many([key], method, expires, params, bucket=bucket)[0]
+
+    def presign_many(self, keys: Iterable[str], method: str = 'GET', expires: int = 3600,
+                     params: Dict[str, str] = None, *, bucket: str = None) -> List[str]:
+        """批量生成签名URL 所有URL共用过期时间 查询参数只编码一次
+        :param keys: 文件路径
+        :param method: 请求方法
+        :param expires: 从当前起的有效秒数
+        :param params: 其他查询参数
+        :param bucket: 指定bucket
+        :return: 与keys顺序一致的URL列表
+        """
+        bucket = bucket if bucket else self.bucket
+        expires_at = int(time.time()) + expires
+        prefix = f'{method}\n\n\n{expires_at}\n/{bucket}/'
+        resource = self.canonical_params(params)
+        host = f'https://{bucket}.{self.endpoint}/'
+        query = f'?OSSAccessKeyId={quote(self.accessKeyId, safe="")}&Expires={expires_at}'
+        if params:
+            query = f'?{urlencode(params, quote_via=quote)}&{query[1:]}'
+        query += '&Signature='
+        keyed = self._keyed_hmac()
+        urls = []
+        for key in keys:
+            key = key.lstrip('/')
+            h = keyed.copy()
+            h.update(f'{prefix}{key}{resource}'.encode('utf8'))
+            # base64签名中只有+/=需要URL编码
+            signature = b2a_base64(h.digest(), newline=False).decode('utf8')
+            signature = signature.replace('+', '%2B').replace('/', '%2F').replace('=', '%3D')
+            urls.append(f'{host}{quote(key)}{query}{signature}')
+        return urls
 
     def signature(self, request: Request, *, bucket: str = None) -> None:
         """对OSS请求进行签名
         :param request: 对目标请求进行前面
         :param bucket: 某些情况下可以指定目标bucket(如新建bucket)
         """
-        ct_type = request.headers.get('content-type', '')
-        ct_md5 = request.headers.get('content-md5', '')
-        oss_headers = {}
-        for key in sorted(request.headers.keys()):
-            if key.startswith('x-oss-'):
-                oss_headers[key] = request.headers.get(key)
-        oss_headers = '\n'.join(f'{k.strip()}:{v.strip()}' for k, v in oss_headers.items())
-        if oss_headers:
-            oss_headers += '\n'
-        date = datetime.utcnow().strftime('%a, %d %b %Y %H:%M:%S GMT')
-        path = f'{request.url.path}?'
-        _query = {}
-        for query in request.url.query.decode("utf8").split('&'):
-            if '=' not in query:
-                if query in self.SubResource:
-                    path += query
-                continue
-            k, v = query.split('=', 1)
-            if k in self.SubResource:
-                _query[k] = v
-        bucket = bucket if bucket else self.bucket
-        path += '&'.join([f'{k}={v}' for k, v in _query.items()])
-        path = path.strip('?')
-        sign = hmac.new(
-            bytes(self.accessKeySecret, 'utf8'),
-            bytes(f'{request.method}\n{ct_md5}\n{ct_type}\n{date}\n{oss_headers}/{bucket}{path}', 'utf8'),
-            hashlib.sha1
-        )
-        sign = base64.b64encode(sign.digest()).decode('utf8')
+        date = self._gmt_date()
+        sign = self._sign(self.string_to_sign(request, bucket if bucket else self.bucket, date))
         request.headers['Authorization'] = f'OSS {self.accessKeyId}:{sign}'
         request.headers['Date'] = date
+
+    def verify(self, request: Request, signature: str, date: str, bucket: str = None) -> bool:
+        """校验请求的签名 date为请求头Date或签名URL中的Expires 用于本地模拟OSS"""
+        expected = self._sign(self.string_to_sign(request, bucket if bucket else self.bucket, date))
+        return hmac.compare_digest(expected, signature)
+
+    def string_to_sign(self, request: Request, bucket: str, date: str) -> bytes:
+        """签名原文 VERB Content-MD5 Content-Type Date CanonicalizedOSSHeaders CanonicalizedResource"""
+        ct_type = ct_md5 = b''
+        oss_headers = {}
+        for key, value in request.headers.raw:
+            key = key.lower()
+            if key.startswith(b'x-oss-'):
+                value = value.strip()
+                oss_headers[key] = oss_headers[key] + b', ' + value if key in oss_headers else value
+            elif key == b'content-type':
+                ct_type = value
+            elif key == b'content-md5':
+                ct_md5 = value
+        url = request.url
+        resource = f'/{bucket}{url.path}' + self.canonical_query(url.query.decode('utf8'))
+        message = [request.method.encode('utf8'), ct_md5, ct_type, date.encode('utf8')]
+        message.extend(k + b':' + v for k, v in sorted(oss_headers.items()))
+        message.append(resource.encode('utf8'))
+        return b'\n'.join(message)
@@ -10,24 +10,17 @@ https://help.aliyun.com/document_detail/177682.html
 """
 import httpx
 import asyncio
+from typing import List, Tuple, Iterator, AsyncIterator
 from httpx import Response
-from oss.auth import Auth
+from oss.session import BaseClient, AsyncBaseClient
+from oss.models import (ObjectSummary, ListObjectsResult, ListObjectsParser, BucketInfo,
+                        AccessControlPolicy, WormConfiguration, parse_bucket_info, parse_acl,
+                        parse_worm)
 
 
-class Bucket:
+class Bucket(BaseClient):
     """object行为的同步方法"""
 
-    def __init__(self, auth: Auth):
-        self.auth = auth
-        self.client = httpx.Client()
-
-    def __del__(self):
-        if not self.client.is_closed:
-            self.client.close()
-
-    def build_request(self, *args, **kwargs) -> httpx.Request:
-        return self.client.build_request(*args, **kwargs)
-
     def put_bucket(self, name: str, *, storage_class: str = 'Standard',
                    redundancy_type: str = 'LRS', alc: str = 'private',
                    **kwargs) -> Response:
@@ -62,8 +55,7 @@ class Bucket:
 </CreateBucketConfiguration>'''
         url = f'https://{name}.{self.auth.endpoint}/'
         r = self.build_request('PUT', url, data=data, **kwargs)
-        self.auth.signature(r, bucket=name)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=name)
         return resp
 
     def delete_bucket(self, name: str, **kwargs) -> Response:
@@ -74,8 +66,7 @@ class Bucket:
         """
         url = f'https://{name}.{self.auth.endpoint}/'
         r = self.build_request('DELETE', url, **kwargs)
-        self.auth.signature(r, bucket=name)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=name)
         return resp
 
     def get_bucket(self, name: str = None, prefix: str = None, max_count: int = 100,
@@ -93,6 +84,14 @@ class Bucket:
         :param kwargs: 用于传递其他request参数
         :return:
         """
+        r, bucket = self._get_bucket_request(name, prefix, max_count, delimiter, marker,
+                                             encoding, version, **kwargs)
+        resp = self.send(r, bucket=bucket)
+        return resp
+
+    def _get_bucket_request(self, name: str = None, prefix: str = None, max_count: int = 100,
+                            delimiter: str = None, marker: str = None, encoding: str = None,
+                            version: str = None, **kwargs) -> Tuple[httpx.Request, str]:
         params = {}
         if 'params' in kwargs:
             params = kwargs.pop('params')
@@ -104,9 +103,40 @@ class Bucket:
         bucket = name if name else self.auth.bucket
         url = f'https://{bucket}.{self.auth.endpoint}/'
         r = self.build_request('GET', url, params=params, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
-        return resp
+        return r, bucket
+
+    def _list_page(self, name: str, prefix: str, page_size: int, delimiter: str,
+                   marker: str) -> ListObjectsResult:
+        """请求一页ListObjects 边接收边解析 不保留完整的响应体和xml树"""
+        r, bucket = self._get_bucket_request(name, prefix, page_size, delimiter, marker, 'url')
+        resp = self.send(r, bucket=bucket, stream=True)
+        try:
+            if resp.is_error:
+                resp.read()
+                resp.raise_for_status()
+            parser = ListObjectsParser()
+            for chunk in resp.iter_bytes():
+                parser.feed(chunk)
+            return parser.close()
+        finally:
+            resp.close()
+
+    def iter_objects(self, prefix: str = None, delimiter: str = None,
+                     name: str = None, page_size: int = 1000) -> Iterator[ObjectSummary]:
+        """自动翻页列举存储空间中的文件 逐个返回
+        :param prefix: 限定返回文件的Key必须以prefix作为前缀
+        :param delimiter: 对Object名字进行分组的字符 分组结果以is_prefix标记
+        :param name: 可以指定目标储存桶名称
+        :param page_size: 每页请求的数量 最大1000
+        :return:
+        """
+        marker = None
+        while True:
+            page = self._list_page(name, prefix, page_size, delimiter, marker)
+            yield from page.entries()
+            if not page.is_truncated:
+                break
+            marker = page.next_marker
 
     def get_bucket_info(self, name: str = None, **kwargs) -> Response:
         """用于查看存储空间（Bucket）的相关信息
@@ -119,10 +149,15 @@ class Bucket:
         url = f'https://{bucket}.{self.auth.endpoint}/'
         url += '?bucketInfo'
         r = self.build_request('GET', url, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
+    def bucket_info(self, name: str = None, **kwargs) -> BucketInfo:
+        """get_bucket_info的解析结果 请求失败时抛出httpx.HTTPStatusError"""
+        resp = self.get_bucket_info(name, **kwargs)
+        resp.raise_for_status()
+        return parse_bucket_info(resp.content)
+
     def get_bucket_location(self, name: str = None, **kwargs) -> Response:
         """用于查看存储空间（Bucket）的位置信息
         阿里云文档时间 2020-08-05 09:49
@@ -134,8 +169,7 @@ class Bucket:
         url = f'https://{bucket}.{self.auth.endpoint}/'
         url += '?location'
         r = self.build_request('GET', url, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
     def initiate_bucket_worm(self, retention_period: int, name: str = None,
@@ -153,8 +187,7 @@ class Bucket:
   <RetentionPeriodInDays>{retention_period}</RetentionPeriodInDays>
 </InitiateWormConfiguration>'''
         r = self.build_request('POST', url, data=data, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
     def abort_bucket_worm(self, name: str = None, **kwargs) -> Response:
@@ -167,8 +200,7 @@ class Bucket:
         url = f'https://{bucket}.{self.auth.endpoint}/'
         url += '?worm'
         r = self.build_request('DELETE', url, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
     def complete_bucket_worm(self, worm_id: str, name: str = None,
@@ -184,8 +216,7 @@ class Bucket:
         params['wormId'] = worm_id
         url = f'https://{bucket}.{self.auth.endpoint}/'
         r = self.build_request('POST', url, params=params, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
     def extend_bucket_worm(self, worm_id: str, period_days: int,
@@ -204,8 +235,7 @@ class Bucket:
   <RetentionPeriodInDays>{period_days}</RetentionPeriodInDays>
 </ExtendWormConfiguration>'''
         r = self.build_request('POST', url, data=data, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
     def get_bucket_worm(self, name: str = None, **kwargs) -> Response:
@@ -219,10 +249,15 @@ class Bucket:
         url = f'https://{bucket}.{self.auth.endpoint}/'
         url += '?worm'
         r = self.build_request('GET', url, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
+    def bucket_worm(self, name: str = None, **kwargs) -> WormConfiguration:
+        """get_bucket_worm的解析结果 请求失败时抛出httpx.HTTPStatusError"""
+        resp = self.get_bucket_worm(name, **kwargs)
+        resp.raise_for_status()
+        return parse_worm(resp.content)
+
     def put_bucket_acl(self, alc: str, name: str = None, **kwargs) -> Response:
         """用于设置或修改存储空间（Bucket）的访问权限（ACL）
         阿里云文档时间 2020-11-03 14:03
@@ -241,8 +276,7 @@ class Bucket:
         url = f'https://{bucket}.{self.auth.endpoint}/'
         url += '?acl'
         r = self.build_request('PUT', url, headers=headers, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
     def get_bucket_acl(self, name: str = None, **kwargs) -> Response:
@@ -256,10 +290,15 @@ class Bucket:
         url = f'https://{bucket}.{self.auth.endpoint}/'
         url += '?acl'
         r = self.build_request('GET', url, **kwargs)
-        self.auth.signature(r, bucket=bucket)
-        resp = self.client.send(r)
+        resp = self.send(r, bucket=bucket)
         return resp
 
+    def bucket_acl(self, name: str = None, **kwargs) -> AccessControlPolicy:
+        """get_bucket_acl的解析结果 请求失败时抛出httpx.HTTPStatusError"""
+        resp = self.get_bucket_acl(name, **kwargs)
+        resp.raise_for_status()
+        return parse_acl(resp.content)
+
     def put_bucket_lifecycle(self):
         raise NotImplemented
 
@@ -270,23 +309,9 @@ class Bucket:
         raise NotImplemented
 
 
-class AsyncBucket(Bucket):
+class AsyncBucket(AsyncBaseClient, Bucket):
     """object行为的异步方法"""
 
-    def __init__(self, auth: Auth):
-        self.auth = auth
-        self.client = httpx.AsyncClient()
-
-    def __del__(self):
-        try:
-            if not self.client.is_closed:
-                task = asyncio.create_task(self.client.aclose())
-                task.result()
-        except RuntimeError:
-            pass
-        except asyncio.exceptions.InvalidStateError:
-            pass
-
     async def put_bucket(self, name: str, *, storage_class: str = 'Standard',
                          redundancy_type: str = 'LRS', alc: str = 'private',
                          **kwargs) -> Response:
@@ -306,10 +331,113 @@ class AsyncBucket(Bucket):
                                   marker, encoding, version, **kwargs)
         return await corn
 
+    async def _list_page(self, name: str, prefix: str, page_size: int, delimiter: str,
+                         marker: str) -> ListObjectsResult:
+        r, bucket = self._get_bucket_request(name, prefix, page_size, delimiter, marker, 'url')
+        resp = await self.send(r, bucket=bucket, stream=True)
+        try:
+            if resp.is_error:
+                await resp.aread()
+                resp.raise_for_status()
+            parser = ListObjectsParser()
+            async for chunk in resp.aiter_bytes():
+                parser.feed(chunk)
+            return parser.close()
+        finally:
+            await resp.aclose()
+
+    async def iter_objects(self, prefix: str = None, delimiter: str = None,
+                           name: str = None, page_size: int = 1000) -> AsyncIterator[ObjectSummary]:
+        """返回当前页的同时预先请求下一页"""
+        task = asyncio.ensure_future(self._list_page(name, prefix, page_size, delimiter, None))
+        try:
+            while task:
+                page = await task
+                task = None
+                if page.is_truncated:
+                    task = asyncio.ensure_future(self._list_page(
+                        name, prefix, page_size, delimiter, page.next_marker))
+                for entry in page.entries():
+                    yield entry
+        finally:
+            if task:
+                task.cancel()
+
+    async def iter_objects_partitioned(self, prefix: str = None, split_points: List[str] = None,
+                                       name: str = None, concurrency: int = 8,
+                                       page_size: int = 1000,
+                                       ordered: bool = True) -> AsyncIterator[ObjectSummary]:
+        """把Key空间划分为互不重叠的区间并发列举 合并返回所有文件
+        区间以split_points为界 第i个区间为(split_points[i-1], split_points[i]]
+        使用marker作为区间下界 超过上界后停止该区间的翻页
+        每个区间独立翻页 不等待前面的区间被取完 ordered为True时每个区间最多缓存两页
+        缓存满时该区间暂停翻页 并发名额按页获取 暂停的区间不占用名额
+        :param prefix: 限定返回文件的Key必须以prefix作为前缀
+        :param split_points: 区间分界点 不指定时使用delimiter='/'得到的公共前缀
+        :param name: 可以指定目标储存桶名称
+        :param concurrency: 同时列举的区间数 即同时进行的请求数上限
+        :param page_size: 每页请求的数量 最大1000
+        :param ordered: 为True时按Key顺序返回 为False时按页到达的顺序返回 最多缓存concurrency页
+        :return:
+        """
+        if split_points is None:
+            split_points = [x.key async for x in self.iter_objects(prefix, '/', name, page_size)
+                            if x.is_prefix]
+        bounds = [None] + sorted(set(split_points)) + [None]
+        ranges = list(zip(bounds, bounds[1:]))
+        semaphore = asyncio.Semaphore(concurrency)
+        shared = None if ordered else asyncio.Queue(concurrency)
+        queues = [shared if shared else asyncio.Queue(2) for _ in ranges]
+
+        async def produce(lower: str, upper: str, queue: asyncio.Queue):
+            marker = lower
+            try:
+                while True:
+                    async with semaphore:
+                        page = await self._list_page(name, prefix, page_size, None, marker)
+                    entries = page.objects
+                    finished = not page.is_truncated
+                    if upper is not None and entries and entries[-1].key > upper:
+                        entries = [x for x in entries if x.key <= upper]
+                        finished = True
+                    await queue.put(entries)
+                    if finished:
+                        break
+                    marker = page.next_marker
+                await queue.put(None)
+            except Exception as e:
+                await queue.put(e)
+
+        tasks = [asyncio.ensure_future(produce(lower, upper, queue))
+                 for (lower, upper), queue in zip(ranges, queues)]
+        try:
+            # 有序时依次取每个区间的队列 无序时所有区间共用一个队列 收到len(tasks)个None结束
+            pending = len(tasks)
+            for queue in (queues if ordered else [shared]):
+                while pending:
+                    entries = await queue.get()
+                    if entries is None:
+                        pending -= 1
+                        if ordered:
+                            break
+                        continue
+                    if isinstance(entries, Exception):
+                        raise entries
+                    for entry in entries:
+                        yield entry
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def get_bucket_info(self, name: str = None, **kwargs) -> Response:
         corn = super().get_bucket_info(name, **kwargs)
         return await corn
 
+    async def bucket_info(self, name: str = None, **kwargs) -> BucketInfo:
+        resp = await self.get_bucket_info(name, **kwargs)
+        resp.raise_for_status()
+        return parse_bucket_info(resp.content)
+
     async def get_bucket_location(self, name: str = None, **kwargs) -> Response:
         corn = super().get_bucket_location(name, **kwargs)
         return await corn
@@ -328,8 +456,8 @@ class AsyncBucket(Bucket):
         corn = super().complete_bucket_worm(worm_id, name, **kwargs)
         return await corn
 
-    def extend_bucket_worm(self, worm_id: str, period_days: int,
-                           name: str = None, **kwargs):
+    async def extend_bucket_worm(self, worm_id: str, period_days: int,
+                                 name: str = None, **kwargs):
         corn = super().extend_bucket_worm(worm_id, period_days, name, **kwargs)
         return await corn
 
@@ -337,6 +465,11 @@ class AsyncBucket(Bucket):
         corn = super().get_bucket_worm(name, **kwargs)
         return await corn
 
+    async def bucket_worm(self, name: str = None, **kwargs) -> WormConfiguration:
+        resp = await self.get_bucket_worm(name, **kwargs)
+        resp.raise_for_status()
+        return parse_worm(resp.content)
+
     async def put_bucket_acl(self, alc: str, name: str = None, **kwargs) -> Response:
         corn = super().put_bucket_acl(alc, name, **kwargs)
         return await corn
@@ -345,6 +478,11 @@ class AsyncBucket(Bucket):
         corn = super().get_bucket_acl(name, **kwargs)
         return await corn
 
+    async def bucket_acl(self, name: str = None, **kwargs) -> AccessControlPolicy:
+        resp = await self.get_bucket_acl(name, **kwargs)
+        resp.raise_for_status()
+        return parse_acl(resp.content)
+
     def put_bucket_lifecycle(self):
         raise NotImplemented
 
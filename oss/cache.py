@@ -0,0 +1,246 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> cache
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/12 9:40 上午
+@Desc   ：文件元信息的进程内缓存和文件内容的磁盘缓存
+==================================================
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from httpx import Response
+
+
+class MetaCache:
+    """head_object/get_object_meta响应的TTL+LRU缓存 传给ObjectClient后生效
+    通过同一个客户端进行的写操作会使对应文件的缓存失效
+    其他进程或客户端的修改只能等待ttl过期 可以在多个线程中共用 内部状态有锁保护
+    cache = MetaCache(maxsize=4096, ttl=30)
+    client = ObjectClient(auth, meta_cache=cache)
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0):
+        """
+        :param maxsize: 最多缓存的响应数 超出时淘汰最久未使用的
+        :param ttl: 缓存有效秒数
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # 每次失效加1 请求期间发生过失效时不写入缓存 避免写操作前发出的请求写回旧数据
+        self.version = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[Response]:
+        """
+        :param key: (bucket, 文件路径, 操作名)
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires, resp = item
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return resp
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: Tuple[str, str, str], resp: Response, version: int = None) -> None:
+        """
+        :param key: (bucket, 文件路径, 操作名)
+        :param resp: 要缓存的响应
+        :param version: 发送请求前的version 之后发生过失效时不写入
+        """
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, resp)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, bucket: str, target: str, ops: Tuple[str, ...] = ('head', 'meta')) -> None:
+        with self._lock:
+            self.version += 1
+            for op in ops:
+                self._data.pop((bucket, target, op), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._data.clear()
+
+
+class DiskCache:
+    """get_object响应的本地磁盘缓存 传给ObjectClient后生效
+    再次获取同一文件(同一range)时携带If-None-Match 服务端返回304时直接使用本地内容
+    发送请求前只读取元信息 返回304后才读取内容
+    每个缓存文件由一行json元信息和响应内容组成 先写临时文件再os.replace
+    多个进程可以共用同一个目录 每个进程创建时扫描一次目录 之后在内存中维护使用顺序和总大小
+    淘汰只依据本进程的记录 其他进程之后写入的文件由其他进程负责淘汰
+    方法均为阻塞的文件读写 异步客户端在线程池中调用 内部状态有锁保护
+    client = ObjectClient(auth, disk_cache=DiskCache('/tmp/oss-cache', 2 * 1024 ** 3))
+    """
+    KEEP_HEADERS = frozenset((
+        'content-type', 'content-range', 'etag', 'last-modified', 'x-oss-object-type',
+        'x-oss-hash-crc64ecma', 'x-oss-storage-class',
+    ))
+
+    def __init__(self, directory: str, max_bytes: int = 1024 ** 3):
+        """
+        :param directory: 缓存目录 不存在时自动创建
+        :param max_bytes: 缓存文件的总字节数上限 超出时按最近使用时间淘汰
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 缓存文件路径 -> 字节数 按最近使用排序
+        self._entries = OrderedDict()
+        self._total = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.startswith('.tmp') or not entry.is_file():
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        self._entries = OrderedDict((path, size) for _, size, path in entries)
+        self._total = sum(self._entries.values())
+
+    def _used(self, path: str, size: int = None) -> None:
+        """记录一次使用 size不为None时同时更新大小"""
+        with self._lock:
+            if size is not None:
+                self._total += size - self._entries.get(path, 0)
+                self._entries[path] = size
+            if path in self._entries:
+                self._entries.move_to_end(path)
+
+    def _path(self, bucket: str, target: str, _range: str = None) -> str:
+        name = f'{bucket}\n{target.lstrip("/")}\n{_range or ""}'.encode('utf8')
+        return os.path.join(self.directory, hashlib.sha1(name).hexdigest())
+
+    def meta(self, bucket: str, target: str, _range: str = None) -> Optional[dict]:
+        """只读取元信息 文件不存在或大小与元信息不符时返回None"""
+        try:
+            with open(self._path(bucket, target, _range), 'rb') as f:
+                line = f.readline()
+                meta = json.loads(line)
+                if os.fstat(f.fileno()).st_size != len(line) + meta['size']:
+                    return None
+        except (OSError, ValueError):
+            return None
+        return meta
+
+    def _content(self, path: str, meta: dict) -> Optional[bytes]:
+        """读取内容 文件已被替换或删除时返回None"""
+        try:
+            with open(path, 'rb') as f:
+                if json.loads(f.readline()) != meta:
+                    return None
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        return content if len(content) == meta['size'] else None
+
+    def get(self, bucket: str, target: str, _range: str = None) -> Optional[Tuple[dict, bytes]]:
+        """返回(元信息, 内容) 文件不存在或不完整时返回None"""
+        meta = self.meta(bucket, target, _range)
+        if meta is None:
+            return None
+        content = self._content(self._path(bucket, target, _range), meta)
+        return None if content is None else (meta, content)
+
+    def set(self, bucket: str, target: str, _range: str, resp: Response) -> None:
+        """保存带ETag的响应 保存后检查总大小"""
+        if 'ETag' not in resp.headers:
+            return
+        headers = {k: v for k, v in resp.headers.items() if k in self.KEEP_HEADERS}
+        meta = {'status': resp.status_code, 'size': len(resp.content), 'headers': headers}
+        meta = json.dumps(meta).encode('utf8')
+        path = self._path(bucket, target, _range)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(meta + b'\n')
+                f.write(resp.content)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        self._used(path, len(meta) + 1 + len(resp.content))
+        self._evict()
+
+    def response(self, bucket: str, target: str, _range: str,
+                 meta: Optional[dict], resp: Response) -> Optional[Response]:
+        """处理携带If-None-Match请求的响应 304时读取缓存内容构造响应
+        :param meta: 发送请求前由meta()读取的元信息
+        :return: 304之后缓存文件已被删除或替换时返回None 需要不带If-None-Match重新请求
+        """
+        if resp.status_code == 304 and meta is not None:
+            path = self._path(bucket, target, _range)
+            content = self._content(path, meta)
+            if content is None:
+                return None
+            self.hits += 1
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self._used(path)
+            return Response(meta['status'], headers=meta['headers'], content=content,
+                            request=resp.request)
+        self.misses += 1
+        if resp.status_code in (200, 206):
+            self.set(bucket, target, _range, resp)
+        return resp
+
+    def _evict(self) -> None:
+        """按最近使用顺序淘汰 直到总大小不超过max_bytes"""
+        removed = []
+        with self._lock:
+            while self._total > self.max_bytes and self._entries:
+                path, size = self._entries.popitem(last=False)
+                self._total -= size
+                removed.append(path)
+        for path in removed:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    os.remove(entry.path)
+        with self._lock:
+            self._entries.clear()
+            self._total = 0
@@ -0,0 +1,96 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> checkpoint
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/15 10:05 上午
+@Desc   ：断点续传的进度文件
+==================================================
+"""
+import os
+import json
+import threading
+from typing import Optional
+
+
+class Checkpoint:
+    """断点续传的进度记录 以json保存在本地
+    identity记录源文件和目标文件的信息 恢复时任何一项不一致都视为失效
+    done记录已完成的分片(分段)
+    文件的第一行为save写入的完整状态 之后每完成一个分片只追加一行[key, value]
+    读取时按顺序回放 避免分片很多时每次都重写整个文件 崩溃时写了一半的最后一行会被忽略
+    """
+
+    def __init__(self, path: str, identity: dict, **state):
+        """
+        :param path: 进度文件路径
+        :param identity: 用于判断能否恢复的信息
+        :param state: 其他需要保存的状态 例如upload_id
+        """
+        self.path = path
+        self.identity = identity
+        self.state = state
+        self.done = {}
+        self._saved = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, identity: dict) -> Optional['Checkpoint']:
+        """读取进度文件 不存在、损坏或identity不一致时返回None"""
+        data = cls.peek(path)
+        if data is None or data.get('identity') != identity:
+            return None
+        checkpoint = cls(path, identity, **data.get('state', {}))
+        checkpoint.done = data['done']
+        checkpoint._saved = True
+        return checkpoint
+
+    @staticmethod
+    def peek(path: str) -> Optional[dict]:
+        """读取进度文件的内容并回放追加的分片记录 用于清理失效的分片上传事件"""
+        try:
+            with open(path, 'r', encoding='utf8') as f:
+                lines = f.read().split('\n')
+            data = json.loads(lines[0])
+        except (OSError, ValueError):
+            return None
+        if not isinstance(data, dict):
+            return None
+        done = data.setdefault('done', {})
+        for line in lines[1:]:
+            try:
+                key, value = json.loads(line)
+            except (ValueError, TypeError):
+                # 写入中断的最后一行
+                break
+            done[str(key)] = value
+        return data
+
+    def save(self) -> None:
+        """重写整个文件 同时合并之前追加的分片记录"""
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        data = {'identity': self.identity, 'state': self.state, 'done': self.done}
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w', encoding='utf8') as f:
+            f.write(json.dumps(data) + '\n')
+        os.replace(tmp, self.path)
+        self._saved = True
+
+    def mark(self, key, value) -> None:
+        """记录一个已完成的分片 只向文件追加一行"""
+        with self._lock:
+            self.done[str(key)] = value
+            if not self._saved:
+                self._save()
+                return
+            with open(self.path, 'a', encoding='utf8') as f:
+                f.write(json.dumps([str(key), value]) + '\n')
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
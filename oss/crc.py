@@ -0,0 +1,132 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> crc
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/14 10:20 上午
+@Desc   ：OSS使用的CRC64(ECMA-182)校验
+==================================================
+"""
+import base64
+import hashlib
+from httpx import Response
+
+_POLY = 0xC96C5795D7870F42
+_MASK = 0xFFFFFFFFFFFFFFFF
+
+
+def _make_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ _POLY if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_TABLE = _make_table()
+
+
+def _update_table(crc: int, data: bytes) -> int:
+    crc ^= _MASK
+    table = _TABLE
+    for b in data:
+        crc = table[(crc ^ b) & 0xff] ^ (crc >> 8)
+    return crc ^ _MASK
+
+
+try:
+    import crcmod
+    _crcmod = crcmod.mkCrcFun(0x142F0E1EBA9EA3693, initCrc=0, xorOut=_MASK, rev=True)
+    # 是否使用crcmod的C扩展 纯python实现约5MB/s 校验是否开启与此无关
+    FAST = bool(crcmod._usingExtension)
+
+    def crc64(data: bytes, crc: int = 0) -> int:
+        return _crcmod(data, crc)
+except ImportError:
+    FAST = False
+
+    def crc64(data: bytes, crc: int = 0) -> int:
+        """计算data的CRC64 传入crc时在其基础上继续计算"""
+        return _update_table(crc, data)
+
+
+def _gf2_times(matrix, vector: int) -> int:
+    result = 0
+    i = 0
+    while vector:
+        if vector & 1:
+            result ^= matrix[i]
+        vector >>= 1
+        i += 1
+    return result
+
+
+def _gf2_square(matrix):
+    return [_gf2_times(matrix, row) for row in matrix]
+
+
+# _ZEROS[k]为在CRC后追加2**k个零字节对应的GF(2)矩阵 按需生成
+_ZEROS = []
+
+
+def _zeros_operator(k: int):
+    if not _ZEROS:
+        # 追加1个零比特的矩阵 再平方3次得到1个零字节
+        matrix = [_POLY] + [1 << n for n in range(63)]
+        for _ in range(3):
+            matrix = _gf2_square(matrix)
+        _ZEROS.append(matrix)
+    while len(_ZEROS) <= k:
+        _ZEROS.append(_gf2_square(_ZEROS[-1]))
+    return _ZEROS[k]
+
+
+def crc64_combine(crc1: int, crc2: int, len2: int) -> int:
+    """由前后两段数据各自的CRC64得到拼接后数据的CRC64 用于并发分片传输
+    :param crc1: 前一段数据的CRC64
+    :param crc2: 后一段数据的CRC64
+    :param len2: 后一段数据的长度
+    """
+    k = 0
+    while len2:
+        if len2 & 1:
+            crc1 = _gf2_times(_zeros_operator(k), crc1)
+        len2 >>= 1
+        k += 1
+    return crc1 ^ crc2
+
+
+class Crc64:
+    """增量计算的CRC64 用法类似hashlib"""
+    __slots__ = ('crc', 'size')
+
+    def __init__(self, data: bytes = b''):
+        self.crc = crc64(data) if data else 0
+        self.size = len(data)
+
+    def update(self, data: bytes) -> None:
+        self.crc = crc64(data, self.crc)
+        self.size += len(data)
+
+    def combine(self, crc: int, size: int) -> None:
+        """在当前数据之后拼接一段CRC64为crc 长度为size的数据"""
+        self.crc = crc64_combine(self.crc, crc, size)
+        self.size += size
+
+
+class ChecksumError(IOError):
+    """本地计算的校验值与OSS返回的不一致"""
+
+
+def content_md5(data: bytes) -> str:
+    return base64.b64encode(hashlib.md5(data).digest()).decode('utf8')
+
+
+def check_crc64(resp: Response, crc: int) -> Response:
+    """与响应头x-oss-hash-crc64ecma比较 响应失败或没有该响应头时不检查"""
+    expected = resp.headers.get('x-oss-hash-crc64ecma')
+    if expected is not None and resp.is_success and int(expected) != crc:
+        raise ChecksumError(f'CRC64不一致 本地{crc} OSS{expected} {resp.request.url}')
+    return resp
@@ -0,0 +1,708 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> emulator
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/22 10:20 上午
+@Desc   ：进程内的OSS模拟 作为httpx的transport使用 不需要网络和账号
+校验Auth生成的签名 实现客户端用到的object、bucket、分片上传和列举接口
+可以设置每个请求的延迟、带宽上限 以及随机注入5xx错误和503限流
+emulator = Emulator({'AccessKeyId': 'AccessKeySecret'}, endpoint=ENDPOINT, latency=0.02)
+session = Session(transport=emulator)
+==================================================
+"""
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import threading
+from bisect import bisect_left, bisect_right
+from collections import deque
+from email.utils import formatdate
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, unquote
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+import httpx
+from oss import crc as _crc
+from oss.auth import Auth
+
+MIN_PART_SIZE = 100 * 1024
+MAX_KEYS = 1000
+OWNER = 'emulator'
+
+# 上传时保存并在下载时原样返回的请求头
+STORED_HEADERS = frozenset(('content-type', 'content-disposition', 'content-encoding',
+                            'content-language', 'cache-control', 'expires'))
+
+
+def _http_date(timestamp: float) -> str:
+    return formatdate(timestamp, usegmt=True)
+
+
+def _iso_date(timestamp: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(timestamp))
+
+
+def _etag(digests: Iterable[bytes], multipart: int = 0) -> str:
+    """普通文件为内容MD5 分片上传的文件为各分片MD5拼接后的MD5加分片数"""
+    if not multipart:
+        return f'"{next(iter(digests)).hex().upper()}"'
+    return f'"{hashlib.md5(b"".join(digests)).hexdigest().upper()}-{multipart}"'
+
+
+def _parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单个bytes范围 返回闭区间 格式不合法时返回None 与OSS一样按整个文件处理"""
+    unit, _, spec = value.partition('=')
+    first, sep, last = spec.partition('-')
+    if unit.strip() != 'bytes' or not sep or ',' in spec:
+        return None
+    try:
+        if not first:
+            return max(size - int(last), 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+class OssError(Exception):
+    """处理请求时转换为OSS格式的错误响应"""
+
+    def __init__(self, status: int, code: str, message: str = '', **headers: str):
+        super().__init__(f'{status} {code} {message}')
+        self.status = status
+        self.code = code
+        self.message = message
+        self.headers = headers
+
+
+class StoredObject:
+    __slots__ = ('data', 'etag', 'crc', 'type', 'headers', 'modified')
+
+    def __init__(self, data: bytes, etag: str, crc: Optional[int], type_: str,
+                 headers: Dict[str, str]):
+        self.data = data
+        self.etag = etag
+        self.crc = crc
+        self.type = type_
+        self.headers = headers
+        self.modified = time.time()
+
+
+class Part:
+    __slots__ = ('data', 'digest', 'etag', 'crc', 'modified')
+
+    def __init__(self, data: bytes, crc: Optional[int]):
+        self.data = data
+        self.digest = hashlib.md5(data).digest()
+        self.etag = _etag([self.digest])
+        self.crc = crc
+        self.modified = time.time()
+
+
+class Upload:
+    __slots__ = ('bucket', 'key', 'headers', 'parts', 'initiated')
+
+    def __init__(self, bucket: str, key: str, headers: Dict[str, str]):
+        self.bucket = bucket
+        self.key = key
+        self.headers = headers
+        self.parts: Dict[int, Part] = {}
+        self.initiated = time.time()
+
+
+class BucketState:
+    __slots__ = ('name', 'objects', 'acl', 'storage_class', 'created', '_keys')
+
+    def __init__(self, name: str, acl: str = 'private', storage_class: str = 'Standard'):
+        self.name = name
+        self.objects: Dict[str, StoredObject] = {}
+        self.acl = acl
+        self.storage_class = storage_class
+        self.created = time.time()
+        self._keys = None
+
+    def put(self, key: str, obj: StoredObject) -> None:
+        if key not in self.objects:
+            self._keys = None
+        self.objects[key] = obj
+
+    def delete(self, key: str) -> bool:
+        if self.objects.pop(key, None) is None:
+            return False
+        self._keys = None
+        return True
+
+    def keys(self) -> List[str]:
+        """排好序的文件名 写入新文件或删除时才重新排序"""
+        if self._keys is None:
+            self._keys = sorted(self.objects)
+        return self._keys
+
+
+class Emulator(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """模拟OSS服务端 可以同时作为同步和异步httpx客户端的transport 线程安全
+    延迟在同步客户端中使用time.sleep 在异步客户端中使用asyncio.sleep 不会阻塞事件循环
+    注入的错误在校验签名之前返回 相当于接入层的限流
+    """
+
+    def __init__(self, credentials: Dict[str, str] = None, buckets: Iterable[str] = ('bucket',),
+                 endpoint: str = None, latency: float = 0.0, jitter: float = 0.0,
+                 bandwidth: float = None, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 seed: int = None, crc: bool = None, min_part_size: int = MIN_PART_SIZE):
+        """
+        :param credentials: {AccessKeyId: AccessKeySecret} 为None时不校验签名
+        :param buckets: 预先创建的储存桶
+        :param endpoint: 访问域名 用于从Host中取出储存桶名 为None时取Host的第一段
+        :param latency: 每个请求固定增加的秒数
+        :param jitter: 每个请求另外增加均值为jitter秒的指数分布随机延迟 用于模拟长尾
+        :param bandwidth: 单个请求的传输速度上限 字节/秒 请求体和响应体都计算在内
+        :param error_rate: 返回500 InternalError的概率
+        :param throttle_rate: 返回503 SlowDown的概率
+        :param seed: 随机数种子 相同的种子注入相同序列的错误和延迟
+        :param crc: 是否返回x-oss-hash-crc64ecma 默认在安装了crcmod时返回
+        :param min_part_size: 除最后一个分片外的最小分片大小
+        """
+        self.credentials = credentials
+        self.endpoint = endpoint
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.crc = _crc.FAST if crc is None else crc
+        self.min_part_size = min_part_size
+        self.buckets: Dict[str, BucketState] = {name: BucketState(name) for name in buckets}
+        self.uploads: Dict[str, Upload] = {}
+        self.requests = 0
+        self.injected = 0
+        self._faults = deque()
+        self._random = random.Random(seed)
+        self._signers: Dict[str, Auth] = {}
+        self._lock = threading.Lock()
+
+    def fail_next(self, status: int = 503, count: int = 1, code: str = None) -> None:
+        """接下来的count个请求直接返回status 优先于随机注入的错误"""
+        code = code or ('SlowDown' if status == 503 else 'InternalError')
+        with self._lock:
+            self._faults.extend([(status, code)] * count)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        resp, delay = self._handle(request)
+        if delay > 0:
+            time.sleep(delay)
+        return resp
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        resp, delay = self._handle(request)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return resp
+
+    def _handle(self, request: httpx.Request) -> Tuple[httpx.Response, float]:
+        with self._lock:
+            self.requests += 1
+            request_id = f'{self.requests:024X}'
+            delay = self.latency
+            if self.jitter:
+                delay += self._random.expovariate(1 / self.jitter)
+            try:
+                self._inject()
+                self._authorize(request)
+                status, headers, body = self._dispatch(request)
+            except OssError as e:
+                status, headers, body = self._error(e, request, request_id)
+        headers['x-oss-request-id'] = request_id
+        if request.method == 'HEAD':
+            headers.setdefault('Content-Length', str(len(body)))
+            body = b''
+        if self.bandwidth:
+            delay += (len(request.content) + len(body)) / self.bandwidth
+        return httpx.Response(status, headers=headers, content=body), delay
+
+    def _inject(self) -> None:
+        if self._faults:
+            status, code = self._faults.popleft()
+        elif self.throttle_rate and self._random.random() < self.throttle_rate:
+            status, code = 503, 'SlowDown'
+        elif self.error_rate and self._random.random() < self.error_rate:
+            status, code = 500, 'InternalError'
+        else:
+            return
+        self.injected += 1
+        raise OssError(status, code, 'injected by emulator')
+
+    @staticmethod
+    def _error(e: OssError, request: httpx.Request,
+               request_id: str) -> Tuple[int, Dict[str, str], bytes]:
+        body = ('<?xml version="1.0" encoding="UTF-8"?><Error>'
+                f'<Code>{e.code}</Code><Message>{escape(e.message)}</Message>'
+                f'<RequestId>{request_id}</RequestId>'
+                f'<HostId>{escape(request.url.host)}</HostId></Error>')
+        headers = {'Content-Type': 'application/xml'}
+        headers.update(e.headers)
+        return e.status, headers, body.encode('utf8')
+
+    def _target(self, request: httpx.Request) -> Tuple[Optional[str], str]:
+        """(储存桶, 文件名) 访问域名本身时储存桶为None"""
+        host = request.url.host
+        key = request.url.path[1:]
+        if self.endpoint is None:
+            return host.partition('.')[0], key
+        if host == self.endpoint:
+            return None, key
+        if not host.endswith(f'.{self.endpoint}'):
+            raise OssError(400, 'InvalidBucketName', f'{host}不属于{self.endpoint}')
+        return host[:-len(self.endpoint) - 1], key
+
+    def _authorize(self, request: httpx.Request) -> None:
+        """校验请求头中的签名或签名URL"""
+        if self.credentials is None:
+            return
+        authorization = request.headers.get('Authorization', '')
+        params = request.url.params
+        if authorization.startswith('OSS '):
+            key_id, _, signature = authorization[4:].partition(':')
+            date = request.headers.get('Date', '')
+        elif 'Signature' in params:
+            key_id, signature, date = (params.get('OSSAccessKeyId', ''), params['Signature'],
+                                       params.get('Expires', ''))
+            if not date.isdigit() or int(date) < time.time():
+                raise OssError(403, 'AccessDenied', 'Request has expired.')
+        else:
+            raise OssError(403, 'AccessDenied', 'AccessDenied')
+        secret = self.credentials.get(key_id)
+        if secret is None:
+            raise OssError(403, 'InvalidAccessKeyId', 'The OSS Access Key Id you provided '
+                                                      'does not exist in our records.')
+        signer = self._signers.get(key_id)
+        if signer is None or signer.accessKeySecret != secret:
+            signer = self._signers[key_id] = Auth(key_id, secret, '', self.endpoint or '')
+        bucket = self._target(request)[0] or ''
+        if not signer.verify(request, signature, date, bucket):
+            raise OssError(403, 'SignatureDoesNotMatch',
+                           'The request signature we calculated does not match '
+                           'the signature you provided.')
+
+    def _bucket(self, name: str) -> BucketState:
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            raise OssError(404, 'NoSuchBucket', 'The specified bucket does not exist.')
+        return bucket
+
+    def _object(self, bucket: BucketState, key: str) -> StoredObject:
+        obj = bucket.objects.get(key)
+        if obj is None:
+            raise OssError(404, 'NoSuchKey', 'The specified key does not exist.')
+        return obj
+
+    def _checksum(self, data: bytes) -> Optional[int]:
+        return _crc.crc64(data) if self.crc else None
+
+    def _crc_header(self, headers: Dict[str, str], crc: Optional[int]) -> Dict[str, str]:
+        if crc is not None:
+            headers['x-oss-hash-crc64ecma'] = str(crc)
+        return headers
+
+    @staticmethod
+    def _stored_headers(request: httpx.Request) -> Dict[str, str]:
+        headers = {k: v for k, v in request.headers.items()
+                   if k in STORED_HEADERS or k.startswith('x-oss-meta-')}
+        headers.setdefault('content-type', 'application/octet-stream')
+        return headers
+
+    @staticmethod
+    def _check_md5(request: httpx.Request, digest: bytes) -> None:
+        expected = request.headers.get('Content-MD5')
+        if expected is not None and base64.b64decode(expected) != digest:
+            raise OssError(400, 'InvalidDigest', 'The Content-MD5 you specified was invalid.')
+
+    def _dispatch(self, request: httpx.Request) -> Tuple[int, Dict[str, str], bytes]:
+        name, key = self._target(request)
+        method = request.method
+        params = request.url.params
+        if name is None:
+            if method == 'GET':
+                return self._list_buckets(params)
+            raise OssError(405, 'MethodNotAllowed', f'{method} is not allowed.')
+        if not key:
+            return self._bucket_request(request, name, method, params)
+        bucket = self._bucket(name)
+        if 'uploadId' in params:
+            return self._multipart_request(request, bucket, key, method, params)
+        if method == 'POST' and 'uploads' in params:
+            return self._initiate(request, bucket, key)
+        if method == 'POST' and 'append' in params:
+            return self._append(request, bucket, key, params)
+        if 'x-oss-process' in params or any(
+                s in params for s in ('acl', 'tagging', 'symlink', 'restore')):
+            raise OssError(501, 'NotImplemented', 'The emulator does not support this operation.')
+        if method == 'PUT':
+            if 'x-oss-copy-source' in request.headers:
+                return self._copy(request, bucket, key)
+            return self._put(request, bucket, key)
+        if method in ('GET', 'HEAD'):
+            return self._get(request, bucket, key, params)
+        if method == 'DELETE':
+            bucket.delete(key)
+            return 204, {}, b''
+        raise OssError(405, 'MethodNotAllowed', f'{method} is not allowed.')
+
+    # 储存桶
+
+    def _bucket_request(self, request: httpx.Request, name: str, method: str,
+                        params: httpx.QueryParams) -> Tuple[int, Dict[str, str], bytes]:
+        if method == 'PUT' and 'acl' in params:
+            self._bucket(name).acl = request.headers.get('x-oss-acl', 'private')
+            return 200, {}, b''
+        if method == 'PUT':
+            if name not in self.buckets:
+                storage_class = 'Standard'
+                if request.content:
+                    storage_class = ElementTree.fromstring(request.content).findtext(
+                        'StorageClass', storage_class)
+                self.buckets[name] = BucketState(name, request.headers.get('x-oss-acl', 'private'),
+                                                 storage_class)
+            return 200, {}, b''
+        bucket = self._bucket(name)
+        if method == 'DELETE':
+            if bucket.objects or any(u.bucket == name for u in self.uploads.values()):
+                raise OssError(409, 'BucketNotEmpty',
+                               'The bucket you tried to delete is not empty.')
+            del self.buckets[name]
+            return 204, {}, b''
+        if method == 'POST' and 'delete' in params:
+            return self._delete_objects(request, bucket, params)
+        if method == 'GET' and 'bucketInfo' in params:
+            return self._xml(self._bucket_info(bucket))
+        if method == 'GET' and 'acl' in params:
+            return self._xml(f'<AccessControlPolicy><Owner><ID>{OWNER}</ID>'
+                             f'<DisplayName>{OWNER}</DisplayName></Owner><AccessControlList>'
+                             f'<Grant>{bucket.acl}</Grant></AccessControlList>'
+                             '</AccessControlPolicy>')
+        if method == 'GET' and 'location' in params:
+            return self._xml(f'<LocationConstraint>{self._location()}</LocationConstraint>')
+        if method == 'GET' and not any(k in Auth.SubResource for k in params):
+            return self._list_objects(bucket, params)
+        raise OssError(501, 'NotImplemented', 'The emulator does not support this operation.')
+
+    @staticmethod
+    def _xml(body: str, headers: Dict[str, str] = None) -> Tuple[int, Dict[str, str], bytes]:
+        headers = headers if headers is not None else {}
+        headers['Content-Type'] = 'application/xml'
+        return 200, headers, ('<?xml version="1.0" encoding="UTF-8"?>' + body).encode('utf8')
+
+    def _location(self) -> str:
+        endpoint = self.endpoint or ''
+        return endpoint.partition('.')[0] if endpoint.startswith('oss-') else 'oss-emulator'
+
+    def _bucket_info(self, bucket: BucketState) -> str:
+        return (f'<BucketInfo><Bucket><Name>{bucket.name}</Name>'
+                f'<Location>{self._location()}</Location>'
+                f'<CreationDate>{_iso_date(bucket.created)}</CreationDate>'
+                f'<StorageClass>{bucket.storage_class}</StorageClass>'
+                '<DataRedundancyType>LRS</DataRedundancyType>'
+                f'<ExtranetEndpoint>{self.endpoint or ""}</ExtranetEndpoint>'
+                f'<IntranetEndpoint>{self.endpoint or ""}</IntranetEndpoint>'
+                f'<Owner><ID>{OWNER}</ID><DisplayName>{OWNER}</DisplayName></Owner>'
+                f'<AccessControlList><Grant>{bucket.acl}</Grant></AccessControlList>'
+                '</Bucket></BucketInfo>')
+
+    def _list_buckets(self, params: httpx.QueryParams) -> Tuple[int, Dict[str, str], bytes]:
+        prefix = params.get('prefix', '')
+        marker = params.get('marker', '')
+        max_keys = min(int(params.get('max-keys') or MAX_KEYS), MAX_KEYS)
+        names = [n for n in sorted(self.buckets) if n.startswith(prefix) and n > marker]
+        page, truncated = names[:max_keys], len(names) > max_keys
+        buckets = ''.join(
+            f'<Bucket><Name>{n}</Name><Location>{self._location()}</Location>'
+            f'<CreationDate>{_iso_date(self.buckets[n].created)}</CreationDate>'
+            f'<ExtranetEndpoint>{self.endpoint or ""}</ExtranetEndpoint>'
+            f'<IntranetEndpoint>{self.endpoint or ""}</IntranetEndpoint>'
+            f'<StorageClass>{self.buckets[n].storage_class}</StorageClass></Bucket>'
+            for n in page)
+        next_marker = f'<NextMarker>{page[-1]}</NextMarker>' if truncated else ''
+        return self._xml(f'<ListAllMyBucketsResult><Prefix>{escape(prefix)}</Prefix>'
+                         f'<Marker>{escape(marker)}</Marker><MaxKeys>{max_keys}</MaxKeys>'
+                         f'<IsTruncated>{str(truncated).lower()}</IsTruncated>{next_marker}'
+                         f'<Owner><ID>{OWNER}</ID><DisplayName>{OWNER}</DisplayName></Owner>'
+                         f'<Buckets>{buckets}</Buckets></ListAllMyBucketsResult>')
+
+    def _list_objects(self, bucket: BucketState,
+                      params: httpx.QueryParams) -> Tuple[int, Dict[str, str], bytes]:
+        prefix = params.get('prefix', '')
+        marker = params.get('marker', '')
+        delimiter = params.get('delimiter', '')
+        max_keys = min(int(params.get('max-keys') or 100), MAX_KEYS)
+        encode = params.get('encoding-type') == 'url'
+        keys = bucket.keys()
+        contents, prefixes = [], []
+        last, truncated = '', False
+        start = bisect_left(keys, prefix)
+        if marker:
+            start = max(start, bisect_right(keys, marker))
+        for key in keys[start:]:
+            if not key.startswith(prefix):
+                break
+            common = None
+            if delimiter:
+                pos = key.find(delimiter, len(prefix))
+                if pos >= 0:
+                    common = key[:pos + len(delimiter)]
+                    if common <= marker or (prefixes and prefixes[-1] == common):
+                        continue
+            if len(contents) + len(prefixes) >= max_keys:
+                truncated = True
+                break
+            if common is None:
+                contents.append(key)
+                last = key
+            else:
+                prefixes.append(common)
+                last = common
+        value = (lambda s: quote(s, safe='/')) if encode else escape
+        items = []
+        for key in contents:
+            obj = bucket.objects[key]
+            items.append(f'<Contents><Key>{value(key)}</Key>'
+                         f'<LastModified>{_iso_date(obj.modified)}</LastModified>'
+                         f'<ETag>{obj.etag}</ETag><Type>{obj.type}</Type>'
+                         f'<Size>{len(obj.data)}</Size>'
+                         f'<StorageClass>{bucket.storage_class}</StorageClass>'
+                         f'<Owner><ID>{OWNER}</ID><DisplayName>{OWNER}</DisplayName></Owner>'
+                         '</Contents>')
+        items.extend(f'<CommonPrefixes><Prefix>{value(p)}</Prefix></CommonPrefixes>'
+                     for p in prefixes)
+        next_marker = f'<NextMarker>{value(last)}</NextMarker>' if truncated else ''
+        encoding = '<EncodingType>url</EncodingType>' if encode else ''
+        return self._xml(f'<ListBucketResult><Name>{bucket.name}</Name>'
+                         f'<Prefix>{value(prefix)}</Prefix><Marker>{value(marker)}</Marker>'
+                         f'<MaxKeys>{max_keys}</MaxKeys><Delimiter>{value(delimiter)}</Delimiter>'
+                         f'{encoding}<IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                         f'{next_marker}{"".join(items)}</ListBucketResult>')
+
+    def _delete_objects(self, request: httpx.Request, bucket: BucketState,
+                        params: httpx.QueryParams) -> Tuple[int, Dict[str, str], bytes]:
+        self._check_md5(request, hashlib.md5(request.content).digest())
+        try:
+            root = ElementTree.fromstring(request.content)
+        except ElementTree.ParseError:
+            raise OssError(400, 'MalformedXML', 'The XML you provided was not well-formed.')
+        keys = [node.findtext('Key', '') for node in root.iterfind('Object')]
+        if not 0 < len(keys) <= MAX_KEYS:
+            raise OssError(400, 'MalformedXML', f'Delete 1~{MAX_KEYS} objects at a time.')
+        for key in keys:
+            bucket.delete(key)
+        if root.findtext('Quiet', 'false').lower() == 'true':
+            return self._xml('<DeleteResult></DeleteResult>')
+        encode = params.get('encoding-type') == 'url'
+        value = quote if encode else escape
+        deleted = ''.join(f'<Deleted><Key>{value(key)}</Key></Deleted>' for key in keys)
+        encoding = '<EncodingType>url</EncodingType>' if encode else ''
+        return self._xml(f'<DeleteResult>{encoding}{deleted}</DeleteResult>')
+
+    # 文件
+
+    def _object_headers(self, obj: StoredObject) -> Dict[str, str]:
+        headers = dict(obj.headers)
+        headers.update({'ETag': obj.etag, 'Last-Modified': _http_date(obj.modified),
+                        'x-oss-object-type': obj.type, 'Accept-Ranges': 'bytes'})
+        if obj.type == 'Appendable':
+            headers['x-oss-next-append-position'] = str(len(obj.data))
+        return self._crc_header(headers, obj.crc)
+
+    def _put(self, request: httpx.Request, bucket: BucketState,
+             key: str) -> Tuple[int, Dict[str, str], bytes]:
+        data = request.content
+        digest = hashlib.md5(data).digest()
+        self._check_md5(request, digest)
+        obj = StoredObject(data, _etag([digest]), self._checksum(data), 'Normal',
+                           self._stored_headers(request))
+        bucket.put(key, obj)
+        return 200, self._crc_header({'ETag': obj.etag, 'Content-MD5': base64.b64encode(
+            digest).decode('utf8')}, obj.crc), b''
+
+    def _source(self, request: httpx.Request, prefix: str = 'x-oss-copy-source') -> StoredObject:
+        """拷贝源文件 同时检查x-oss-copy-source-if-match"""
+        source = unquote(request.headers[prefix]).lstrip('/')
+        name, _, key = source.partition('/')
+        obj = self._object(self._bucket(name), key)
+        if_match = request.headers.get(f'{prefix}-if-match')
+        if if_match is not None and if_match != obj.etag:
+            raise OssError(412, 'PreconditionFailed', 'At least one of the pre-conditions '
+                                                      'you specified did not hold.')
+        return obj
+
+    def _copy(self, request: httpx.Request, bucket: BucketState,
+              key: str) -> Tuple[int, Dict[str, str], bytes]:
+        source = self._source(request)
+        headers = source.headers
+        if request.headers.get('x-oss-metadata-directive', 'COPY').upper() == 'REPLACE':
+            headers = self._stored_headers(request)
+        obj = StoredObject(source.data, source.etag, source.crc, 'Normal', dict(headers))
+        bucket.put(key, obj)
+        return self._xml(f'<CopyObjectResult><ETag>{obj.etag}</ETag>'
+                         f'<LastModified>{_iso_date(obj.modified)}</LastModified>'
+                         '</CopyObjectResult>', self._crc_header({'ETag': obj.etag}, obj.crc))
+
+    def _get(self, request: httpx.Request, bucket: BucketState, key: str,
+             params: httpx.QueryParams) -> Tuple[int, Dict[str, str], bytes]:
+        obj = self._object(bucket, key)
+        if 'objectMeta' in params:
+            return 200, {'ETag': obj.etag, 'Content-Length': str(len(obj.data)),
+                         'Last-Modified': _http_date(obj.modified)}, b''
+        headers = self._object_headers(obj)
+        if_match = request.headers.get('If-Match')
+        if if_match is not None and if_match != obj.etag:
+            raise OssError(412, 'PreconditionFailed', 'At least one of the pre-conditions '
+                                                      'you specified did not hold.')
+        if request.headers.get('If-None-Match') == obj.etag:
+            return 304, {'ETag': obj.etag, 'Last-Modified': headers['Last-Modified']}, b''
+        value = request.headers.get('Range')
+        size = len(obj.data)
+        span = _parse_range(value, size) if value else None
+        if span is None:
+            return 200, headers, obj.data
+        start, end = span
+        if start >= size:
+            raise OssError(416, 'InvalidRange', 'The requested range cannot be satisfied.',
+                           **{'Content-Range': f'bytes */{size}'})
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return 206, headers, obj.data[start:end + 1]
+
+    def _append(self, request: httpx.Request, bucket: BucketState, key: str,
+                params: httpx.QueryParams) -> Tuple[int, Dict[str, str], bytes]:
+        position = int(params.get('position') or 0)
+        obj = bucket.objects.get(key)
+        if obj is not None and obj.type != 'Appendable':
+            raise OssError(409, 'ObjectNotAppendable', 'The object is not appendable.')
+        size = len(obj.data) if obj is not None else 0
+        if position != size:
+            raise OssError(409, 'PositionNotEqualToLength', 'Position is not equal to file '
+                                                            'length.',
+                           **{'x-oss-next-append-position': str(size)})
+        data = request.content
+        self._check_md5(request, hashlib.md5(data).digest())
+        if obj is None:
+            obj = StoredObject(b'', '', 0 if self.crc else None, 'Appendable',
+                               self._stored_headers(request))
+        crc = _crc.crc64(data, obj.crc) if obj.crc is not None else None
+        whole = obj.data + data
+        obj = StoredObject(whole, _etag([hashlib.md5(whole).digest()]), crc, 'Appendable',
+                           obj.headers)
+        bucket.put(key, obj)
+        return 200, self._crc_header({'ETag': obj.etag,
+                                      'x-oss-next-append-position': str(len(whole))}, crc), b''
+
+    # 分片上传
+
+    def _initiate(self, request: httpx.Request, bucket: BucketState,
+                  key: str) -> Tuple[int, Dict[str, str], bytes]:
+        upload_id = hashlib.md5(f'{bucket.name}/{key}/{self.requests}'.encode('utf8')).hexdigest()
+        self.uploads[upload_id] = Upload(bucket.name, key, self._stored_headers(request))
+        return self._xml(f'<InitiateMultipartUploadResult><Bucket>{bucket.name}</Bucket>'
+                         f'<Key>{escape(key)}</Key><UploadId>{upload_id}</UploadId>'
+                         '</InitiateMultipartUploadResult>')
+
+    def _multipart_request(self, request: httpx.Request, bucket: BucketState, key: str,
+                           method: str, params: httpx.QueryParams
+                           ) -> Tuple[int, Dict[str, str], bytes]:
+        upload_id = params['uploadId']
+        upload = self.uploads.get(upload_id)
+        if upload is None or upload.bucket != bucket.name or upload.key != key:
+            raise OssError(404, 'NoSuchUpload', 'The specified upload does not exist.')
+        if method == 'PUT' and 'partNumber' in params:
+            number = int(params['partNumber'])
+            if not 1 <= number <= 10000:
+                raise OssError(400, 'InvalidArgument', 'Part number must be 1~10000.')
+            if 'x-oss-copy-source' in request.headers:
+                return self._upload_part_copy(request, upload, number)
+            data = request.content
+            part = Part(data, self._checksum(data))
+            self._check_md5(request, part.digest)
+            upload.parts[number] = part
+            return 200, self._crc_header({'ETag': part.etag}, part.crc), b''
+        if method == 'POST':
+            return self._complete(request, bucket, upload_id, upload)
+        if method == 'DELETE':
+            del self.uploads[upload_id]
+            return 204, {}, b''
+        if method == 'GET':
+            return self._list_parts(bucket, upload_id, upload, params)
+        raise OssError(405, 'MethodNotAllowed', f'{method} is not allowed.')
+
+    def _upload_part_copy(self, request: httpx.Request, upload: Upload,
+                          number: int) -> Tuple[int, Dict[str, str], bytes]:
+        source = self._source(request)
+        data = source.data
+        value = request.headers.get('x-oss-copy-source-range')
+        if value:
+            span = _parse_range(value, len(data))
+            if span is None or span[0] >= len(data):
+                raise OssError(400, 'InvalidArgument', f'Invalid copy range {value}.')
+            data = data[span[0]:span[1] + 1]
+        part = Part(data, self._checksum(data))
+        upload.parts[number] = part
+        return self._xml(f'<CopyPartResult><LastModified>{_iso_date(part.modified)}'
+                         f'</LastModified><ETag>{part.etag}</ETag></CopyPartResult>',
+                         self._crc_header({}, part.crc))
+
+    def _complete(self, request: httpx.Request, bucket: BucketState, upload_id: str,
+                  upload: Upload) -> Tuple[int, Dict[str, str], bytes]:
+        try:
+            root = ElementTree.fromstring(request.content)
+        except ElementTree.ParseError:
+            raise OssError(400, 'MalformedXML', 'The XML you provided was not well-formed.')
+        numbers = [(int(node.findtext('PartNumber', '0')), node.findtext('ETag', ''))
+                   for node in root.iterfind('Part')]
+        if not numbers or any(a[0] >= b[0] for a, b in zip(numbers, numbers[1:])):
+            raise OssError(400, 'InvalidPartOrder', 'The list of parts was not in '
+                                                    'ascending order.')
+        parts = []
+        for number, etag in numbers:
+            part = upload.parts.get(number)
+            if part is None or part.etag != etag:
+                raise OssError(400, 'InvalidPart', f'Part {number} could not be found.')
+            parts.append(part)
+        if any(len(part.data) < self.min_part_size for part in parts[:-1]):
+            raise OssError(400, 'EntityTooSmall', 'Your proposed upload is smaller than the '
+                                                  'minimum allowed size.')
+        crc = None
+        if self.crc:
+            crc = parts[0].crc
+            for part in parts[1:]:
+                crc = _crc.crc64_combine(crc, part.crc, len(part.data))
+        obj = StoredObject(b''.join(part.data for part in parts),
+                           _etag([part.digest for part in parts], len(parts)), crc,
+                           'Multipart', upload.headers)
+        bucket.put(upload.key, obj)
+        del self.uploads[upload_id]
+        return self._xml(f'<CompleteMultipartUploadResult><Bucket>{bucket.name}</Bucket>'
+                         f'<Key>{escape(upload.key)}</Key><ETag>{obj.etag}</ETag>'
+                         '</CompleteMultipartUploadResult>',
+                         self._crc_header({'ETag': obj.etag}, crc))
+
+    def _list_parts(self, bucket: BucketState, upload_id: str, upload: Upload,
+                    params: httpx.QueryParams) -> Tuple[int, Dict[str, str], bytes]:
+        marker = int(params.get('part-number-marker') or 0)
+        max_parts = min(int(params.get('max-parts') or 1000), 1000)
+        numbers = [n for n in sorted(upload.parts) if n > marker]
+        page, truncated = numbers[:max_parts], len(numbers) > max_parts
+        parts = ''.join(f'<Part><PartNumber>{n}</PartNumber>'
+                        f'<LastModified>{_iso_date(upload.parts[n].modified)}</LastModified>'
+                        f'<ETag>{upload.parts[n].etag}</ETag>'
+                        f'<Size>{len(upload.parts[n].data)}</Size></Part>' for n in page)
+        return self._xml(f'<ListPartsResult><Bucket>{bucket.name}</Bucket>'
+                         f'<Key>{escape(upload.key)}</Key><UploadId>{upload_id}</UploadId>'
+                         f'<PartNumberMarker>{marker}</PartNumberMarker>'
+                         f'<NextPartNumberMarker>{page[-1] if page else marker}'
+                         f'</NextPartNumberMarker><MaxParts>{max_parts}</MaxParts>'
+                         f'<IsTruncated>{str(truncated).lower()}</IsTruncated>{parts}'
+                         '</ListPartsResult>')
@@ -0,0 +1,117 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> limiter
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/10 2:15 下午
+@Desc   ：根据限流响应自动调整的并发控制
+==================================================
+"""
+import asyncio
+from collections import deque
+
+
+class LimiterJob:
+    """一次批量任务期间的并发统计 with语句结束时记录最终的并发上限"""
+    __slots__ = ('limiter', 'name', 'limit', 'requests', 'throttled')
+
+    def __init__(self, limiter: 'AdaptiveLimiter', name: str = ''):
+        self.limiter = limiter
+        self.name = name
+        self.limit = limiter.limit
+        self.requests = 0
+        self.throttled = 0
+
+    def __enter__(self) -> 'LimiterJob':
+        self.requests = -self.limiter.requests
+        self.throttled = -self.limiter.throttled
+        return self
+
+    def __exit__(self, *args):
+        self.limit = self.limiter.limit
+        self.requests += self.limiter.requests
+        self.throttled += self.limiter.throttled
+
+    def __repr__(self):
+        return (f'<LimiterJob {self.name!r} limit={self.limit} '
+                f'requests={self.requests} throttled={self.throttled}>')
+
+
+class AdaptiveLimiter:
+    """AIMD(加性增 乘性减)并发控制器 可由多个异步客户端通过AsyncSession共用
+    请求成功且延迟正常时每个完整窗口把上限加1 收到503/429或超时时把上限乘以decrease
+    同一时刻发出的请求被限流只会降低一次 避免并发请求同时失败导致上限骤降
+    async with AsyncSession(limiter=AdaptiveLimiter()) as session:
+        with session.limiter.job('cleanup') as job:
+            await ObjectAsyncClient(auth, session).delete_many(keys, concurrency=64)
+        print(job.limit)
+    """
+
+    def __init__(self, initial: int = 16, min_limit: int = 1, max_limit: int = 256,
+                 decrease: float = 0.5, latency_target: float = None):
+        """
+        :param initial: 初始并发上限
+        :param min_limit: 并发上限的下界
+        :param max_limit: 并发上限的上界
+        :param decrease: 被限流时上限乘以的系数
+        :param latency_target: 延迟超过该秒数时不再增加上限
+        """
+        self._limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self._epoch = 0
+        self._waiters = deque()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    async def acquire(self) -> int:
+        """等待空闲的并发名额 返回当前的调整轮次 需要传给release"""
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                else:
+                    self._wake()
+                raise
+        self.in_flight += 1
+        return self._epoch
+
+    def release(self, epoch: int, latency: float, throttled: bool = False) -> None:
+        """归还名额并根据结果调整上限
+        :param epoch: acquire返回的轮次
+        :param latency: 请求耗时秒数
+        :param throttled: 是否被限流(503/429/超时)
+        """
+        self.in_flight -= 1
+        self.requests += 1
+        if throttled:
+            self.throttled += 1
+            if epoch == self._epoch:
+                self._epoch += 1
+                self._limit = max(self.min_limit, self._limit * self.decrease)
+        elif self.latency_target is None or latency <= self.latency_target:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        self._wake()
+
+    def _wake(self) -> None:
+        available = self.limit - self.in_flight
+        while available > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                available -= 1
+
+    def job(self, name: str = '') -> LimiterJob:
+        """统计一次批量任务 with语句结束后LimiterJob.limit为最终的并发上限"""
+        return LimiterJob(self, name)
@@ -0,0 +1,302 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> metrics
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/19 10:15 上午
+@Desc   ：请求耗时统计 通过Session的hooks接收每个请求的RequestEvent
+==================================================
+"""
+import math
+import time
+import threading
+from typing import Dict, List, Optional
+from urllib.parse import unquote
+import httpx
+
+# httpcore trace事件名到阶段的映射 connect包含DNS解析 httpcore不单独区分
+PHASES = {
+    'connection.connect_tcp': 'connect',
+    'connection.connect_unix_socket': 'connect',
+    'connection.start_tls': 'tls',
+    'http11.send_request_headers': 'send',
+    'http11.send_request_body': 'send',
+    'http2.send_request_headers': 'send',
+    'http2.send_request_body': 'send',
+    'http11.receive_response_headers': 'wait',
+    'http2.receive_response_headers': 'wait',
+    'http11.receive_response_body': 'receive',
+    'http2.receive_response_body': 'receive',
+}
+
+# (方法, 子资源) -> 操作名 子资源为None时按是否有文件路径区分
+_OPERATIONS = {
+    ('HEAD', 'objectMeta'): 'GetObjectMeta',
+    ('GET', 'tagging'): 'GetObjectTagging',
+    ('GET', 'symlink'): 'GetSymlink',
+    ('GET', 'uploadId'): 'ListParts',
+    ('GET', 'uploads'): 'ListMultipartUploads',
+    ('GET', 'bucketInfo'): 'GetBucketInfo',
+    ('GET', 'location'): 'GetBucketLocation',
+    ('GET', 'worm'): 'GetBucketWorm',
+    ('PUT', 'partNumber'): 'UploadPart',
+    ('PUT', 'tagging'): 'PutObjectTagging',
+    ('PUT', 'symlink'): 'PutSymlink',
+    ('POST', 'append'): 'AppendObject',
+    ('POST', 'uploads'): 'InitiateMultipartUpload',
+    ('POST', 'uploadId'): 'CompleteMultipartUpload',
+    ('POST', 'delete'): 'DeleteMultipleObjects',
+    ('POST', 'restore'): 'RestoreObject',
+    ('POST', 'worm'): 'InitiateBucketWorm',
+    ('POST', 'wormId'): 'CompleteBucketWorm',
+    ('POST', 'wormExtend'): 'ExtendBucketWorm',
+    ('DELETE', 'uploadId'): 'AbortMultipartUpload',
+    ('DELETE', 'tagging'): 'DeleteObjectTagging',
+    ('DELETE', 'worm'): 'AbortBucketWorm',
+}
+_SUBRESOURCES = ('partNumber', 'uploadId', 'uploads', 'append', 'objectMeta', 'tagging',
+                 'symlink', 'restore', 'delete', 'acl', 'bucketInfo', 'location',
+                 'wormExtend', 'wormId', 'worm')
+
+
+def operation_name(request: httpx.Request) -> str:
+    """根据请求推断OSS操作名 可以通过request.extensions['oss_operation']指定"""
+    name = request.extensions.get('oss_operation')
+    if name:
+        return name
+    method = request.method
+    params = request.url.params
+    has_key = request.url.path not in ('', '/')
+    process = params.get('x-oss-process', '')
+    if process.endswith('/select'):
+        return 'SelectObject'
+    if process.endswith('/meta'):
+        return 'CreateSelectObjectMeta'
+    sub = next((s for s in _SUBRESOURCES if s in params), None)
+    if sub == 'acl':
+        return f'{method.capitalize()}{"Object" if has_key else "Bucket"}Acl'
+    if sub is not None:
+        name = _OPERATIONS.get((method, sub))
+        if name == 'UploadPart' and 'x-oss-copy-source' in request.headers:
+            return 'UploadPartCopy'
+        if name:
+            return name
+    if method == 'PUT' and has_key:
+        return 'CopyObject' if 'x-oss-copy-source' in request.headers else 'PutObject'
+    if has_key:
+        return {'GET': 'GetObject', 'HEAD': 'HeadObject', 'DELETE': 'DeleteObject'}.get(
+            method, method)
+    return {'GET': 'ListObjects', 'PUT': 'PutBucket', 'DELETE': 'DeleteBucket'}.get(
+        method, method)
+
+
+class _CountingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """统计没有Content-Length的流式请求体实际发送的字节数 重新读取时从0开始计数"""
+
+    def __init__(self, stream, event: 'RequestEvent'):
+        self._stream = stream
+        self._event = event
+
+    def __iter__(self):
+        self._event.bytes_sent = 0
+        for chunk in self._stream:
+            self._event.bytes_sent += len(chunk)
+            yield chunk
+
+    async def __aiter__(self):
+        self._event.bytes_sent = 0
+        async for chunk in self._stream:
+            self._event.bytes_sent += len(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        if isinstance(self._stream, httpx.SyncByteStream):
+            self._stream.close()
+
+    async def aclose(self) -> None:
+        if isinstance(self._stream, httpx.AsyncByteStream):
+            await self._stream.aclose()
+
+
+class RequestEvent:
+    """一次client.send的结果 包括所有重试
+    phases为各阶段累计秒数 connect tls send wait(首字节) receive
+    stream=True的请求在返回响应时即发出事件 receive不包含之后读取响应体的时间
+    bytes_received此时为Content-Length
+    bytes_sent为Content-Length 流式上传(分块编码)时为最后一次发送实际读取的字节数
+    """
+    __slots__ = ('operation', 'method', 'bucket', 'key', 'status', 'attempts', 'bytes_sent',
+                 'bytes_received', 'elapsed', 'phases', 'error', '_start', '_started')
+
+    def __init__(self, request: httpx.Request, bucket: str):
+        self.operation = operation_name(request)
+        self.method = request.method
+        self.bucket = bucket
+        self.key = unquote(request.url.path.lstrip('/'))
+        self.status = None
+        self.attempts = 0
+        self.bytes_sent = int(request.headers.get('Content-Length') or 0)
+        if 'Content-Length' not in request.headers and not isinstance(request.stream,
+                                                                      httpx.ByteStream):
+            request.stream = _CountingStream(request.stream, self)
+        self.bytes_received = 0
+        self.elapsed = 0.0
+        self.phases = {}
+        self.error = None
+        self._start = time.perf_counter()
+        self._started = {}
+
+    @property
+    def retries(self) -> int:
+        return max(self.attempts - 1, 0)
+
+    def trace(self, name: str, info: dict) -> None:
+        """httpx的trace扩展 记录各阶段耗时"""
+        base, _, state = name.rpartition('.')
+        phase = PHASES.get(base)
+        if phase is None:
+            return
+        if state == 'started':
+            self._started[base] = time.perf_counter()
+        else:
+            start = self._started.pop(base, None)
+            if start is not None:
+                self.phases[phase] = self.phases.get(phase, 0.0) + time.perf_counter() - start
+
+    async def atrace(self, name: str, info: dict) -> None:
+        self.trace(name, info)
+
+    def finish(self, resp: Optional[httpx.Response], stream: bool,
+               error: BaseException = None) -> 'RequestEvent':
+        self.elapsed = time.perf_counter() - self._start
+        self._started = {}
+        if error is not None:
+            self.error = error
+        elif resp is not None:
+            self.status = resp.status_code
+            if stream:
+                self.bytes_received = int(resp.headers.get('Content-Length') or 0)
+            else:
+                self.bytes_received = len(resp.content)
+        return self
+
+    def __repr__(self):
+        return (f'<RequestEvent {self.operation} {self.status} {self.elapsed * 1000:.1f}ms '
+                f'attempts={self.attempts}>')
+
+
+class Histogram:
+    """按对数分桶的直方图 内存与样本数无关 分位数的相对误差不超过growth-1"""
+    __slots__ = ('count', 'total', 'min', 'max', '_buckets', '_lowest', '_log_growth')
+
+    def __init__(self, growth: float = 1.05, lowest: float = 1e-6):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._buckets = {}
+        self._lowest = lowest
+        self._log_growth = math.log(growth)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        index = 0 if value <= self._lowest else math.ceil(
+            math.log(value / self._lowest) / self._log_growth)
+        self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def percentile(self, q: float) -> float:
+        """q为0~100 返回所在桶的上界 不超过实际最大值"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * q / 100))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= rank:
+                return min(self._lowest * math.exp(index * self._log_growth), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> Dict[str, float]:
+        return {'count': self.count, 'mean': self.mean, 'p50': self.percentile(50),
+                'p90': self.percentile(90), 'p99': self.percentile(99), 'max': self.max}
+
+
+class OperationStats:
+    __slots__ = ('count', 'errors', 'retries', 'bytes_sent', 'bytes_received', 'statuses',
+                 'latency', 'phases')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.statuses = {}
+        self.latency = Histogram()
+        self.phases = {}
+
+    def add(self, event: RequestEvent) -> None:
+        self.count += 1
+        self.retries += event.retries
+        self.bytes_sent += event.bytes_sent
+        self.bytes_received += event.bytes_received
+        if event.error is not None or (event.status or 0) >= 400:
+            self.errors += 1
+        if event.status is not None:
+            self.statuses[event.status] = self.statuses.get(event.status, 0) + 1
+        self.latency.add(event.elapsed)
+        for phase, seconds in event.phases.items():
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.add(seconds)
+
+
+class MetricsAggregator:
+    """在内存中按操作名聚合RequestEvent 可以直接作为hook使用 线程安全
+    metrics = MetricsAggregator()
+    with Session(hooks=[metrics]) as session:
+        ...
+    print(metrics.report())
+    """
+
+    def __init__(self):
+        self.operations = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent) -> None:
+        with self._lock:
+            stats = self.operations.get(event.operation)
+            if stats is None:
+                stats = self.operations[event.operation] = OperationStats()
+            stats.add(event)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.operations = {}
+
+    def summary(self) -> Dict[str, dict]:
+        """{操作名: 统计} 耗时单位为秒"""
+        with self._lock:
+            return {name: {'count': s.count, 'errors': s.errors, 'retries': s.retries,
+                           'bytes_sent': s.bytes_sent, 'bytes_received': s.bytes_received,
+                           'statuses': dict(s.statuses), 'latency': s.latency.summary(),
+                           'phases': {p: h.summary() for p, h in s.phases.items()}}
+                    for name, s in self.operations.items()}
+
+    def report(self) -> str:
+        lines: List[str] = [f'{"operation":<26}{"count":>8}{"errors":>8}{"retries":>8}'
+                            f'{"p50 ms":>10}{"p99 ms":>10}{"max ms":>10}']
+        for name, stats in sorted(self.summary().items()):
+            latency = stats['latency']
+            lines.append(f'{name:<26}{stats["count"]:>8}{stats["errors"]:>8}'
+                         f'{stats["retries"]:>8}{latency["p50"] * 1000:>10.1f}'
+                         f'{latency["p99"] * 1000:>10.1f}{latency["max"] * 1000:>10.1f}')
+        return '\n'.join(lines)
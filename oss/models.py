@@ -0,0 +1,302 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> models
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/3 3:20 下午
+@Desc   ：OSS接口返回结果的解析
+==================================================
+"""
+from typing import List, Optional
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+
+class ObjectSummary:
+    """ListObjects返回的单个文件 is_prefix为True时表示公共前缀(目录)"""
+    __slots__ = ('key', 'etag', 'size', 'last_modified', 'type',
+                 'storage_class', 'is_prefix')
+
+    def __init__(self, key: str, etag: str = '', size: int = 0,
+                 last_modified: str = '', type: str = '',
+                 storage_class: str = '', is_prefix: bool = False):
+        self.key = key
+        self.etag = etag
+        self.size = size
+        self.last_modified = last_modified
+        self.type = type
+        self.storage_class = storage_class
+        self.is_prefix = is_prefix
+
+    def __repr__(self):
+        return f'<ObjectSummary {self.key!r} size={self.size}>'
+
+
+class ListObjectsResult:
+    """ListObjects单页结果"""
+    __slots__ = ('objects', 'prefixes', 'is_truncated', 'next_marker')
+
+    def __init__(self, objects: List[ObjectSummary], prefixes: List[ObjectSummary],
+                 is_truncated: bool = False, next_marker: str = ''):
+        self.objects = objects
+        self.prefixes = prefixes
+        self.is_truncated = is_truncated
+        self.next_marker = next_marker
+
+    def entries(self) -> List[ObjectSummary]:
+        """按Key排序合并文件和公共前缀"""
+        if not self.prefixes:
+            return self.objects
+        return sorted(self.objects + self.prefixes, key=lambda x: x.key)
+
+
+def _list_objects_result(objects: List[ObjectSummary], prefixes: List[ObjectSummary],
+                         is_truncated: bool, next_marker: str) -> ListObjectsResult:
+    if is_truncated and not next_marker:
+        last = objects + prefixes
+        next_marker = max(x.key for x in last) if last else ''
+    return ListObjectsResult(objects, prefixes, is_truncated, next_marker)
+
+
+def parse_list_objects(content: bytes) -> ListObjectsResult:
+    """解析已完整读取的ListObjects(GetBucket)响应 EncodingType为url时自动解码Key
+    响应体已在内存中时C实现的fromstring最快 流式读取时使用ListObjectsParser
+    """
+    root = ElementTree.fromstring(content)
+    decode = unquote if root.findtext('EncodingType') == 'url' else str
+    objects = [ObjectSummary(decode(node.findtext('Key', '')),
+                             node.findtext('ETag', ''),
+                             int(node.findtext('Size', '0')),
+                             node.findtext('LastModified', ''),
+                             node.findtext('Type', ''),
+                             node.findtext('StorageClass', ''))
+               for node in root.iterfind('Contents')]
+    prefixes = [ObjectSummary(decode(node.text or ''), is_prefix=True)
+                for node in root.iterfind('CommonPrefixes/Prefix')]
+    is_truncated = root.findtext('IsTruncated') == 'true'
+    next_marker = decode(root.findtext('NextMarker') or '')
+    return _list_objects_result(objects, prefixes, is_truncated, next_marker)
+
+
+class ListObjectsParser:
+    """增量解析ListObjects响应 可以边接收边解析
+    每个Contents解析完成后立即清空 不保留完整的xml树和响应体
+    parser = ListObjectsParser()
+    for chunk in resp.iter_bytes():
+        parser.feed(chunk)
+    page = parser.close()
+    """
+
+    def __init__(self):
+        self._parser = ElementTree.XMLPullParser(('end',))
+        self._fields = {}
+        self.objects = []
+        self.prefixes = []
+
+    def _drain(self) -> None:
+        objects = self.objects
+        for _, node in self._parser.read_events():
+            tag = node.tag
+            if tag == 'Contents':
+                objects.append(ObjectSummary(node.findtext('Key', ''),
+                                             node.findtext('ETag', ''),
+                                             int(node.findtext('Size', '0')),
+                                             node.findtext('LastModified', ''),
+                                             node.findtext('Type', ''),
+                                             node.findtext('StorageClass', '')))
+                node.clear()
+            elif tag == 'CommonPrefixes':
+                self.prefixes.append(ObjectSummary(node.findtext('Prefix', ''), is_prefix=True))
+                node.clear()
+            elif tag in ('EncodingType', 'IsTruncated', 'NextMarker'):
+                self._fields[tag] = node.text or ''
+
+    def feed(self, data: bytes) -> None:
+        self._parser.feed(data)
+        self._drain()
+
+    def close(self) -> ListObjectsResult:
+        self._parser.close()
+        self._drain()
+        # EncodingType不一定出现在Contents之前 结束后统一解码
+        if self._fields.get('EncodingType') == 'url':
+            for entry in self.objects + self.prefixes:
+                entry.key = unquote(entry.key)
+            next_marker = unquote(self._fields.get('NextMarker', ''))
+        else:
+            next_marker = self._fields.get('NextMarker', '')
+        return _list_objects_result(self.objects, self.prefixes,
+                                    self._fields.get('IsTruncated') == 'true', next_marker)
+
+
+class BucketSummary:
+    """ListBuckets(GetService)返回的单个储存桶"""
+    __slots__ = ('name', 'location', 'region', 'creation_date', 'storage_class',
+                 'extranet_endpoint', 'intranet_endpoint')
+
+    def __init__(self, name: str, location: str = '', region: str = '',
+                 creation_date: str = '', storage_class: str = '',
+                 extranet_endpoint: str = '', intranet_endpoint: str = ''):
+        self.name = name
+        self.location = location
+        self.region = region
+        self.creation_date = creation_date
+        self.storage_class = storage_class
+        self.extranet_endpoint = extranet_endpoint
+        self.intranet_endpoint = intranet_endpoint
+
+    def __repr__(self):
+        return f'<BucketSummary {self.name!r} {self.location}>'
+
+
+class ListBucketsResult:
+    """ListBuckets单页结果"""
+    __slots__ = ('buckets', 'owner_id', 'owner_name', 'is_truncated', 'next_marker')
+
+    def __init__(self, buckets: List[BucketSummary], owner_id: str = '', owner_name: str = '',
+                 is_truncated: bool = False, next_marker: str = ''):
+        self.buckets = buckets
+        self.owner_id = owner_id
+        self.owner_name = owner_name
+        self.is_truncated = is_truncated
+        self.next_marker = next_marker
+
+
+def parse_list_buckets(content: bytes) -> ListBucketsResult:
+    root = ElementTree.fromstring(content)
+    buckets = [BucketSummary(node.findtext('Name', ''),
+                             node.findtext('Location', ''),
+                             node.findtext('Region', ''),
+                             node.findtext('CreationDate', ''),
+                             node.findtext('StorageClass', ''),
+                             node.findtext('ExtranetEndpoint', ''),
+                             node.findtext('IntranetEndpoint', ''))
+               for node in root.iterfind('Buckets/Bucket')]
+    return ListBucketsResult(buckets, root.findtext('Owner/ID', ''),
+                             root.findtext('Owner/DisplayName', ''),
+                             root.findtext('IsTruncated') == 'true',
+                             root.findtext('NextMarker', ''))
+
+
+class BucketInfo:
+    """GetBucketInfo的结果"""
+    __slots__ = ('name', 'location', 'creation_date', 'storage_class', 'redundancy_type',
+                 'extranet_endpoint', 'intranet_endpoint', 'acl', 'owner_id', 'owner_name',
+                 'versioning', 'comment')
+
+    def __init__(self, name: str, location: str = '', creation_date: str = '',
+                 storage_class: str = '', redundancy_type: str = '',
+                 extranet_endpoint: str = '', intranet_endpoint: str = '', acl: str = '',
+                 owner_id: str = '', owner_name: str = '', versioning: str = '',
+                 comment: str = ''):
+        self.name = name
+        self.location = location
+        self.creation_date = creation_date
+        self.storage_class = storage_class
+        self.redundancy_type = redundancy_type
+        self.extranet_endpoint = extranet_endpoint
+        self.intranet_endpoint = intranet_endpoint
+        self.acl = acl
+        self.owner_id = owner_id
+        self.owner_name = owner_name
+        self.versioning = versioning
+        self.comment = comment
+
+    def __repr__(self):
+        return f'<BucketInfo {self.name!r} {self.location} {self.storage_class}>'
+
+
+def parse_bucket_info(content: bytes) -> BucketInfo:
+    node = ElementTree.fromstring(content).find('Bucket')
+    if node is None:
+        raise ValueError('GetBucketInfo的响应中没有Bucket节点')
+    return BucketInfo(node.findtext('Name', ''),
+                      node.findtext('Location', ''),
+                      node.findtext('CreationDate', ''),
+                      node.findtext('StorageClass', ''),
+                      node.findtext('DataRedundancyType', ''),
+                      node.findtext('ExtranetEndpoint', ''),
+                      node.findtext('IntranetEndpoint', ''),
+                      node.findtext('AccessControlList/Grant', ''),
+                      node.findtext('Owner/ID', ''),
+                      node.findtext('Owner/DisplayName', ''),
+                      node.findtext('Versioning', ''),
+                      node.findtext('Comment', ''))
+
+
+class AccessControlPolicy:
+    """GetBucketAcl(GetObjectAcl)的结果 grant为访问权限"""
+    __slots__ = ('grant', 'owner_id', 'owner_name')
+
+    def __init__(self, grant: str, owner_id: str = '', owner_name: str = ''):
+        self.grant = grant
+        self.owner_id = owner_id
+        self.owner_name = owner_name
+
+    def __repr__(self):
+        return f'<AccessControlPolicy {self.grant}>'
+
+
+def parse_acl(content: bytes) -> AccessControlPolicy:
+    root = ElementTree.fromstring(content)
+    return AccessControlPolicy(root.findtext('AccessControlList/Grant', ''),
+                               root.findtext('Owner/ID', ''),
+                               root.findtext('Owner/DisplayName', ''))
+
+
+class WormConfiguration:
+    """GetBucketWorm的结果 state为InProgress或Locked"""
+    __slots__ = ('worm_id', 'state', 'retention_days', 'creation_date')
+
+    def __init__(self, worm_id: str, state: str = '', retention_days: int = 0,
+                 creation_date: str = ''):
+        self.worm_id = worm_id
+        self.state = state
+        self.retention_days = retention_days
+        self.creation_date = creation_date
+
+    def __repr__(self):
+        return f'<WormConfiguration {self.worm_id!r} {self.state} {self.retention_days}d>'
+
+
+def parse_worm(content: bytes) -> WormConfiguration:
+    root = ElementTree.fromstring(content)
+    return WormConfiguration(root.findtext('WormId', ''), root.findtext('State', ''),
+                             int(root.findtext('RetentionPeriodInDays') or 0),
+                             root.findtext('CreationDate', ''))
+
+
+class ErrorInfo:
+    """OSS错误响应中的信息"""
+    __slots__ = ('status', 'code', 'message', 'request_id', 'host_id')
+
+    def __init__(self, status: int, code: str, message: str = '', request_id: str = '',
+                 host_id: str = ''):
+        self.status = status
+        self.code = code
+        self.message = message
+        self.request_id = request_id
+        self.host_id = host_id
+
+    def __repr__(self):
+        return f'<ErrorInfo {self.status} {self.code} {self.request_id}>'
+
+
+def parse_error(content: bytes, status: int = 0) -> Optional[ErrorInfo]:
+    """解析错误响应 响应体不是OSS的Error xml时(例如HEAD请求)返回None"""
+    try:
+        root = ElementTree.fromstring(content)
+    except ElementTree.ParseError:
+        return None
+    if root.tag != 'Error':
+        return None
+    return ErrorInfo(status, root.findtext('Code', ''), root.findtext('Message', ''),
+                     root.findtext('RequestId', ''), root.findtext('HostId', ''))
+
+
+def parse_upload_id(content: bytes) -> str:
+    """InitiateMultipartUpload的结果"""
+    upload_id = ElementTree.fromstring(content).findtext('UploadId')
+    if not upload_id:
+        raise ValueError('InitiateMultipartUpload的响应中没有UploadId')
+    return upload_id
@@ -7,48 +7,304 @@
 @Desc   ：
 ==================================================
 """
-import re
+import os
+import math
+import base64
+import hashlib
 import httpx
 import asyncio
-from typing import Union
+import threading
+from itertools import islice
+from functools import partial
+from contextlib import closing
+from urllib.parse import quote, unquote
+from xml.sax.saxutils import escape
+from xml.etree import ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, List, Tuple, Dict, IO, Iterable, AsyncIterable, Callable
 from httpx import Response
 from oss.auth import Auth
+from oss.cache import MetaCache, DiskCache
+from oss import crc as _crc
+from oss.crc import Crc64, check_crc64, content_md5
+from oss.checkpoint import Checkpoint
+from oss.models import parse_error, parse_upload_id
+from oss.select import (SelectStream, SelectFrame, SelectError, FrameDecoder,
+                        select_request, meta_request, request_type, split_ranges, JSON)
+from oss.session import Session, BaseClient, AsyncBaseClient
 
+# 分片上传限制 阿里云文档时间 2020-11-16 10:52
+MIN_PART_SIZE = 100 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MAX_PARTS = 10000
+# 单个分片(包括UploadPartCopy)的最大字节数
+MAX_PART_SIZE = 5 * 1024 ** 3
+# 批量删除单次请求的最大文件数
+MAX_DELETE_KEYS = 1000
+# 流式上传时每次读取的字节数
+STREAM_CHUNK_SIZE = 256 * 1024
+# copy_large的默认分片大小 不超过该大小的文件直接使用copy_object
+COPY_PART_SIZE = 64 * 1024 * 1024
+# CopyObject单次最多拷贝的字节数 更大的文件只能使用UploadPartCopy
+MAX_COPY_SIZE = 1024 ** 3
+# 随文件拷贝的元信息
+COPY_HEADERS = frozenset(('content-type', 'content-encoding', 'content-disposition',
+                          'content-language', 'cache-control', 'expires'))
 
-class ObjectClient:
+
+def _part_size(total: int, part_size: int = None) -> int:
+    """根据文件大小选择分片大小 保证分片数不超过MAX_PARTS"""
+    size = part_size if part_size else DEFAULT_PART_SIZE
+    return max(size, MIN_PART_SIZE, math.ceil(total / MAX_PARTS))
+
+
+def _copy_part_size(total: int, part_size: int = None) -> int:
+    """copy_large的分片大小 不超过UploadPartCopy的上限"""
+    return min(_part_size(total, part_size or COPY_PART_SIZE), MAX_PART_SIZE)
+
+
+def _split_parts(total: int, part_size: int):
+    """按分片大小切分文件 返回(分片号, 偏移, 长度)"""
+    for number, offset in enumerate(range(0, total, part_size), 1):
+        yield number, offset, min(part_size, total - offset)
+
+
+def _read_range(path: str, offset: int, size: int) -> bytes:
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def _remaining(f: IO) -> Union[int, None]:
+    """文件对象从当前位置到末尾的长度 不可seek时返回None"""
+    try:
+        if not f.seekable():
+            return None
+        position = f.tell()
+        end = f.seek(0, os.SEEK_END)
+        f.seek(position)
+        return end - position
+    except (AttributeError, OSError):
+        return None
+
+
+def _iter_file(f: IO, chunk_size: int):
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _iter_path(path: str, chunk_size: int):
+    with open(path, 'rb') as f:
+        yield from _iter_file(f, chunk_size)
+
+
+async def _aiter_file(f: IO, chunk_size: int):
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, f.read, chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _aiter_path(path: str, chunk_size: int):
+    loop = asyncio.get_running_loop()
+    f = await loop.run_in_executor(None, open, path, 'rb')
+    try:
+        async for chunk in _aiter_file(f, chunk_size):
+            yield chunk
+    finally:
+        f.close()
+
+
+async def _aiter(iterable: Iterable[bytes]):
+    for chunk in iterable:
+        yield chunk
+
+
+def _batches(keys: Iterable[str], size: int):
+    keys = iter(keys)
+    while True:
+        batch = list(islice(keys, size))
+        if not batch:
+            break
+        yield batch
+
+
+def _delete_failures(batch: List[str], resp: Response) -> Dict[str, str]:
+    """根据详细模式的响应找出未删除的文件"""
+    if resp.is_error:
+        error = parse_error(resp.content, resp.status_code)
+        reason = error.code if error else f'HTTP {resp.status_code}'
+        return {key: reason for key in batch}
+    root = ElementTree.fromstring(resp.content)
+    deleted = {unquote(node.text or '') for node in root.iterfind('Deleted/Key')}
+    return {key: 'NotDeleted' for key in batch if key.lstrip('/') not in deleted}
+
+
+class _RangeFile:
+    """预分配大小的本地文件 各分段直接写入自己的偏移位置"""
+
+    def __init__(self, path: str, size: int, truncate: bool = True):
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        if truncate:
+            flags |= os.O_TRUNC
+        self.fd = os.open(path, flags, 0o644)
+        self.lock = threading.Lock()
+        os.ftruncate(self.fd, size)
+
+    def write(self, offset: int, data: bytes) -> None:
+        view = memoryview(data)
+        if hasattr(os, 'pwrite'):
+            while view:
+                n = os.pwrite(self.fd, view, offset)
+                view, offset = view[n:], offset + n
+            return
+        with self.lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            while view:
+                view = view[os.write(self.fd, view):]
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _check_length(received: int, size: int) -> None:
+    if received != size:
+        raise IOError(f'分段长度不一致 期望{size} 实际{received}')
+
+
+def _check_crc(crc: Crc64, resp: Response) -> Response:
+    return check_crc64(resp, crc.crc)
+
+
+def _check_content(resp: Response) -> Response:
+    """完整文件的响应才能与x-oss-hash-crc64ecma比较"""
+    if resp.status_code == 200:
+        check_crc64(resp, _crc.crc64(resp.content))
+    return resp
+
+
+class ObjectClient(BaseClient):
     """object行为的同步方法"""
 
-    def __init__(self, auth: Auth):
-        self.auth = auth
-        self.client = httpx.Client()
+    def __init__(self, auth: Auth, session: Session = None, meta_cache: MetaCache = None,
+                 disk_cache: DiskCache = None, verify: bool = None):
+        """
+        :param auth: 签名使用的Auth
+        :param session: 共用的连接池 未传入时使用独占的连接池
+        :param meta_cache: head_object/get_object_meta的缓存 默认不缓存
+        :param disk_cache: get_object的磁盘缓存 默认不缓存
+        :param verify: 是否校验上传下载的数据 False时关闭
+            默认对字节数据上传附带Content-MD5 并校验CRC64
+            安装了crcmod的C扩展时CRC64由crcmod计算 否则使用纯python实现(约5MB/s)
+            可以通过oss.crc.FAST判断 大文件传输较慢时安装crcmod或传入False关闭
+        """
+        super().__init__(auth, session)
+        self.meta_cache = meta_cache
+        self.disk_cache = disk_cache
+        self.verify = verify is not False
+        self.verify_crc = self.verify
+
+    def _cached_meta(self, target: str, op: str, url: str, **kwargs):
+        """带缓存的HEAD请求 自定义了请求参数时不使用缓存"""
+        cache = self.meta_cache
+        if cache is None or kwargs:
+            return self.send(self.build_request('HEAD', url, **kwargs))
+        key = (self.auth.bucket, target.lstrip('/'), op)
+        resp = cache.get(key)
+        if resp is not None:
+            return self._cached(resp)
+        version = cache.version
+
+        def remember(r: Response) -> Response:
+            if r.status_code == 200:
+                cache.set(key, r, version)
+            return r
+        return self._after(self.send(self.build_request('HEAD', url)), remember)
 
-    def __del__(self):
-        if not self.client.is_closed:
-            self.client.close()
+    @staticmethod
+    def _cached(resp: Response):
+        return resp
+
+    def _changed(self, resp, *targets: str):
+        """写操作完成后使对应文件的元信息缓存失效"""
+        cache = self.meta_cache
+        if cache is None:
+            return resp
+        bucket = self.auth.bucket
+
+        def invalidate(r: Response) -> Response:
+            for target in targets:
+                cache.invalidate(bucket, target.lstrip('/'))
+            return r
+        return self._after(resp, invalidate)
+
+    @staticmethod
+    def _crc_stream(content: Iterable[bytes], crc: Crc64) -> Iterable[bytes]:
+        """在发送的同时计算CRC64"""
+        for chunk in content:
+            crc.update(chunk)
+            yield chunk
 
-    def build_request(self, *args, **kwargs) -> httpx.Request:
-        return self.client.build_request(*args, **kwargs)
+    def _check_parts(self, resp: Response, parts: List[Tuple[int, int]]) -> None:
+        """合并各分片(分段)按顺序排列的(CRC64, 长度) 与整个文件的CRC64比较"""
+        if not self.verify_crc or any(crc is None for crc, _ in parts):
+            return
+        total = Crc64()
+        for crc, size in parts:
+            total.combine(crc, size)
+        check_crc64(resp, total.crc)
 
-    def put_object(self, target: str, file: Union[str, bytes],
-                   **kwargs) -> Response:
+    def _stream_body(self, file) -> Tuple[Iterable[bytes], Union[int, None]]:
+        """把上传数据转换为分块读取的迭代器 同时返回数据长度(未知时为None)"""
+        if isinstance(file, str):
+            return _iter_path(file, STREAM_CHUNK_SIZE), os.path.getsize(file)
+        if hasattr(file, 'read'):
+            return _iter_file(file, STREAM_CHUNK_SIZE), _remaining(file)
+        if hasattr(file, '__iter__'):
+            return file, None
+        raise TypeError(f'file 不支持 {type(file)} 类型')
+
+    def put_object(self, target: str,
+                   file: Union[str, bytes, IO, Iterable[bytes], AsyncIterable[bytes]],
+                   size: int = None, **kwargs) -> Response:
         """用于上传文件，阿里云文档时间2020-11-30 09:53
+        文件路径、文件对象和迭代器均按块流式发送 内存占用与文件大小无关
         :param target: 上传至储存桶路径
-        :param file: 要上传的文件路径或字节数据
+        :param file: 要上传的文件路径、字节数据、二进制文件对象或字节迭代器
+            异步客户端还支持异步字节迭代器
+        :param size: 迭代器数据的总长度 未指定时使用chunked编码上传
         :param kwargs: 用于构建request请求的其他参数
         :return:
         """
         auth = self.auth
         url = f'https://{auth.bucket}.{auth.endpoint}/{target.lstrip("/")}'
-        if isinstance(file, str):
-            with open(file, 'rb') as f:
-                r = self.build_request('PUT', url, data=f.read(), **kwargs)
-        elif isinstance(file, bytes):
-            r = self.build_request('PUT', url, data=file, **kwargs)
+        headers = {}
+        crc = Crc64() if self.verify_crc else None
+        if isinstance(file, bytes):
+            content = file
+            if self.verify:
+                headers['Content-MD5'] = content_md5(file)
+            if crc:
+                crc.update(file)
         else:
-            raise TypeError(f'file 不支持 {type(file)} 类型')
-        auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+            content, length = self._stream_body(file)
+            length = size if size is not None else length
+            if length is not None:
+                headers['Content-Length'] = str(length)
+            if crc:
+                content = self._crc_stream(content, crc)
+        if 'headers' in kwargs:
+            headers.update(kwargs.pop('headers'))
+        r = self.build_request('PUT', url, content=content, headers=headers, **kwargs)
+        resp = self.send(r)
+        if crc:
+            resp = self._after(resp, partial(_check_crc, crc))
+        return self._changed(resp, target)
 
     def get_object(self, target: str, _range: str = None, **kwargs) -> Response:
         """用于获取某个文件（Object）,此操作需要对此Object有读权限
@@ -57,16 +313,87 @@ class ObjectClient:
         :param _range: 用于获取大文件部分内容
         传参示例 "bytes=0-499" 表示第0~499字节范围的内容
         :param kwargs: 用于构建request请求的其他参数
+            设置了disk_cache且未传入其他参数时 使用磁盘缓存并通过ETag验证是否过期
         :return:
         """
+        r = self._get_request(target, _range, **kwargs)
+        cache = self.disk_cache if not kwargs else None
+        if cache is None:
+            resp = self.send(r)
+            if self.verify_crc:
+                resp = self._after(resp, _check_content)
+            return resp
+        # 异步客户端有自己的实现 这里只会同步执行
+        bucket = self.auth.bucket
+        meta = cache.meta(bucket, target, _range)
+        if meta is not None:
+            r.headers['If-None-Match'] = meta['headers']['etag']
+        resp = self.send(r)
+        if self.verify_crc:
+            _check_content(resp)
+        cached = cache.response(bucket, target, _range, meta, resp)
+        if cached is None:
+            # 304之后缓存文件被其他进程删除或替换 重新完整获取
+            resp = self.send(self._get_request(target, _range))
+            if self.verify_crc:
+                _check_content(resp)
+            cached = cache.response(bucket, target, _range, None, resp)
+        return cached
+
+    def _get_request(self, target: str, _range: str = None, **kwargs) -> httpx.Request:
         headers = {'Range': _range} if _range else {}
         if 'headers' in kwargs:
             headers.update(kwargs.pop('headers'))
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         r = self.build_request('GET', url, headers=headers, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        return r
+
+    def iter_object(self, target: str, chunk_size: int = STREAM_CHUNK_SIZE,
+                    _range: str = None, **kwargs) -> Iterable[bytes]:
+        """流式获取文件内容 按chunk_size分块返回 内存占用与文件大小无关
+        提前停止迭代时调用生成器的close()即可关闭连接
+        :param target: 文件路径
+        :param chunk_size: 每次返回的字节数
+        :param _range: 用于获取大文件部分内容 格式同get_object
+        :param kwargs: 用于构建request请求的其他参数
+        :return: 字节块迭代器 响应码错误时抛出httpx.HTTPStatusError
+        """
+        r = self._get_request(target, _range, **kwargs)
+        resp = self.send(r, stream=True)
+        try:
+            if resp.is_error:
+                resp.read()
+                resp.raise_for_status()
+            crc = Crc64() if self.verify_crc and resp.status_code == 200 else None
+            for chunk in resp.iter_bytes(chunk_size):
+                if crc:
+                    crc.update(chunk)
+                yield chunk
+            if crc:
+                check_crc64(resp, crc.crc)
+        finally:
+            resp.close()
+
+    def download_to(self, target: str, file: Union[str, IO],
+                    chunk_size: int = STREAM_CHUNK_SIZE, _range: str = None,
+                    **kwargs) -> int:
+        """流式下载文件并写入本地路径或二进制文件对象
+        :param target: 文件路径
+        :param file: 本地保存路径或可写的二进制文件对象
+        :param chunk_size: 每次写入的字节数
+        :param _range: 用于获取大文件部分内容 格式同get_object
+        :param kwargs: 用于构建request请求的其他参数
+        :return: 写入的字节数
+        """
+        if isinstance(file, str):
+            with open(file, 'wb') as f:
+                return self.download_to(target, f, chunk_size, _range, **kwargs)
+        size = 0
+        with closing(self.iter_object(target, chunk_size, _range, **kwargs)) as chunks:
+            for chunk in chunks:
+                file.write(chunk)
+                size += len(chunk)
+        return size
 
     def copy_object(self, source: str, target: str, **kwargs) -> Response:
         """于拷贝同一地域下相同或不同存储空间（Bucket）之间的文件（Object）
@@ -82,9 +409,8 @@ class ObjectClient:
             headers.update(kwargs.pop('headers'))
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         r = self.build_request('PUT', url, headers=headers, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        resp = self.send(r)
+        return self._changed(resp, target)
 
     def append_object(self, target: str, data: bytes, position: int = 0,
                       **kwargs) -> Response:
@@ -99,10 +425,9 @@ class ObjectClient:
         """
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += f'?append&position={position}'
-        r = self.build_request('POST', url, data=data, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        r = self.build_request('POST', url, content=data, **kwargs)
+        resp = self.send(r)
+        return self._changed(resp, target)
 
     def delete_object(self, target: str, **kwargs) -> Response:
         """用于删除某个文件
@@ -112,13 +437,52 @@ class ObjectClient:
         """
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         r = self.build_request('DELETE', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        resp = self.send(r)
+        return self._changed(resp, target)
+
+    def delete_objects(self, keys: Iterable[str], quiet: bool = True,
+                       **kwargs) -> Response:
+        """用于删除同一个存储空间（Bucket）中的多个文件（Object）
+        阿里云文档时间 2020-11-20 15:30
+        :param keys: 要删除的文件路径 单次最多1000个
+        :param quiet: 简单模式 OSS不返回删除成功的文件
+            详细模式下响应中的Key经过URL编码
+        :param kwargs: 用于构建request请求的其他参数
+        :return:
+        """
+        keys = list(keys)
+        if not 0 < len(keys) <= MAX_DELETE_KEYS:
+            raise ValueError(f'单次删除的文件数应在1~{MAX_DELETE_KEYS}之间')
+        objects = ''.join(f'<Object><Key>{escape(key.lstrip("/"))}</Key></Object>'
+                          for key in keys)
+        data = (f'<?xml version="1.0" encoding="UTF-8"?>'
+                f'<Delete><Quiet>{str(quiet).lower()}</Quiet>{objects}</Delete>').encode('utf8')
+        headers = {'Content-MD5': base64.b64encode(hashlib.md5(data).digest()).decode('utf8')}
+        if 'headers' in kwargs:
+            headers.update(kwargs.pop('headers'))
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/'
+        url += '?delete&encoding-type=url'
+        r = self.build_request('POST', url, content=data, headers=headers, **kwargs)
+        resp = self.send(r, idempotent=True)
+        return self._changed(resp, *keys)
 
-    def delete_objects(self) -> Response:
-        """用于删除同一个存储空间（Bucket）中的多个文件（Object）"""
-        raise NotImplemented
+    def delete_many(self, keys: Iterable[str],
+                    batch_size: int = MAX_DELETE_KEYS) -> Dict[str, str]:
+        """按批次删除任意数量的文件 每批使用一次delete_objects请求
+        同步版本逐批执行 异步版本会并发执行多个批次
+        :param keys: 要删除的文件路径 可以是任意可迭代对象
+        :param batch_size: 每批删除的文件数 最大1000
+        :return: 删除失败的文件及原因
+        """
+        failures = {}
+        for batch in _batches(keys, batch_size):
+            try:
+                resp = self.delete_objects(batch, quiet=False)
+            except httpx.HTTPError as e:
+                failures.update({key: type(e).__name__ for key in batch})
+                continue
+            failures.update(_delete_failures(batch, resp))
+        return failures
 
     def head_object(self, target: str, **kwargs) -> Response:
         """用于获取某个文件（Object）的元信息
@@ -128,10 +492,7 @@ class ObjectClient:
         :return: 该接口返回的在响应头中
         """
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
-        r = self.build_request('HEAD', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        return self._cached_meta(target, 'head', url, **kwargs)
 
     def get_object_meta(self, target: str, **kwargs) -> Response:
         """用于获取一个文件的元数据信息，包括该Object的ETag、Size、LastModified信息
@@ -142,10 +503,7 @@ class ObjectClient:
         """
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?objectMeta'
-        r = self.build_request('HEAD', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        return self._cached_meta(target, 'meta', url, **kwargs)
 
     def post_object(self):
         """用于通过HTML表单上传的方式将文件（Object）上传至指定存储空间"""
@@ -160,25 +518,85 @@ class ObjectClient:
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?restore'
         r = self.build_request('POST', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        resp = self.send(r)
+        return self._changed(resp, target)
+
+    def _select_request(self, target: str, data: str, type_: str, **kwargs) -> httpx.Request:
+        """type_为None时按data中的InputSerialization判断 无法判断时使用json"""
+        type_ = type_ or request_type(data) or JSON
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
+        url += f'?x-oss-process={type_.lower()}/select'
+        return self.build_request('POST', url, content=data, **kwargs)
 
-    def select_object(self, target: str, data: str, type_: str = 'json',
+    def select_object(self, target: str, data: str, type_: str = None,
                       **kwargs) -> Response:
         """用于对目标文件执行SQL语句 阿里云文档时间 2020-05-13 14:34
+        响应体为二进制帧 需要流式处理结果时使用iter_select
         :param target: 目标文件路径
-        :param data: 包含sql语句的xml todo 由sql生成xml
-        :param type_: 请求语法分为 csv 和 json 两种格式
+        :param data: 包含sql语句的xml 可以用oss.select.select_request由sql生成
+        :param type_: 请求语法分为 csv 和 json 两种格式 默认按data中的InputSerialization判断
         :param kwargs 用于构建request请求的其他参数
         """
-        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
-        url += f'?x-oss-process={type_.lower()}/select'
-        r = self.build_request('POST', url, data=data, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
+        r = self._select_request(target, data, type_, **kwargs)
+        resp = self.send(r)
         return resp
 
+    def iter_select(self, target: str, data: str, type_: str = None,
+                    delimiter: bytes = None,
+                    progress: Callable[[SelectFrame], None] = None,
+                    chunk_size: int = STREAM_CHUNK_SIZE, **kwargs) -> Iterable[bytes]:
+        """流式执行SelectObject 边接收边解析响应帧 内存占用与结果大小无关
+        :param target: 目标文件路径
+        :param data: 由oss.select.select_request生成的xml
+        :param type_: csv 或 json 需要与data中的格式一致 默认按data中的InputSerialization判断
+        :param delimiter: 输出的记录分隔符 传入时逐条返回记录(不含分隔符) 否则按数据帧返回
+        :param progress: 收到进度帧和结束帧时的回调 参数为SelectFrame
+        :param chunk_size: 每次从连接读取的字节数
+        :param kwargs: 用于构建request请求的其他参数
+        :return: 结果迭代器 帧校验失败时抛出ChecksumError 结束帧报错时抛出SelectError
+        """
+        r = self._select_request(target, data, type_, **kwargs)
+        resp = self.send(r, stream=True)
+        try:
+            if resp.is_error:
+                resp.read()
+                resp.raise_for_status()
+            if resp.headers.get('x-oss-select-output-raw') == 'true':
+                yield from resp.iter_bytes(chunk_size)
+                return
+            stream = SelectStream(delimiter, progress, self.verify)
+            for chunk in resp.iter_bytes(chunk_size):
+                yield from stream.feed(chunk)
+            yield from stream.close()
+        finally:
+            resp.close()
+
+    def _parse_select_meta(self, resp: Response) -> SelectFrame:
+        resp.raise_for_status()
+        decoder = FrameDecoder(self.verify)
+        decoder.feed(resp.content)
+        frame = decoder.close()
+        if frame.status >= 400:
+            raise SelectError(frame.status, frame.error)
+        return frame
+
+    def create_select_object_meta(self, target: str, data: str = None, type_: str = 'csv',
+                                  **kwargs) -> SelectFrame:
+        """获取文件的split数和总行数 用于SelectObject的并发扫描 阿里云文档时间 2020-05-13 14:34
+        首次调用会扫描整个文件并保存meta 之后直接返回
+        :param target: 目标文件路径
+        :param data: 由oss.select.meta_request生成的xml 默认按type_的默认格式生成
+        :param type_: csv 或 json(只支持LINES)
+        :param kwargs: 用于构建request请求的其他参数
+        :return: 结束帧 splits为split数 rows为总行数 csv还有columns为列数
+        """
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
+        url += f'?x-oss-process={type_.lower()}/meta'
+        data = meta_request(type_) if data is None else data
+        r = self.build_request('POST', url, content=data, **kwargs)
+        resp = self.send(r)
+        return self._after(resp, self._parse_select_meta)
+
     def put_object_acl(self, target: str, acl: str = 'default', **kwargs) -> Response:
         """用于修改文件（Object）的访问权限（ACL）
         阿里云文档时间 2020-04-23 15:44
@@ -195,9 +613,8 @@ class ObjectClient:
         if 'headers' in kwargs:
             headers.update(kwargs.pop('headers'))
         r = self.build_request('PUT', url, headers=headers, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        resp = self.send(r)
+        return self._changed(resp, target)
 
     def get_object_acl(self, target: str, **kwargs) -> Response:
         """用来获取某个存储空间（Bucket）下的某个文件（Object）的访问权限（ACL）
@@ -208,8 +625,7 @@ class ObjectClient:
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?acl'
         r = self.build_request('GET', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
+        resp = self.send(r)
         return resp
 
     def put_symlink(self, source: str, target: str, **kwargs) -> Response:
@@ -225,9 +641,8 @@ class ObjectClient:
         if 'headers' in kwargs:
             headers.update(kwargs.pop('headers'))
         r = self.build_request('PUT', url, headers=headers, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        resp = self.send(r)
+        return self._changed(resp, target)
 
     def get_symlink(self, target: str, **kwargs) -> Response:
         """用于获取软链接 阿里云文档时间 2020-04-17 14:02
@@ -237,8 +652,7 @@ class ObjectClient:
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?symlink'
         r = self.build_request('GET', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
+        resp = self.send(r)
         return resp
 
     def put_object_tag(self, target: str, data: str, **kwargs) -> Response:
@@ -251,9 +665,8 @@ class ObjectClient:
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?tagging'
         r = self.build_request('PUT', url, data=data, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        resp = self.send(r)
+        return self._changed(resp, target)
 
     def get_object_tagging(self, target: str, **kwargs) -> Response:
         """用于获取对象（Object）的标签（Tagging）信息
@@ -265,8 +678,7 @@ class ObjectClient:
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?tagging'
         r = self.build_request('GET', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
+        resp = self.send(r)
         return resp
 
     def delete_object_tagging(self, target: str, **kwargs) -> Response:
@@ -279,51 +691,542 @@ class ObjectClient:
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?tagging'
         r = self.build_request('DELETE', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return resp
+        resp = self.send(r)
+        return self._changed(resp, target)
 
     def _initiate_multipart_upload(self, target: str, **kwargs) -> str:
         """初始化一个Multipart Upload事件
-        todo 增加对文件分块上传的支持
         阿里云文档时间 2020-11-16 10:52
         :param target: 目标文件路径
         :param kwargs: 用于构建request请求的其他参数
-        :return:
+        :return: UploadId
         """
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
         url += '?uploads'
         r = self.build_request('POST', url, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
-        return re.search(r'<UploadId>(.+)?</UploadId>', resp.text).group(1)
+        resp = self.send(r)
+        return self._after(resp, self._parse_upload_id)
 
+    @staticmethod
+    def _parse_upload_id(resp: Response) -> str:
+        resp.raise_for_status()
+        return parse_upload_id(resp.content)
 
-class ObjectAsyncClient(ObjectClient):
-    """object行为的异步方法"""
+    def upload_part(self, target: str, upload_id: str, part_number: int,
+                    data: bytes, **kwargs) -> Response:
+        """根据指定的Object名和uploadId来分块（Part）上传数据
+        阿里云文档时间 2020-11-16 10:52
+        :param target: 目标文件路径
+        :param upload_id: 初始化分片上传时返回的UploadId
+        :param part_number: 分片号 范围1~10000
+        :param data: 分片数据 除最后一块外不能小于100KB
+        :param kwargs: 用于构建request请求的其他参数
+        :return: 分片的ETag在响应头中
+        """
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
+        url += f'?partNumber={part_number}&uploadId={upload_id}'
+        headers = {'Content-MD5': content_md5(data)} if self.verify else {}
+        if 'headers' in kwargs:
+            headers.update(kwargs.pop('headers'))
+        r = self.build_request('PUT', url, content=data, headers=headers, **kwargs)
+        resp = self.send(r)
+        if self.verify_crc:
+            resp = self._after(resp, partial(_check_crc, Crc64(data)))
+        return resp
+
+    def upload_part_copy(self, source: str, target: str, upload_id: str, part_number: int,
+                         copy_range: str = None, **kwargs) -> Response:
+        """从已有文件中拷贝数据来上传一个分片 数据不经过客户端
+        阿里云文档时间 2020-11-16 10:52
+        :param source: 拷贝的源地址 格式"/BucketName/ObjectName"
+        :param target: 目标文件路径
+        :param upload_id: 初始化分片上传时返回的UploadId
+        :param part_number: 分片号 范围1~10000
+        :param copy_range: 源文件的拷贝范围 格式同get_object的_range 不指定时拷贝整个文件
+        :param kwargs: 用于构建request请求的其他参数
+        :return: 分片的ETag在响应的xml中
+        """
+        headers = {'x-oss-copy-source': quote(source)}
+        if copy_range:
+            headers['x-oss-copy-source-range'] = copy_range
+        if 'headers' in kwargs:
+            headers.update(kwargs.pop('headers'))
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
+        url += f'?partNumber={part_number}&uploadId={upload_id}'
+        r = self.build_request('PUT', url, headers=headers, **kwargs)
+        resp = self.send(r)
+        return resp
 
-    def __init__(self, auth: Auth):
-        self.auth = auth
-        self.client = httpx.AsyncClient()
+    def complete_multipart_upload(self, target: str, upload_id: str,
+                                  parts: List[Tuple[int, str]],
+                                  **kwargs) -> Response:
+        """在所有分片上传完成后完成整个文件的分片上传
+        阿里云文档时间 2020-11-16 10:52
+        :param target: 目标文件路径
+        :param upload_id: 初始化分片上传时返回的UploadId
+        :param parts: 已上传分片的(分片号, ETag)列表
+        :param kwargs: 用于构建request请求的其他参数
+        :return:
+        """
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
+        url += f'?uploadId={upload_id}'
+        data = ''.join(f'<Part><PartNumber>{number}</PartNumber><ETag>{etag}</ETag></Part>'
+                       for number, etag in sorted(parts))
+        data = f'<CompleteMultipartUpload>{data}</CompleteMultipartUpload>'
+        r = self.build_request('POST', url, content=data, **kwargs)
+        resp = self.send(r)
+        return self._changed(resp, target)
 
-    def __del__(self):
+    def abort_multipart_upload(self, target: str, upload_id: str,
+                               **kwargs) -> Response:
+        """取消分片上传事件并删除对应的分片数据
+        阿里云文档时间 2020-11-16 10:52
+        :param target: 目标文件路径
+        :param upload_id: 初始化分片上传时返回的UploadId
+        :param kwargs: 用于构建request请求的其他参数
+        :return: 成功响应码204
+        """
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
+        url += f'?uploadId={upload_id}'
+        r = self.build_request('DELETE', url, **kwargs)
+        resp = self.send(r)
+        return resp
+
+    def list_parts(self, target: str, upload_id: str, max_parts: int = None,
+                   marker: int = None, **kwargs) -> Response:
+        """列举指定uploadId所属的所有已经上传成功的分片
+        阿里云文档时间 2020-11-16 10:52
+        :param target: 目标文件路径
+        :param upload_id: 初始化分片上传时返回的UploadId
+        :param max_parts: 返回的最大分片数 默认1000
+        :param marker: 从此分片号之后开始返回
+        :param kwargs: 用于构建request请求的其他参数
+        :return:
+        """
+        params = kwargs.pop('params') if 'params' in kwargs else {}
+        # 传入params时httpx会替换url中的查询参数 uploadId需要放在params中
+        params['uploadId'] = upload_id
+        if max_parts:
+            params['max-parts'] = str(max_parts)
+        if marker:
+            params['part-number-marker'] = str(marker)
+        url = f'https://{self.auth.bucket}.{self.auth.endpoint}/{target.lstrip("/")}'
+        r = self.build_request('GET', url, params=params, **kwargs)
+        resp = self.send(r)
+        return resp
+
+    @staticmethod
+    def _part_result(resp: Response) -> Tuple[str, Union[int, None]]:
+        """分片的ETag和已校验过的CRC64"""
+        resp.raise_for_status()
+        crc = resp.headers.get('x-oss-hash-crc64ecma')
+        return resp.headers['ETag'], int(crc) if crc is not None else None
+
+    def _upload_part_from_file(self, target: str, upload_id: str, file: str,
+                               number: int, offset: int, size: int) -> Tuple[str, Union[int, None]]:
+        resp = self.upload_part(target, upload_id, number,
+                                _read_range(file, offset, size))
+        return self._part_result(resp)
+
+    def upload_file(self, target: str, file: str, part_size: int = None,
+                    concurrency: int = 4, **kwargs) -> Response:
+        """分片并发上传本地文件 小于一个分片的文件直接使用put_object
+        任意分片失败时会取消分片上传事件并抛出异常
+        :param target: 上传至储存桶路径
+        :param file: 本地文件路径
+        :param part_size: 分片大小 默认8MB 会根据文件大小自动调整
+        :param concurrency: 同时上传的分片数
+        :param kwargs: 用于构建初始化请求的其他参数
+        :return:
+        """
+        total = os.path.getsize(file)
+        part_size = _part_size(total, part_size)
+        if total <= part_size:
+            return self.put_object(target, file, **kwargs)
+        upload_id = self._initiate_multipart_upload(target, **kwargs)
+        try:
+            with ThreadPoolExecutor(concurrency) as pool:
+                futures = [(number, size, pool.submit(self._upload_part_from_file, target,
+                                                      upload_id, file, number, offset, size))
+                           for number, offset, size in _split_parts(total, part_size)]
+                try:
+                    results = [(number, size, future.result()) for number, size, future in futures]
+                except BaseException:
+                    for _, _, future in futures:
+                        future.cancel()
+                    raise
+            parts = [(number, etag) for number, _, (etag, _) in results]
+            resp = self.complete_multipart_upload(target, upload_id, parts)
+            resp.raise_for_status()
+            self._check_parts(resp, [(crc, size) for _, size, (_, crc) in results])
+        except BaseException:
+            self.abort_multipart_upload(target, upload_id)
+            raise
+        return resp
+
+    def _head_source(self, source: str) -> Response:
+        """获取拷贝源文件的元信息 源文件可以在其他储存桶"""
+        bucket, _, key = source.lstrip('/').partition('/')
+        url = f'https://{bucket}.{self.auth.endpoint}/{key}'
+        r = self.build_request('HEAD', url)
+        resp = self.send(r, bucket=bucket)
+        return resp
+
+    @staticmethod
+    def _copy_headers(meta: Response) -> Dict[str, str]:
+        return {k: v for k, v in meta.headers.items()
+                if k in COPY_HEADERS or k.startswith('x-oss-meta-')}
+
+    @staticmethod
+    def _copy_part_etag(resp: Response) -> str:
+        resp.raise_for_status()
+        return ElementTree.fromstring(resp.content).findtext('ETag')
+
+    def _check_copy(self, resp: Response, meta: Response) -> None:
+        """拷贝结果与源文件的CRC64比较 不需要读取数据"""
+        crc = meta.headers.get('x-oss-hash-crc64ecma')
+        if self.verify and crc is not None:
+            check_crc64(resp, int(crc))
+
+    def _copy_part(self, source: str, target: str, upload_id: str, number: int,
+                   offset: int, size: int, etag: str) -> str:
+        resp = self.upload_part_copy(source, target, upload_id, number,
+                                     f'bytes={offset}-{offset + size - 1}',
+                                     headers={'x-oss-copy-source-if-match': etag})
+        return self._copy_part_etag(resp)
+
+    def copy_large(self, source: str, target: str, part_size: int = None,
+                   concurrency: int = 8, **kwargs) -> Response:
+        """服务端拷贝任意大小的文件 数据不经过客户端
+        不超过一个分片且不超过1GB的文件直接使用copy_object 否则使用UploadPartCopy并发拷贝
+        各分片使用x-oss-copy-source-if-match保证来自源文件的同一版本
+        任意分片失败时会取消分片上传事件并抛出异常
+        :param source: 拷贝的源地址 格式"/BucketName/ObjectName"
+        :param target: 拷贝的目标地址
+        :param part_size: 分片大小 默认64MB 会根据文件大小自动调整 最大5GB
+        :param concurrency: 同时拷贝的分片数
+        :param kwargs: 用于构建初始化请求的其他参数 默认沿用源文件的Content-Type和自定义元信息
+        :return:
+        """
+        meta = self._head_source(source)
+        meta.raise_for_status()
+        total = int(meta.headers['Content-Length'])
+        etag = meta.headers['ETag']
+        part_size = _copy_part_size(total, part_size)
+        if total <= min(part_size, MAX_COPY_SIZE):
+            return self.copy_object(source, target, **kwargs)
+        headers = self._copy_headers(meta)
+        if 'headers' in kwargs:
+            headers.update(kwargs.pop('headers'))
+        upload_id = self._initiate_multipart_upload(target, headers=headers, **kwargs)
+        try:
+            with ThreadPoolExecutor(concurrency) as pool:
+                futures = [(number, pool.submit(self._copy_part, source, target, upload_id,
+                                                number, offset, size, etag))
+                           for number, offset, size in _split_parts(total, part_size)]
+                try:
+                    parts = [(number, future.result()) for number, future in futures]
+                except BaseException:
+                    for _, future in futures:
+                        future.cancel()
+                    raise
+            resp = self.complete_multipart_upload(target, upload_id, parts)
+            resp.raise_for_status()
+            self._check_copy(resp, meta)
+        except BaseException:
+            self.abort_multipart_upload(target, upload_id)
+            raise
+        return resp
+
+    def _download_range(self, target: str, sink: _RangeFile, offset: int,
+                        size: int, etag: str) -> Union[int, None]:
+        """下载一个分段 返回该分段的CRC64"""
+        crc = Crc64() if self.verify_crc else None
+        chunks = self.iter_object(target, _range=f'bytes={offset}-{offset + size - 1}',
+                                  headers={'If-Match': etag})
+        received = 0
+        with closing(chunks):
+            for chunk in chunks:
+                sink.write(offset + received, chunk)
+                received += len(chunk)
+                if crc:
+                    crc.update(chunk)
+        _check_length(received, size)
+        return crc.crc if crc else None
+
+    def download_file(self, target: str, file: str, part_size: int = None,
+                      concurrency: int = 4) -> Response:
+        """分段并发下载文件 各分段直接写入预分配的本地文件
+        下载时使用If-Match保证各分段来自同一版本 失败时删除本地文件并抛出异常
+        :param target: 文件路径
+        :param file: 本地保存路径
+        :param part_size: 分段大小 默认8MB
+        :param concurrency: 同时下载的分段数
+        :return: head_object的响应
+        """
+        meta = self.head_object(target)
+        meta.raise_for_status()
+        total = int(meta.headers['Content-Length'])
+        etag = meta.headers.get('ETag', '*')
+        parts = _split_parts(total, part_size or DEFAULT_PART_SIZE)
+        sink = _RangeFile(file, total)
+        try:
+            with ThreadPoolExecutor(concurrency) as pool:
+                futures = [(size, pool.submit(self._download_range, target, sink,
+                                              offset, size, etag))
+                           for _, offset, size in parts]
+                try:
+                    crcs = [(future.result(), size) for size, future in futures]
+                except BaseException:
+                    for _, future in futures:
+                        future.cancel()
+                    raise
+            self._check_parts(meta, crcs)
+        except BaseException:
+            sink.close()
+            os.remove(file)
+            raise
+        sink.close()
+        return meta
+
+    def _load_upload(self, target: str, file: str, path: str, total: int, part_size: int):
+        """读取上传进度 返回(identity, 可恢复的Checkpoint, 需要取消的旧分片上传(target, upload_id))"""
+        identity = {'kind': 'upload', 'bucket': self.auth.bucket, 'key': target.lstrip('/'),
+                    'file': os.path.abspath(file), 'size': total,
+                    'mtime': os.path.getmtime(file), 'part_size': part_size}
+        checkpoint = Checkpoint.load(path, identity)
+        stale = None
+        if checkpoint is None:
+            old = Checkpoint.peek(path)
+            try:
+                if old['identity']['bucket'] == self.auth.bucket:
+                    stale = old['identity']['key'], old['state']['upload_id']
+            except (TypeError, KeyError):
+                pass
+        return identity, checkpoint, stale
+
+    @staticmethod
+    def _checkpoint_parts(checkpoint: Checkpoint, total: int, part_size: int):
+        """由进度记录得到complete_multipart_upload的分片列表和用于校验的(CRC64, 长度)"""
+        done = [(number, size, checkpoint.done[str(number)])
+                for number, _, size in _split_parts(total, part_size)]
+        return [(number, etag) for number, _, (etag, _) in done], \
+               [(crc, size) for _, size, (_, crc) in done]
+
+    def resumable_upload(self, target: str, file: str, checkpoint: str = None,
+                         part_size: int = None, concurrency: int = 4, **kwargs) -> Response:
+        """断点续传上传 进度保存在checkpoint文件中 中断后再次调用只上传缺少的分片
+        本地文件的大小或修改时间变化后 会取消旧的分片上传事件重新上传
+        中断时不会取消分片上传事件 成功后删除checkpoint文件
+        :param target: 上传至储存桶路径
+        :param file: 本地文件路径
+        :param checkpoint: 进度文件路径 默认为 file + '.ucp'
+        :param part_size: 分片大小 默认8MB 会根据文件大小自动调整
+        :param concurrency: 同时上传的分片数
+        :param kwargs: 用于构建初始化请求的其他参数
+        :return: complete_multipart_upload的响应
+        """
+        path = checkpoint or f'{file}.ucp'
+        total = os.path.getsize(file)
+        if total == 0:
+            return self.put_object(target, b'', **kwargs)
+        part_size = _part_size(total, part_size)
+        identity, record, stale = self._load_upload(target, file, path, total, part_size)
+        if stale:
+            self.abort_multipart_upload(*stale)
+        if record and self.list_parts(target, record.state['upload_id'], 1).status_code == 404:
+            record = None
+        if record is None:
+            upload_id = self._initiate_multipart_upload(target, **kwargs)
+            record = Checkpoint(path, identity, upload_id=upload_id)
+            record.save()
+        upload_id = record.state['upload_id']
+
+        def upload(number: int, offset: int, size: int):
+            result = self._upload_part_from_file(target, upload_id, file, number, offset, size)
+            record.mark(number, result)
+
+        pending = [part for part in _split_parts(total, part_size) if str(part[0]) not in record.done]
+        with ThreadPoolExecutor(concurrency) as pool:
+            futures = [pool.submit(upload, *part) for part in pending]
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        parts, crcs = self._checkpoint_parts(record, total, part_size)
+        resp = self.complete_multipart_upload(target, upload_id, parts)
+        resp.raise_for_status()
+        self._check_parts(resp, crcs)
+        record.remove()
+        return resp
+
+    def _load_download(self, target: str, file: str, path: str, meta: Response,
+                       part_size: int):
+        """读取下载进度 远端文件ETag或大小变化、临时文件缺失时不能恢复"""
+        total = int(meta.headers['Content-Length'])
+        identity = {'kind': 'download', 'bucket': self.auth.bucket, 'key': target.lstrip('/'),
+                    'file': os.path.abspath(file), 'size': total,
+                    'etag': meta.headers.get('ETag', ''), 'part_size': part_size}
+        checkpoint = Checkpoint.load(path, identity)
+        tmp = f'{file}.download'
+        if checkpoint and (not os.path.exists(tmp) or os.path.getsize(tmp) != total):
+            checkpoint = None
+        if checkpoint is None:
+            return Checkpoint(path, identity), False
+        return checkpoint, True
+
+    def _finish_download(self, file: str, meta: Response, record: Checkpoint,
+                         total: int, part_size: int) -> None:
+        crcs = [(record.done[str(offset)], size)
+                for _, offset, size in _split_parts(total, part_size)]
+        tmp = f'{file}.download'
+        try:
+            self._check_parts(meta, crcs)
+        except IOError:
+            os.remove(tmp)
+            record.remove()
+            raise
+        os.replace(tmp, file)
+        record.remove()
+
+    def resumable_download(self, target: str, file: str, checkpoint: str = None,
+                           part_size: int = None, concurrency: int = 4) -> Response:
+        """断点续传下载 数据先写入 file + '.download' 全部完成后再替换为file
+        中断后再次调用只下载缺少的分段 远端文件ETag或大小变化后重新下载
+        :param target: 文件路径
+        :param file: 本地保存路径
+        :param checkpoint: 进度文件路径 默认为 file + '.dcp'
+        :param part_size: 分段大小 默认8MB
+        :param concurrency: 同时下载的分段数
+        :return: head_object的响应
+        """
+        path = checkpoint or f'{file}.dcp'
+        part_size = part_size or DEFAULT_PART_SIZE
+        meta = self.head_object(target)
+        meta.raise_for_status()
+        total = int(meta.headers['Content-Length'])
+        etag = meta.headers.get('ETag', '*')
+        record, resumed = self._load_download(target, file, path, meta, part_size)
+        record.save()
+        sink = _RangeFile(f'{file}.download', total, truncate=not resumed)
+
+        def download(offset: int, size: int):
+            record.mark(offset, self._download_range(target, sink, offset, size, etag))
+
+        pending = [(offset, size) for _, offset, size in _split_parts(total, part_size)
+                   if str(offset) not in record.done]
         try:
-            if not self.client.is_closed:
-                task = asyncio.create_task(self.client.aclose())
-                task.result()
-        except RuntimeError:
-            pass
-        except asyncio.exceptions.InvalidStateError:
-            pass
-
-    async def put_object(self, target: str, file: Union[str, bytes],
-                         **kwargs) -> httpx.Response:
-        corn = super().put_object(target, file, **kwargs)
+            with ThreadPoolExecutor(concurrency) as pool:
+                futures = [pool.submit(download, *part) for part in pending]
+                try:
+                    for future in futures:
+                        future.result()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            sink.close()
+        self._finish_download(file, meta, record, total, part_size)
+        return meta
+
+
+class ObjectAsyncClient(AsyncBaseClient, ObjectClient):
+    """object行为的异步方法"""
+
+    @staticmethod
+    async def _cached(resp: Response):
+        return resp
+
+    @staticmethod
+    async def _crc_stream(content: AsyncIterable[bytes], crc: Crc64) -> AsyncIterable[bytes]:
+        async for chunk in content:
+            crc.update(chunk)
+            yield chunk
+
+    def _stream_body(self, file) -> Tuple[AsyncIterable[bytes], Union[int, None]]:
+        if isinstance(file, str):
+            return _aiter_path(file, STREAM_CHUNK_SIZE), os.path.getsize(file)
+        if hasattr(file, 'read'):
+            return _aiter_file(file, STREAM_CHUNK_SIZE), _remaining(file)
+        if hasattr(file, '__aiter__'):
+            return file, None
+        if hasattr(file, '__iter__'):
+            return _aiter(file), None
+        raise TypeError(f'file 不支持 {type(file)} 类型')
+
+    async def put_object(self, target: str,
+                         file: Union[str, bytes, IO, Iterable[bytes], AsyncIterable[bytes]],
+                         size: int = None, **kwargs) -> httpx.Response:
+        corn = super().put_object(target, file, size, **kwargs)
         return await corn
 
     async def get_object(self, target: str, _range: str = None, **kwargs) -> Response:
-        corn = super().get_object(target, _range, **kwargs)
-        return await corn
+        cache = self.disk_cache if not kwargs else None
+        if cache is None:
+            corn = super().get_object(target, _range, **kwargs)
+            return await corn
+        # 磁盘缓存的读写在线程池中进行 不阻塞事件循环
+        loop = asyncio.get_running_loop()
+        bucket = self.auth.bucket
+        meta = await loop.run_in_executor(None, cache.meta, bucket, target, _range)
+        r = self._get_request(target, _range)
+        if meta is not None:
+            r.headers['If-None-Match'] = meta['headers']['etag']
+        resp = await self.send(r)
+        if self.verify_crc:
+            _check_content(resp)
+        cached = await loop.run_in_executor(None, cache.response, bucket, target, _range,
+                                            meta, resp)
+        if cached is None:
+            resp = await self.send(self._get_request(target, _range))
+            if self.verify_crc:
+                _check_content(resp)
+            cached = await loop.run_in_executor(None, cache.response, bucket, target, _range,
+                                                None, resp)
+        return cached
+
+    async def iter_object(self, target: str, chunk_size: int = STREAM_CHUNK_SIZE,
+                          _range: str = None, **kwargs) -> AsyncIterable[bytes]:
+        """异步流式获取文件内容 提前停止迭代时应调用aclose()关闭连接"""
+        r = self._get_request(target, _range, **kwargs)
+        resp = await self.send(r, stream=True)
+        try:
+            if resp.is_error:
+                await resp.aread()
+                resp.raise_for_status()
+            crc = Crc64() if self.verify_crc and resp.status_code == 200 else None
+            async for chunk in resp.aiter_bytes(chunk_size):
+                if crc:
+                    crc.update(chunk)
+                yield chunk
+            if crc:
+                check_crc64(resp, crc.crc)
+        finally:
+            await resp.aclose()
+
+    async def download_to(self, target: str, file: Union[str, IO],
+                          chunk_size: int = STREAM_CHUNK_SIZE, _range: str = None,
+                          **kwargs) -> int:
+        loop = asyncio.get_running_loop()
+        if isinstance(file, str):
+            f = await loop.run_in_executor(None, open, file, 'wb')
+            try:
+                return await self.download_to(target, f, chunk_size, _range, **kwargs)
+            finally:
+                f.close()
+        size = 0
+        chunks = self.iter_object(target, chunk_size, _range, **kwargs)
+        try:
+            async for chunk in chunks:
+                await loop.run_in_executor(None, file.write, chunk)
+                size += len(chunk)
+        finally:
+            await chunks.aclose()
+        return size
 
     async def copy_object(self, source: str, target: str, **kwargs) -> Response:
         corn = super().copy_object(source, target, **kwargs)
@@ -338,23 +1241,149 @@ class ObjectAsyncClient(ObjectClient):
         corn = super().delete_object(target, **kwargs)
         return await corn
 
+    async def delete_objects(self, keys: Iterable[str], quiet: bool = True,
+                             **kwargs) -> Response:
+        corn = super().delete_objects(keys, quiet, **kwargs)
+        return await corn
+
+    async def delete_many(self, keys: Iterable[str], batch_size: int = MAX_DELETE_KEYS,
+                          concurrency: int = 4) -> Dict[str, str]:
+        pending = _batches(keys, batch_size)
+        failures = {}
+
+        async def worker():
+            for batch in pending:
+                try:
+                    resp = await self.delete_objects(batch, quiet=False)
+                except httpx.HTTPError as e:
+                    failures.update({key: type(e).__name__ for key in batch})
+                    continue
+                failures.update(_delete_failures(batch, resp))
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return failures
+
     async def head_object(self, target: str, **kwargs) -> Response:
         corn = super().head_object(target, **kwargs)
         return await corn
 
     async def get_object_meta(self, target: str, **kwargs) -> Response:
-        corn = super().head_object(target, **kwargs)
+        corn = super().get_object_meta(target, **kwargs)
         return await corn
 
     async def restore_object(self, target: str, **kwargs) -> Response:
         corn = super().restore_object(target, **kwargs)
         return await corn
 
-    async def select_object(self, target: str, data: str, type_: str = 'json',
+    async def select_object(self, target: str, data: str, type_: str = None,
                             **kwargs) -> Response:
         corn = super().select_object(target, data, type_, **kwargs)
         return await corn
 
+    async def create_select_object_meta(self, target: str, data: str = None,
+                                        type_: str = 'csv', **kwargs) -> SelectFrame:
+        corn = super().create_select_object_meta(target, data, type_, **kwargs)
+        return await corn
+
+    async def select_parallel(self, target: str, sql: str, type_: str = 'csv',
+                              concurrency: int = 8, ordered: bool = True,
+                              delimiter: bytes = None, unit: str = 'split',
+                              parts: int = None, meta: SelectFrame = None,
+                              buffer: int = 64, **options) -> AsyncIterable[bytes]:
+        """将文件按split-range或line-range切分后并发执行SelectObject
+        先通过CreateSelectObjectMeta获取split数和行数 再按区间发出多个select请求
+        csv的output_header会在每个区间重复输出 并发扫描时不应开启
+        :param target: 目标文件路径
+        :param sql: sql语句
+        :param type_: csv 或 json(只支持LINES 未传入json_type时使用LINES 传入DOCUMENT时抛出ValueError)
+        :param concurrency: 同时执行的select请求数
+        :param ordered: 为True时按文件顺序返回结果 否则按到达顺序返回
+        :param delimiter: 输出的记录分隔符 传入时逐条返回记录 同iter_select
+        :param unit: 切分单位 split 或 line
+        :param parts: 切分的区间数 默认为concurrency的4倍
+        :param meta: 已获取的create_select_object_meta结果 传入时不再请求
+        :param buffer: 每个区间(无序时为全部)缓存的最大结果数 超过时暂停读取对应连接
+        :param options: 传给oss.select.select_request的其他参数
+        :return: 结果异步迭代器 任一区间失败时抛出对应异常
+        """
+        if unit not in ('split', 'line'):
+            raise ValueError(f'不支持的切分单位 {unit}')
+        if type_.lower() == 'json':
+            # 只有LINES类型的json文件可以按区间扫描 select_request默认的DOCUMENT不能切分
+            if options.setdefault('json_type', 'LINES').upper() != 'LINES':
+                raise ValueError('json文件只有LINES类型支持并发扫描')
+        if meta is None:
+            meta_options = {k: options[k] for k in ('record_delimiter', 'field_delimiter', 'quote')
+                            if k in options}
+            meta = await self.create_select_object_meta(target, meta_request(type_, **meta_options),
+                                                        type_)
+        total = meta.splits if unit == 'split' else meta.rows
+        ranges = split_ranges(total, parts or concurrency * 4)
+        if not ranges:
+            return
+        queues = [asyncio.Queue(buffer) for _ in ranges] if ordered else None
+        shared = asyncio.Queue(buffer)
+        pending = iter(enumerate(ranges))
+        done = object()
+
+        async def scan(index: int, first: int, last: int):
+            queue = queues[index] if ordered else shared
+            data = select_request(sql, type_, _range=f'{unit}-range={first}-{last}', **options)
+            chunks = self.iter_select(target, data, type_, delimiter)
+            try:
+                async for chunk in chunks:
+                    await queue.put(chunk)
+            except Exception as e:
+                await queue.put(e)
+                raise
+            finally:
+                await chunks.aclose()
+            await queue.put(done)
+
+        async def worker():
+            for index, (first, last) in pending:
+                await scan(index, first, last)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(concurrency, len(ranges)))]
+        try:
+            for queue in (queues if ordered else [shared] * len(ranges)):
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def iter_select(self, target: str, data: str, type_: str = None,
+                          delimiter: bytes = None,
+                          progress: Callable[[SelectFrame], None] = None,
+                          chunk_size: int = STREAM_CHUNK_SIZE,
+                          **kwargs) -> AsyncIterable[bytes]:
+        """异步流式执行SelectObject 提前停止迭代时应调用aclose()关闭连接"""
+        r = self._select_request(target, data, type_, **kwargs)
+        resp = await self.send(r, stream=True)
+        try:
+            if resp.is_error:
+                await resp.aread()
+                resp.raise_for_status()
+            if resp.headers.get('x-oss-select-output-raw') == 'true':
+                async for chunk in resp.aiter_bytes(chunk_size):
+                    yield chunk
+                return
+            stream = SelectStream(delimiter, progress, self.verify)
+            async for chunk in resp.aiter_bytes(chunk_size):
+                for result in stream.feed(chunk):
+                    yield result
+            for result in stream.close():
+                yield result
+        finally:
+            await resp.aclose()
+
     async def put_object_acl(self, target: str, acl: str = 'default', **kwargs) -> Response:
         corn = super().put_object_acl(target, acl, **kwargs)
         return await corn
@@ -378,3 +1407,238 @@ class ObjectAsyncClient(ObjectClient):
     async def get_object_tagging(self, target: str, **kwargs) -> Response:
         corn = super().get_object_tagging(target, **kwargs)
         return await corn
+
+    async def delete_object_tagging(self, target: str, **kwargs) -> Response:
+        corn = super().delete_object_tagging(target, **kwargs)
+        return await corn
+
+    async def _initiate_multipart_upload(self, target: str, **kwargs) -> str:
+        corn = super()._initiate_multipart_upload(target, **kwargs)
+        return await corn
+
+    async def upload_part(self, target: str, upload_id: str, part_number: int,
+                          data: bytes, **kwargs) -> Response:
+        corn = super().upload_part(target, upload_id, part_number, data, **kwargs)
+        return await corn
+
+    async def upload_part_copy(self, source: str, target: str, upload_id: str,
+                               part_number: int, copy_range: str = None, **kwargs) -> Response:
+        corn = super().upload_part_copy(source, target, upload_id, part_number,
+                                        copy_range, **kwargs)
+        return await corn
+
+    async def complete_multipart_upload(self, target: str, upload_id: str,
+                                        parts: List[Tuple[int, str]],
+                                        **kwargs) -> Response:
+        corn = super().complete_multipart_upload(target, upload_id, parts, **kwargs)
+        return await corn
+
+    async def abort_multipart_upload(self, target: str, upload_id: str,
+                                     **kwargs) -> Response:
+        corn = super().abort_multipart_upload(target, upload_id, **kwargs)
+        return await corn
+
+    async def list_parts(self, target: str, upload_id: str, max_parts: int = None,
+                         marker: int = None, **kwargs) -> Response:
+        corn = super().list_parts(target, upload_id, max_parts, marker, **kwargs)
+        return await corn
+
+    async def upload_file(self, target: str, file: str, part_size: int = None,
+                          concurrency: int = 4, **kwargs) -> Response:
+        total = os.path.getsize(file)
+        part_size = _part_size(total, part_size)
+        if total <= part_size:
+            return await self.put_object(target, file, **kwargs)
+        upload_id = await self._initiate_multipart_upload(target, **kwargs)
+        loop = asyncio.get_running_loop()
+        pending = _split_parts(total, part_size)
+        results = []
+
+        async def worker():
+            for number, offset, size in pending:
+                data = await loop.run_in_executor(None, _read_range, file, offset, size)
+                resp = await self.upload_part(target, upload_id, number, data)
+                results.append((number, size, self._part_result(resp)))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            results.sort()
+            parts = [(number, etag) for number, _, (etag, _) in results]
+            resp = await self.complete_multipart_upload(target, upload_id, parts)
+            resp.raise_for_status()
+            self._check_parts(resp, [(crc, size) for _, size, (_, crc) in results])
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.abort_multipart_upload(target, upload_id)
+            raise
+        return resp
+
+    async def _head_source(self, source: str) -> Response:
+        corn = super()._head_source(source)
+        return await corn
+
+    async def _copy_part(self, source: str, target: str, upload_id: str, number: int,
+                         offset: int, size: int, etag: str) -> str:
+        resp = await self.upload_part_copy(source, target, upload_id, number,
+                                           f'bytes={offset}-{offset + size - 1}',
+                                           headers={'x-oss-copy-source-if-match': etag})
+        return self._copy_part_etag(resp)
+
+    async def copy_large(self, source: str, target: str, part_size: int = None,
+                         concurrency: int = 8, **kwargs) -> Response:
+        meta = await self._head_source(source)
+        meta.raise_for_status()
+        total = int(meta.headers['Content-Length'])
+        etag = meta.headers['ETag']
+        part_size = _copy_part_size(total, part_size)
+        if total <= min(part_size, MAX_COPY_SIZE):
+            return await self.copy_object(source, target, **kwargs)
+        headers = self._copy_headers(meta)
+        if 'headers' in kwargs:
+            headers.update(kwargs.pop('headers'))
+        upload_id = await self._initiate_multipart_upload(target, headers=headers, **kwargs)
+        pending = _split_parts(total, part_size)
+        parts = []
+
+        async def worker():
+            for number, offset, size in pending:
+                parts.append((number, await self._copy_part(source, target, upload_id,
+                                                            number, offset, size, etag)))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            resp = await self.complete_multipart_upload(target, upload_id, parts)
+            resp.raise_for_status()
+            self._check_copy(resp, meta)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self.abort_multipart_upload(target, upload_id)
+            raise
+        return resp
+
+    async def _download_range(self, target: str, sink: _RangeFile, offset: int,
+                              size: int, etag: str) -> Union[int, None]:
+        loop = asyncio.get_running_loop()
+        crc = Crc64() if self.verify_crc else None
+        chunks = self.iter_object(target, _range=f'bytes={offset}-{offset + size - 1}',
+                                  headers={'If-Match': etag})
+        received = 0
+        try:
+            async for chunk in chunks:
+                await loop.run_in_executor(None, sink.write, offset + received, chunk)
+                received += len(chunk)
+                if crc:
+                    crc.update(chunk)
+        finally:
+            await chunks.aclose()
+        _check_length(received, size)
+        return crc.crc if crc else None
+
+    async def download_file(self, target: str, file: str, part_size: int = None,
+                            concurrency: int = 4) -> Response:
+        meta = await self.head_object(target)
+        meta.raise_for_status()
+        total = int(meta.headers['Content-Length'])
+        etag = meta.headers.get('ETag', '*')
+        pending = _split_parts(total, part_size or DEFAULT_PART_SIZE)
+        sink = _RangeFile(file, total)
+        crcs = {}
+
+        async def worker():
+            for _, offset, size in pending:
+                crcs[offset] = (await self._download_range(target, sink, offset, size, etag), size)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            self._check_parts(meta, [crcs[offset] for offset in sorted(crcs)])
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            sink.close()
+            os.remove(file)
+            raise
+        sink.close()
+        return meta
+
+    async def resumable_upload(self, target: str, file: str, checkpoint: str = None,
+                               part_size: int = None, concurrency: int = 4,
+                               **kwargs) -> Response:
+        path = checkpoint or f'{file}.ucp'
+        total = os.path.getsize(file)
+        if total == 0:
+            return await self.put_object(target, b'', **kwargs)
+        part_size = _part_size(total, part_size)
+        identity, record, stale = self._load_upload(target, file, path, total, part_size)
+        if stale:
+            await self.abort_multipart_upload(*stale)
+        if record and (await self.list_parts(target, record.state['upload_id'], 1)).status_code == 404:
+            record = None
+        if record is None:
+            upload_id = await self._initiate_multipart_upload(target, **kwargs)
+            record = Checkpoint(path, identity, upload_id=upload_id)
+            record.save()
+        upload_id = record.state['upload_id']
+        loop = asyncio.get_running_loop()
+        pending = (part for part in _split_parts(total, part_size) if str(part[0]) not in record.done)
+
+        async def worker():
+            for number, offset, size in pending:
+                data = await loop.run_in_executor(None, _read_range, file, offset, size)
+                resp = await self.upload_part(target, upload_id, number, data)
+                await loop.run_in_executor(None, record.mark, number, self._part_result(resp))
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        parts, crcs = self._checkpoint_parts(record, total, part_size)
+        resp = await self.complete_multipart_upload(target, upload_id, parts)
+        resp.raise_for_status()
+        self._check_parts(resp, crcs)
+        record.remove()
+        return resp
+
+    async def resumable_download(self, target: str, file: str, checkpoint: str = None,
+                                 part_size: int = None, concurrency: int = 4) -> Response:
+        path = checkpoint or f'{file}.dcp'
+        part_size = part_size or DEFAULT_PART_SIZE
+        meta = await self.head_object(target)
+        meta.raise_for_status()
+        total = int(meta.headers['Content-Length'])
+        etag = meta.headers.get('ETag', '*')
+        record, resumed = self._load_download(target, file, path, meta, part_size)
+        record.save()
+        loop = asyncio.get_running_loop()
+        sink = _RangeFile(f'{file}.download', total, truncate=not resumed)
+        pending = ((offset, size) for _, offset, size in _split_parts(total, part_size)
+                   if str(offset) not in record.done)
+
+        async def worker():
+            for offset, size in pending:
+                crc = await self._download_range(target, sink, offset, size, etag)
+                await loop.run_in_executor(None, record.mark, offset, crc)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        finally:
+            sink.close()
+        self._finish_download(file, meta, record, total, part_size)
+        return meta
@@ -0,0 +1,83 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> retry
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/9 3:05 下午
+@Desc   ：请求重试策略
+==================================================
+"""
+import random
+import httpx
+from typing import Optional
+
+
+class RetryPolicy:
+    """指数退避加随机抖动的重试策略 由Session统一使用
+    只重试幂等请求(GET HEAD PUT DELETE OPTIONS 以及调用方声明幂等的请求)
+    请求体为流式数据时无法重放 不会重试
+    """
+    IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'))
+    RETRY_STATUS = frozenset((500, 502, 503, 504))
+
+    def __init__(self, max_attempts: int = 3, backoff: float = 0.1,
+                 max_backoff: float = 5.0, deadline: float = None,
+                 hedge_after: float = None):
+        """
+        :param max_attempts: 包含首次请求在内的最大请求次数
+        :param backoff: 第一次重试前等待的基准秒数 之后每次翻倍
+        :param max_backoff: 单次等待的最大秒数
+        :param deadline: 单个操作从首次请求开始的总耗时预算 超过后不再重试
+        :param hedge_after: 仅异步Session有效 GET/HEAD请求超过该秒数未返回时
+            发送第二个相同请求 使用先返回的结果
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+
+    def is_idempotent(self, request: httpx.Request, idempotent: bool = None) -> bool:
+        if idempotent is not None:
+            return idempotent
+        return request.method in self.IDEMPOTENT_METHODS
+
+    @staticmethod
+    def is_replayable(request: httpx.Request) -> bool:
+        """请求体是否为内存中的字节 需要在发送前判断 流式请求体读取后无法重放"""
+        return isinstance(request.stream, httpx.ByteStream)
+
+    def can_hedge(self, request: httpx.Request) -> bool:
+        return bool(self.hedge_after) and request.method in ('GET', 'HEAD')
+
+    def remaining(self, elapsed: float) -> Optional[float]:
+        """剩余的时间预算 未设置deadline时返回None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - elapsed
+
+    def retry_delay(self, request: httpx.Request, attempt: int, elapsed: float,
+                    response: httpx.Response = None, idempotent: bool = None,
+                    replayable: bool = True) -> Optional[float]:
+        """计算下次重试前需要等待的秒数 不应重试时返回None
+        :param request: 本次请求
+        :param attempt: 已完成的请求次数
+        :param elapsed: 从首次请求开始已经过的秒数
+        :param response: 本次请求的响应 请求异常时为None
+        :param idempotent: 调用方声明的幂等性 None时按请求方法判断
+        :param replayable: 发送前请求体是否可以重放 见is_replayable
+        """
+        if response is not None and response.status_code not in self.RETRY_STATUS:
+            return None
+        if attempt >= self.max_attempts:
+            return None
+        if not replayable or not self.is_idempotent(request, idempotent):
+            return None
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+        retry_after = response.headers.get('Retry-After', '') if response is not None else ''
+        if retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        remaining = self.remaining(elapsed)
+        if remaining is not None and delay >= remaining:
+            return None
+        return delay
@@ -0,0 +1,285 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> select
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/17 10:30 上午
+@Desc   ：SelectObject请求的构建与响应帧的流式解析
+==================================================
+"""
+import zlib
+import base64
+import struct
+from typing import List, Tuple, Callable, Optional
+from xml.sax.saxutils import escape
+from xml.etree import ElementTree
+from oss.crc import ChecksumError
+
+CSV = 'csv'
+JSON = 'json'
+
+# 响应帧类型 阿里云文档时间 2020-05-13 14:34
+DATA_FRAME = 0x800001
+CONTINUOUS_FRAME = 0x800004
+END_FRAME = 0x800005
+META_END_CSV_FRAME = 0x800006
+META_END_JSON_FRAME = 0x800007
+
+# Version(1) FrameType(3) PayloadLength(4) HeaderChecksum(4)
+_HEADER = struct.Struct('>II4x')
+_CHECKSUM = struct.Struct('>I')
+
+
+def _b64(value: str) -> str:
+    return base64.b64encode(value.encode('utf8')).decode('utf8')
+
+
+def _bool(value: bool) -> str:
+    return 'true' if value else 'false'
+
+
+def select_request(sql: str, type_: str = CSV, header: str = 'NONE',
+                   record_delimiter: str = '\n', field_delimiter: str = ',',
+                   quote: str = '"', comment: str = '#', json_type: str = 'DOCUMENT',
+                   _range: str = None, compression: str = 'None',
+                   output_delimiter: str = None, output_header: bool = False,
+                   keep_all_columns: bool = False, output_raw: bool = False,
+                   enable_crc: bool = True, skip_partial: bool = False,
+                   max_skipped: int = 0) -> str:
+    """由sql生成SelectObject请求的xml 输出格式与输入格式相同
+    :param sql: sql语句 例如 select * from ossobject where _1 > 10
+    :param type_: 文件格式 csv 或 json 调用select_object时应传入相同的type_
+    :param header: csv文件头的处理方式 NONE 没有文件头 IGNORE 忽略第一行 USE 可以用列名引用
+    :param record_delimiter: 输入的记录分隔符
+    :param field_delimiter: csv的列分隔符
+    :param quote: csv的引号字符
+    :param comment: csv的注释字符
+    :param json_type: json文件的类型 DOCUMENT 或 LINES
+    :param _range: 只扫描文件的一部分 格式 line-range=0-99 或 split-range=0-9
+    :param compression: 文件压缩类型 None 或 GZIP
+    :param output_delimiter: 输出的记录分隔符 默认同record_delimiter
+    :param output_header: csv输出时是否包含文件头
+    :param keep_all_columns: csv输出时是否保留未选中的列
+    :param output_raw: 为True时响应不分帧 直接返回结果
+    :param enable_crc: 为True时每帧带有CRC32
+    :param skip_partial: 是否跳过不完整的记录
+    :param max_skipped: 允许跳过的最大记录数
+    :return:
+    """
+    type_ = type_.lower()
+    range_xml = f'<Range>{escape(_range)}</Range>' if _range else ''
+    output_delimiter = record_delimiter if output_delimiter is None else output_delimiter
+    if type_ == CSV:
+        input_xml = (f'<CSV><FileHeaderInfo>{header}</FileHeaderInfo>'
+                     f'<RecordDelimiter>{_b64(record_delimiter)}</RecordDelimiter>'
+                     f'<FieldDelimiter>{_b64(field_delimiter)}</FieldDelimiter>'
+                     f'<QuoteCharacter>{_b64(quote)}</QuoteCharacter>'
+                     f'<CommentCharacter>{_b64(comment)}</CommentCharacter>'
+                     f'{range_xml}</CSV>')
+        output_xml = (f'<CSV><RecordDelimiter>{_b64(output_delimiter)}</RecordDelimiter>'
+                      f'<FieldDelimiter>{_b64(field_delimiter)}</FieldDelimiter></CSV>'
+                      f'<KeepAllColumns>{_bool(keep_all_columns)}</KeepAllColumns>'
+                      f'<OutputHeader>{_bool(output_header)}</OutputHeader>')
+    elif type_ == JSON:
+        input_xml = f'<JSON><Type>{json_type}</Type>{range_xml}</JSON>'
+        output_xml = f'<JSON><RecordDelimiter>{_b64(output_delimiter)}</RecordDelimiter></JSON>'
+    else:
+        raise ValueError(f'不支持的格式 {type_}')
+    return ('<?xml version="1.0" encoding="UTF-8"?><SelectRequest>'
+            f'<Expression>{_b64(sql)}</Expression>'
+            f'<InputSerialization><CompressionType>{compression}</CompressionType>'
+            f'{input_xml}</InputSerialization>'
+            f'<OutputSerialization>{output_xml}'
+            f'<OutputRawData>{_bool(output_raw)}</OutputRawData>'
+            f'<EnablePayloadCrc>{_bool(enable_crc)}</EnablePayloadCrc></OutputSerialization>'
+            f'<Options><SkipPartialDataRecord>{_bool(skip_partial)}</SkipPartialDataRecord>'
+            f'<MaxSkippedRecordsAllowed>{max_skipped}</MaxSkippedRecordsAllowed></Options>'
+            '</SelectRequest>')
+
+
+def request_type(data: str) -> Optional[str]:
+    """由SelectRequest(或CreateSelectObjectMetaRequest)的InputSerialization判断文件格式
+    无法判断时返回None
+    """
+    try:
+        root = ElementTree.fromstring(data)
+    except ElementTree.ParseError:
+        return None
+    if root.find('InputSerialization/JSON') is not None:
+        return JSON
+    if root.find('InputSerialization/CSV') is not None:
+        return CSV
+    return None
+
+
+def meta_request(type_: str = CSV, record_delimiter: str = '\n', field_delimiter: str = ',',
+                 quote: str = '"', json_type: str = 'LINES', overwrite: bool = False) -> str:
+    """生成CreateSelectObjectMeta请求的xml json文件只支持LINES类型
+    :param type_: 文件格式 csv 或 json
+    :param record_delimiter: csv的记录分隔符
+    :param field_delimiter: csv的列分隔符
+    :param quote: csv的引号字符
+    :param json_type: json文件的类型
+    :param overwrite: 为True时重新生成已存在的meta
+    :return:
+    """
+    type_ = type_.lower()
+    if type_ == CSV:
+        return ('<?xml version="1.0" encoding="UTF-8"?><CsvMetaRequest>'
+                '<InputSerialization><CompressionType>None</CompressionType>'
+                f'<CSV><RecordDelimiter>{_b64(record_delimiter)}</RecordDelimiter>'
+                f'<FieldDelimiter>{_b64(field_delimiter)}</FieldDelimiter>'
+                f'<QuoteCharacter>{_b64(quote)}</QuoteCharacter></CSV></InputSerialization>'
+                f'<OverwriteIfExists>{_bool(overwrite)}</OverwriteIfExists></CsvMetaRequest>')
+    if type_ == JSON:
+        return ('<?xml version="1.0" encoding="UTF-8"?><JsonMetaRequest>'
+                '<InputSerialization><CompressionType>None</CompressionType>'
+                f'<JSON><Type>{json_type}</Type></JSON></InputSerialization>'
+                f'<OverwriteIfExists>{_bool(overwrite)}</OverwriteIfExists></JsonMetaRequest>')
+    raise ValueError(f'不支持的格式 {type_}')
+
+
+def split_ranges(total: int, parts: int) -> List[Tuple[int, int]]:
+    """将total个split(或行)尽量均匀地分为parts段 返回闭区间(first, last)"""
+    parts = max(1, min(parts, total))
+    return [(total * i // parts, total * (i + 1) // parts - 1)
+            for i in range(parts) if total * (i + 1) // parts > total * i // parts]
+
+
+class SelectError(IOError):
+    """结束帧中返回的错误 HTTP状态码为200时错误只能从结束帧得到"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f'{status} {message}')
+        self.status = status
+        self.message = message
+
+
+class SelectFrame:
+    """一个响应帧 offset为当前已扫描的字节数
+    数据帧只有data 结束帧还有total_scanned status error
+    CreateSelectObjectMeta的结束帧另有splits rows columns(json为None)
+    """
+    __slots__ = ('type', 'offset', 'data', 'total_scanned', 'status', 'error',
+                 'splits', 'rows', 'columns')
+
+    def __init__(self, type_: int, offset: int, data: bytes = b''):
+        self.type = type_
+        self.offset = offset
+        self.data = data
+        self.total_scanned = None
+        self.status = None
+        self.error = ''
+        self.splits = None
+        self.rows = None
+        self.columns = None
+
+    @property
+    def is_end(self) -> bool:
+        return self.type in (END_FRAME, META_END_CSV_FRAME, META_END_JSON_FRAME)
+
+    def __repr__(self):
+        return f'<SelectFrame {self.type:#x} offset={self.offset}>'
+
+
+def _parse_frame(type_: int, payload: bytes) -> SelectFrame:
+    offset = int.from_bytes(payload[:8], 'big')
+    if type_ == DATA_FRAME:
+        return SelectFrame(type_, offset, payload[8:])
+    frame = SelectFrame(type_, offset)
+    if type_ == CONTINUOUS_FRAME:
+        return frame
+    frame.total_scanned, frame.status = struct.unpack_from('>QI', payload, 8)
+    if type_ == META_END_CSV_FRAME:
+        frame.splits, frame.rows, frame.columns = struct.unpack_from('>IQI', payload, 20)
+        error = payload[36:]
+    elif type_ == META_END_JSON_FRAME:
+        frame.splits, frame.rows = struct.unpack_from('>IQ', payload, 20)
+        error = payload[32:]
+    else:
+        error = payload[20:]
+    frame.error = error.decode('utf8', 'replace')
+    return frame
+
+
+class FrameDecoder:
+    """增量解析SelectObject的响应帧 数据可以按任意边界传入
+    帧格式: Version(1) FrameType(3) PayloadLength(4) HeaderChecksum(4) Payload PayloadChecksum(4)
+    PayloadChecksum为Payload的CRC32 请求未开启EnablePayloadCrc时为0 不做校验
+    """
+
+    def __init__(self, verify: bool = True):
+        self.verify = verify
+        self.end = None
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes) -> List[SelectFrame]:
+        buffer = self._buffer
+        buffer += data
+        frames = []
+        pos = 0
+        while len(buffer) - pos >= _HEADER.size:
+            head, length = _HEADER.unpack_from(buffer, pos)
+            start = pos + _HEADER.size
+            stop = start + length
+            if len(buffer) < stop + _CHECKSUM.size:
+                break
+            payload = bytes(buffer[start:stop])
+            checksum, = _CHECKSUM.unpack_from(buffer, stop)
+            pos = stop + _CHECKSUM.size
+            if self.verify and checksum and zlib.crc32(payload) != checksum:
+                raise ChecksumError(f'SelectObject响应帧CRC32不一致 偏移{pos}')
+            frame = _parse_frame(head & 0xFFFFFF, payload)
+            if frame.is_end:
+                self.end = frame
+            frames.append(frame)
+        del buffer[:pos]
+        return frames
+
+    def close(self) -> SelectFrame:
+        """响应结束时调用 返回结束帧 没有收到结束帧时抛出SelectError"""
+        if self.end is None or self._buffer:
+            raise SelectError(0, '响应在结束帧之前中断')
+        return self.end
+
+
+class SelectStream:
+    """将响应字节流转换为结果 delimiter不为空时按记录返回 否则按数据帧返回
+    非数据帧传给progress回调 结束帧返回错误状态时在返回已收到的结果后由close抛出SelectError
+    """
+
+    def __init__(self, delimiter: bytes = None,
+                 progress: Optional[Callable[[SelectFrame], None]] = None,
+                 verify: bool = True):
+        self.delimiter = delimiter
+        self.progress = progress
+        self.decoder = FrameDecoder(verify)
+        self.error = None
+        self._partial = b''
+
+    def _records(self, data: bytes) -> List[bytes]:
+        records = (self._partial + data).split(self.delimiter)
+        self._partial = records.pop()
+        return records
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        results = []
+        for frame in self.decoder.feed(chunk):
+            if frame.type == DATA_FRAME:
+                if not self.delimiter:
+                    results.append(frame.data)
+                elif frame.data:
+                    results.extend(self._records(frame.data))
+                continue
+            if self.progress:
+                self.progress(frame)
+            if frame.is_end and frame.status >= 400:
+                self.error = SelectError(frame.status, frame.error)
+        return results
+
+    def close(self) -> List[bytes]:
+        self.decoder.close()
+        if self.error:
+            raise self.error
+        partial, self._partial = self._partial, b''
+        return [partial] if partial else []
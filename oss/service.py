@@ -8,22 +8,12 @@
 ==================================================
 """
 import httpx
-import asyncio
-from oss.auth import Auth
+from typing import Iterator, AsyncIterator
+from oss.session import BaseClient, AsyncBaseClient
+from oss.models import BucketSummary, parse_list_buckets
 
 
-class Service:
-    def __init__(self, auth: Auth):
-        self.auth = auth
-        self.client = httpx.Client()
-
-    def __del__(self):
-        if not self.client.is_closed:
-            self.client.close()
-
-    def build_request(self, *args, **kwargs) -> httpx.Request:
-        return self.client.build_request(*args, **kwargs)
-
+class Service(BaseClient):
     def get_service(self, prefix: str = '', marker: str = '',
                     max_keys: int = 0, **kwargs) -> httpx.Response:
         """返回请求者拥有的所有存储空间
@@ -42,27 +32,42 @@ class Service:
             params['max-keys'] = max_keys
         url = f'https://{self.auth.bucket}.{self.auth.endpoint}'
         r = self.build_request('GET', url, params=params, **kwargs)
-        self.auth.signature(r)
-        resp = self.client.send(r)
+        r.extensions['oss_operation'] = 'ListBuckets'
+        resp = self.send(r)
         return resp
 
+    def iter_buckets(self, prefix: str = '', page_size: int = 1000) -> Iterator[BucketSummary]:
+        """自动翻页列举所有储存桶 逐个返回
+        :param prefix: 限定返回的bucket name必须以prefix作为前缀
+        :param page_size: 每页请求的数量 最大1000
+        :return:
+        """
+        marker = ''
+        while True:
+            resp = self.get_service(prefix, marker, page_size)
+            resp.raise_for_status()
+            page = parse_list_buckets(resp.content)
+            yield from page.buckets
+            if not page.is_truncated:
+                break
+            marker = page.next_marker
 
-class AsyncService(Service):
-    def __init__(self, auth: Auth):
-        self.auth = auth
-        self.client = httpx.AsyncClient()
-
-    def __del__(self):
-        try:
-            if not self.client.is_closed:
-                task = asyncio.create_task(self.client.aclose())
-                task.result()
-        except RuntimeError:
-            pass
-        except asyncio.exceptions.InvalidStateError:
-            pass
 
+class AsyncService(AsyncBaseClient, Service):
     async def get_service(self, prefix: str = '', marker: str = '',
                           max_keys: int = 0, **kwargs) -> httpx.Response:
         corn = super().get_service(prefix, marker, max_keys, **kwargs)
         return await corn
+
+    async def iter_buckets(self, prefix: str = '',
+                           page_size: int = 1000) -> AsyncIterator[BucketSummary]:
+        marker = ''
+        while True:
+            resp = await self.get_service(prefix, marker, page_size)
+            resp.raise_for_status()
+            page = parse_list_buckets(resp.content)
+            for bucket in page.buckets:
+                yield bucket
+            if not page.is_truncated:
+                break
+            marker = page.next_marker
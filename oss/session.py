@@ -0,0 +1,328 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> session
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/8 10:40 上午
+@Desc   ：多个客户端共用的连接池
+==================================================
+"""
+import time
+import httpx
+import asyncio
+from typing import Union, Iterable, Callable
+from oss.auth import Auth
+from oss.metrics import RequestEvent
+from oss.retry import RetryPolicy
+from oss.limiter import AdaptiveLimiter
+
+
+class Session:
+    """同步连接池 可以同时传给Service、Bucket、ObjectClient共用
+    with Session() as session:
+        bucket = Bucket(auth, session)
+        client = ObjectClient(auth, session)
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive_connections: int = 20,
+                 keepalive_expiry: float = 5.0, http2: bool = False,
+                 timeout: Union[float, httpx.Timeout] = 5.0,
+                 retry: RetryPolicy = RetryPolicy(),
+                 hooks: Iterable[Callable[[RequestEvent], None]] = (), **kwargs):
+        """
+        :param max_connections: 最大连接数
+        :param max_keepalive_connections: 最大空闲保持连接数
+        :param keepalive_expiry: 空闲连接保持秒数
+        :param http2: 是否启用HTTP/2 需要安装 httpx[http2]
+        :param timeout: 超时秒数或httpx.Timeout
+        :param retry: 重试策略 为None时不重试
+        :param hooks: 每次send结束(包括所有重试)后依次调用 参数为oss.metrics.RequestEvent
+            为空时不记录任何信息 例如 hooks=[oss.metrics.MetricsAggregator()]
+        :param kwargs: 用于构建httpx客户端的其他参数
+        """
+        self.retry = retry
+        self.hooks = list(hooks)
+        self.client = self._build_client(limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ), http2=http2, timeout=timeout, **kwargs)
+
+    @staticmethod
+    def _build_client(**kwargs):
+        return httpx.Client(**kwargs)
+
+    @property
+    def is_closed(self) -> bool:
+        return self.client.is_closed
+
+    def _prepare(self, auth: Auth, request: httpx.Request, bucket: str, elapsed: float) -> None:
+        """每次请求前重新签名 避免重试时Date过期 并把超时限制在剩余预算内
+        每个阶段取配置的超时和剩余预算中较小的一个 配置为None的阶段保持不限制
+        """
+        auth.signature(request, bucket=bucket)
+        remaining = self.retry.remaining(elapsed) if self.retry else None
+        if remaining is not None:
+            configured = request.extensions.setdefault('oss_timeout',
+                                                       request.extensions.get('timeout', {}))
+            remaining = max(remaining, 0.001)
+            request.extensions['timeout'] = {
+                phase: None if configured.get(phase) is None else min(configured[phase], remaining)
+                for phase in ('connect', 'read', 'write', 'pool')}
+
+    def send(self, auth: Auth, request: httpx.Request, *, bucket: str = None,
+             stream: bool = False, idempotent: bool = None) -> httpx.Response:
+        """签名并发送请求 按重试策略处理连接错误和5xx响应
+        :param auth: 用于签名的Auth
+        :param request: 要发送的请求
+        :param bucket: 签名使用的bucket
+        :param stream: 是否以流的方式读取响应
+        :param idempotent: 声明请求是否幂等 None时按请求方法判断
+        """
+        if not self.hooks:
+            return self._send(auth, request, bucket, stream, idempotent, None)
+        event = RequestEvent(request, bucket or auth.bucket)
+        request.extensions['trace'] = event.trace
+        try:
+            resp = self._send(auth, request, bucket, stream, idempotent, event)
+        except BaseException as e:
+            self._emit(event.finish(None, stream, e))
+            raise
+        self._emit(event.finish(resp, stream))
+        return resp
+
+    def _emit(self, event: RequestEvent) -> None:
+        for hook in self.hooks:
+            hook(event)
+
+    def _send(self, auth: Auth, request: httpx.Request, bucket: str, stream: bool,
+              idempotent: bool, event: RequestEvent) -> httpx.Response:
+        start = time.monotonic()
+        replayable = RetryPolicy.is_replayable(request)
+        attempt = 0
+        while True:
+            attempt += 1
+            if event is not None:
+                event.attempts = attempt
+            self._prepare(auth, request, bucket, time.monotonic() - start)
+            try:
+                resp = self.client.send(request, stream=stream)
+            except httpx.TransportError:
+                delay = self._retry_delay(request, attempt, start, None, idempotent, replayable)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(request, attempt, start, resp, idempotent, replayable)
+                if delay is None:
+                    return resp
+                resp.close()
+            time.sleep(delay)
+
+    def _retry_delay(self, request: httpx.Request, attempt: int, start: float,
+                     resp: httpx.Response, idempotent: bool, replayable: bool):
+        if not self.retry:
+            return None
+        elapsed = time.monotonic() - start
+        return self.retry.retry_delay(request, attempt, elapsed, resp, idempotent, replayable)
+
+    def close(self) -> None:
+        if not self.client.is_closed:
+            self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class AsyncSession(Session):
+    """异步连接池 用于AsyncService、AsyncBucket、ObjectAsyncClient"""
+    THROTTLE_STATUS = frozenset((429, 503))
+
+    def __init__(self, *args, limiter: AdaptiveLimiter = None, **kwargs):
+        """
+        :param limiter: 所有经过该session的请求共用的自适应并发控制
+        其他参数同Session
+        """
+        self.limiter = limiter
+        super().__init__(*args, **kwargs)
+
+    @staticmethod
+    def _build_client(**kwargs):
+        return httpx.AsyncClient(**kwargs)
+
+    async def send(self, auth: Auth, request: httpx.Request, *, bucket: str = None,
+                   stream: bool = False, idempotent: bool = None) -> httpx.Response:
+        if not self.hooks:
+            return await self._send(auth, request, bucket, stream, idempotent, None)
+        event = RequestEvent(request, bucket or auth.bucket)
+        request.extensions['trace'] = event.atrace
+        try:
+            resp = await self._send(auth, request, bucket, stream, idempotent, event)
+        except BaseException as e:
+            self._emit(event.finish(None, stream, e))
+            raise
+        self._emit(event.finish(resp, stream))
+        return resp
+
+    async def _send(self, auth: Auth, request: httpx.Request, bucket: str, stream: bool,
+                    idempotent: bool, event: RequestEvent) -> httpx.Response:
+        start = time.monotonic()
+        replayable = RetryPolicy.is_replayable(request)
+        attempt = 0
+        while True:
+            attempt += 1
+            if event is not None:
+                event.attempts = attempt
+            try:
+                resp = await self._send_limited(auth, request, bucket, stream, start)
+            except httpx.TransportError:
+                delay = self._retry_delay(request, attempt, start, None, idempotent, replayable)
+                if delay is None:
+                    raise
+            else:
+                delay = self._retry_delay(request, attempt, start, resp, idempotent, replayable)
+                if delay is None:
+                    return resp
+                await resp.aclose()
+            await asyncio.sleep(delay)
+
+    async def _send_limited(self, auth: Auth, request: httpx.Request, bucket: str,
+                            stream: bool, start: float) -> httpx.Response:
+        """单次请求 设置了limiter时先获取并发名额 并反馈耗时和是否被限流"""
+        if not self.limiter:
+            return await self._send_once(auth, request, bucket, stream, start)
+        epoch = await self.limiter.acquire()
+        sent = time.monotonic()
+        try:
+            resp = await self._send_once(auth, request, bucket, stream, start)
+        except BaseException as e:
+            self.limiter.release(epoch, time.monotonic() - sent,
+                                 isinstance(e, httpx.TimeoutException))
+            raise
+        self.limiter.release(epoch, time.monotonic() - sent,
+                             resp.status_code in self.THROTTLE_STATUS)
+        return resp
+
+    async def _send_once(self, auth: Auth, request: httpx.Request, bucket: str,
+                         stream: bool, start: float) -> httpx.Response:
+        # 获取并发名额后再签名 避免排队过久导致Date过期
+        self._prepare(auth, request, bucket, time.monotonic() - start)
+        if self.retry and self.retry.can_hedge(request):
+            return await self._send_hedged(auth, request, bucket, stream)
+        return await self.client.send(request, stream=stream)
+
+    async def _send_hedged(self, auth: Auth, request: httpx.Request, bucket: str,
+                           stream: bool) -> httpx.Response:
+        """首个请求超过hedge_after秒未返回时发送一个副本 返回先成功的响应"""
+        first = asyncio.ensure_future(self.client.send(request, stream=stream))
+        done, _ = await asyncio.wait({first}, timeout=self.retry.hedge_after)
+        if done:
+            return first.result()
+        hedge = httpx.Request(request.method, request.url, headers=request.headers,
+                              extensions=dict(request.extensions))
+        auth.signature(hedge, bucket=bucket)
+        pending = {first, asyncio.ensure_future(self.client.send(hedge, stream=stream))}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                if not pending:
+                    raise done.pop().exception()
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    resp = await task
+                except BaseException:
+                    continue
+                await resp.aclose()
+
+    def close(self) -> None:
+        raise TypeError('AsyncSession 请使用 await aclose()')
+
+    async def aclose(self) -> None:
+        if not self.client.is_closed:
+            await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+
+class BaseClient:
+    """客户端公共部分 未传入session时使用独占的连接池"""
+    session_class = Session
+
+    def __init__(self, auth: Auth, session: Session = None):
+        if session is not None and (isinstance(session, AsyncSession)
+                                    != issubclass(self.session_class, AsyncSession)):
+            raise TypeError(f'{type(self).__name__} 需要 {self.session_class.__name__}')
+        self.auth = auth
+        self._own_session = session is None
+        self.session = session if session else self.session_class()
+        self.client = self.session.client
+
+    def __del__(self):
+        if getattr(self, '_own_session', False) and not self.client.is_closed:
+            self.client.close()
+
+    def close(self) -> None:
+        """关闭独占的连接池 共用的session需要由使用者关闭"""
+        if self._own_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def build_request(self, *args, **kwargs) -> httpx.Request:
+        return self.client.build_request(*args, **kwargs)
+
+    def send(self, request: httpx.Request, *, bucket: str = None, stream: bool = False,
+             idempotent: bool = None) -> httpx.Response:
+        """通过session签名并发送请求 异步客户端返回coroutine"""
+        return self.session.send(self.auth, request, bucket=bucket, stream=stream,
+                                 idempotent=idempotent)
+
+    def _after(self, resp: httpx.Response, callback):
+        """对响应进行后处理 异步子类会在响应返回后再调用callback"""
+        return callback(resp)
+
+
+class AsyncBaseClient(BaseClient):
+    session_class = AsyncSession
+
+    def __del__(self):
+        # 无法在__del__中等待关闭 只能在事件循环仍在运行时安排关闭
+        if getattr(self, '_own_session', False) and not self.client.is_closed:
+            try:
+                asyncio.get_running_loop().create_task(self.client.aclose())
+            except RuntimeError:
+                pass
+
+    def close(self) -> None:
+        raise TypeError(f'{type(self).__name__} 请使用 await aclose()')
+
+    async def aclose(self) -> None:
+        if self._own_session:
+            await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    def _after(self, corn, callback):
+        async def _wait():
+            return callback(await corn)
+        return _wait()
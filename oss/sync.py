@@ -0,0 +1,319 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> sync
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/13 2:40 下午
+@Desc   ：本地目录与储存桶前缀之间的增量同步
+==================================================
+"""
+import os
+import time
+import asyncio
+import hashlib
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from oss.auth import Auth
+from oss.session import AsyncSession
+from oss.bucket import AsyncBucket
+from oss.models import ObjectSummary
+from oss.object import ObjectAsyncClient, DEFAULT_PART_SIZE, STREAM_CHUNK_SIZE
+
+UPLOAD = 'upload'
+DOWNLOAD = 'download'
+DELETE_REMOTE = 'delete_remote'
+DELETE_LOCAL = 'delete_local'
+
+
+class LocalFile:
+    __slots__ = ('path', 'size', 'mtime')
+
+    def __init__(self, path: str, size: int, mtime: float):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+
+class SyncAction:
+    """一次需要执行的操作 key为OSS文件路径 path为本地路径"""
+    __slots__ = ('op', 'key', 'path', 'size', 'mtime')
+
+    def __init__(self, op: str, key: str, path: str, size: int = 0, mtime: float = None):
+        self.op = op
+        self.key = key
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+
+    def __repr__(self):
+        return f'<SyncAction {self.op} {self.key!r}>'
+
+
+class SyncStats:
+    """一次同步的统计 dry_run时只有actions和skipped"""
+    __slots__ = ('actions', 'uploaded', 'downloaded', 'deleted', 'skipped',
+                 'bytes', 'failed', 'elapsed')
+
+    def __init__(self):
+        self.actions = []
+        self.uploaded = 0
+        self.downloaded = 0
+        self.deleted = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.failed = {}
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        return (f'uploaded={self.uploaded} downloaded={self.downloaded} deleted={self.deleted} '
+                f'skipped={self.skipped} failed={len(self.failed)} bytes={self.bytes} '
+                f'elapsed={self.elapsed:.2f}s')
+
+    def __repr__(self):
+        return f'<SyncStats {self.summary()}>'
+
+
+def _parse_time(value: str) -> float:
+    """ListObjects的LastModified 例如 2021-02-13T06:40:00.000Z"""
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S.%fZ').replace(
+        tzinfo=timezone.utc).timestamp()
+
+
+def _file_md5(path: str) -> str:
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+def _plain_md5(etag: str) -> Optional[str]:
+    """分片上传和追加上传的ETag不是文件的MD5 返回None"""
+    etag = etag.strip('"').lower()
+    return etag if len(etag) == 32 and '-' not in etag else None
+
+
+def _local_path(directory: str, rel: str) -> Optional[str]:
+    """OSS文件对应的本地路径 包含空、.或..路径段以及解析后不在directory下时返回None"""
+    parts = rel.split('/')
+    if any(part in ('', '.', '..') for part in parts):
+        return None
+    path = os.path.join(directory, *parts)
+    root = os.path.realpath(directory)
+    if os.path.commonpath([root, os.path.realpath(path)]) != root:
+        return None
+    return path
+
+
+def walk(directory: str) -> Dict[str, LocalFile]:
+    """列出目录下的所有文件 key为以/分隔的相对路径"""
+    files = {}
+    stack = [(directory, '')]
+    while stack:
+        path, rel = stack.pop()
+        with os.scandir(path) as it:
+            for entry in it:
+                name = f'{rel}{entry.name}'
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, f'{name}/'))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[name] = LocalFile(entry.path, stat.st_size, stat.st_mtime)
+    return files
+
+
+class DirectorySync:
+    """本地目录与储存桶前缀之间的增量同步 只传输有变化的文件
+    默认按大小和修改时间比较 compare='md5'时比较本地文件的MD5和ETag
+    ETag不是MD5(分片上传的文件)时退回按修改时间比较
+    async with DirectorySync(auth, concurrency=32) as sync:
+        stats = await sync.upload('build/', 'releases/v1/')
+        print(stats.summary())
+    """
+
+    def __init__(self, auth: Auth, session: AsyncSession = None, concurrency: int = 16,
+                 compare: str = 'mtime', delete: bool = False, dry_run: bool = False):
+        """
+        :param auth: 签名使用的Auth
+        :param session: 共用的连接池 未传入时使用独占的连接池
+        :param concurrency: 同时传输的文件数
+        :param compare: 比较方式 mtime 或 md5
+        :param delete: 是否删除目标中多余的文件
+        :param dry_run: 只计算需要执行的操作 不实际传输
+        """
+        if compare not in ('mtime', 'md5'):
+            raise ValueError('compare 应为 mtime 或 md5')
+        self._own_session = session is None
+        self.session = session if session else AsyncSession()
+        self.client = ObjectAsyncClient(auth, self.session)
+        self.bucket = AsyncBucket(auth, self.session)
+        self.concurrency = concurrency
+        self.compare = compare
+        self.delete = delete
+        self.dry_run = dry_run
+
+    async def aclose(self) -> None:
+        if self._own_session:
+            await self.session.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    async def _list_remote(self, prefix: str) -> Dict[str, ObjectSummary]:
+        remote = {}
+        async for obj in self.bucket.iter_objects(prefix or None):
+            rel = obj.key[len(prefix):]
+            if rel and not rel.endswith('/'):
+                remote[rel] = obj
+        return remote
+
+    async def _scan(self, directory: str, prefix: str):
+        loop = asyncio.get_running_loop()
+        local_task = loop.run_in_executor(None, walk, directory)
+        remote = await self._list_remote(prefix)
+        return await local_task, remote
+
+    async def _changed(self, local: LocalFile, remote: ObjectSummary, newer_side: str) -> bool:
+        """
+        :param newer_side: local时本地较新才算变化 remote时远端较新才算变化
+        """
+        if local.size != remote.size:
+            return True
+        md5 = _plain_md5(remote.etag) if self.compare == 'md5' else None
+        if md5 is not None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, _file_md5, local.path) != md5
+        remote_mtime = _parse_time(remote.last_modified)
+        if newer_side == 'local':
+            return int(local.mtime) > remote_mtime
+        return int(remote_mtime) > local.mtime
+
+    async def _compare(self, pairs: List[Tuple[Optional[LocalFile], Optional[ObjectSummary]]],
+                       newer_side: str) -> List[bool]:
+        """并发比较每对文件是否有变化 与传输一样最多concurrency个同时进行 结果与pairs顺序一致
+        compare='md5'时计算MD5是主要耗时 任意一侧不存在时视为有变化
+        """
+        results = [True] * len(pairs)
+        items = iter(enumerate(pairs))
+
+        async def worker():
+            for i, (f, obj) in items:
+                if f is not None and obj is not None:
+                    results[i] = await self._changed(f, obj, newer_side)
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return results
+
+    async def _plan(self, local: Dict[str, LocalFile], remote: Dict[str, ObjectSummary],
+                    directory: str, prefix: str, direction: str,
+                    stats: SyncStats) -> List[SyncAction]:
+        actions = []
+        if direction == UPLOAD:
+            changed = await self._compare([(f, remote.get(rel)) for rel, f in local.items()],
+                                          'local')
+            for (rel, f), is_changed in zip(local.items(), changed):
+                if is_changed:
+                    actions.append(SyncAction(UPLOAD, prefix + rel, f.path, f.size))
+                else:
+                    stats.skipped += 1
+            if self.delete:
+                actions.extend(SyncAction(DELETE_REMOTE, prefix + rel, '')
+                               for rel in remote.keys() - local.keys())
+        else:
+            paths = {}
+            for rel, obj in remote.items():
+                path = _local_path(directory, rel)
+                if path is None:
+                    # 例如 pre/../x 会写到目录之外
+                    stats.failed[obj.key] = 'ValueError: 本地路径不在同步目录下'
+                else:
+                    paths[rel] = path
+            safe = [(rel, remote[rel]) for rel in paths]
+            changed = await self._compare([(local.get(rel), obj) for rel, obj in safe], 'remote')
+            for (rel, obj), is_changed in zip(safe, changed):
+                if is_changed:
+                    path = paths[rel]
+                    actions.append(SyncAction(DOWNLOAD, obj.key, path, obj.size,
+                                              _parse_time(obj.last_modified)))
+                else:
+                    stats.skipped += 1
+            if self.delete:
+                actions.extend(SyncAction(DELETE_LOCAL, prefix + rel, local[rel].path)
+                               for rel in local.keys() - remote.keys())
+        return actions
+
+    async def upload(self, directory: str, prefix: str = '') -> SyncStats:
+        """把本地目录同步到储存桶前缀
+        :param directory: 本地目录
+        :param prefix: OSS路径前缀 例如 releases/v1/
+        """
+        return await self._sync(directory, prefix, UPLOAD)
+
+    async def download(self, prefix: str, directory: str) -> SyncStats:
+        """把储存桶前缀同步到本地目录 下载的文件修改时间设置为OSS的LastModified
+        :param prefix: OSS路径前缀
+        :param directory: 本地目录 不存在时自动创建
+        """
+        os.makedirs(directory, exist_ok=True)
+        return await self._sync(directory, prefix, DOWNLOAD)
+
+    async def _sync(self, directory: str, prefix: str, direction: str) -> SyncStats:
+        start = time.monotonic()
+        prefix = prefix.lstrip('/')
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        stats = SyncStats()
+        local, remote = await self._scan(directory, prefix)
+        stats.actions = await self._plan(local, remote, directory, prefix, direction, stats)
+        if not self.dry_run:
+            await self._execute(stats)
+        stats.elapsed = time.monotonic() - start
+        return stats
+
+    async def _execute(self, stats: SyncStats) -> None:
+        actions = iter(stats.actions)
+        deletes = [a.key for a in stats.actions if a.op == DELETE_REMOTE]
+        if deletes:
+            failures = await self.client.delete_many(deletes)
+            stats.failed.update(failures)
+            stats.deleted += len(deletes) - len(failures)
+
+        async def worker():
+            for action in actions:
+                try:
+                    await self._run(action, stats)
+                except Exception as e:
+                    stats.failed[action.key] = f'{type(e).__name__}: {e}'
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+    async def _run(self, action: SyncAction, stats: SyncStats) -> None:
+        loop = asyncio.get_running_loop()
+        if action.op == UPLOAD:
+            resp = await self.client.upload_file(action.key, action.path)
+            resp.raise_for_status()
+            stats.uploaded += 1
+            stats.bytes += action.size
+        elif action.op == DOWNLOAD:
+            await loop.run_in_executor(None, lambda: os.makedirs(
+                os.path.dirname(action.path), exist_ok=True))
+            tmp = f'{action.path}.oss-sync'
+            try:
+                if action.size > DEFAULT_PART_SIZE:
+                    await self.client.download_file(action.key, tmp)
+                else:
+                    await self.client.download_to(action.key, tmp)
+                await loop.run_in_executor(None, os.utime, tmp, (action.mtime, action.mtime))
+                await loop.run_in_executor(None, os.replace, tmp, action.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+            stats.downloaded += 1
+            stats.bytes += action.size
+        elif action.op == DELETE_LOCAL:
+            await loop.run_in_executor(None, os.remove, action.path)
+            stats.deleted += 1
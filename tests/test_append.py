@@ -0,0 +1,184 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_append
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/11 11:20 上午
+@Desc   ：
+==================================================
+"""
+import asyncio
+import httpx
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.session import Session, AsyncSession
+from oss.object import ObjectClient, ObjectAsyncClient
+from oss.crc import crc64
+from oss.append import AppendWriter, AsyncAppendWriter, AppendConflictError
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+class FakeAppendable:
+    """模拟AppendObject接口 position与当前长度不一致时返回409
+    lost为True时下一次追加成功后返回连接错误 模拟响应丢失
+    """
+
+    def __init__(self, content: bytes = b''):
+        self.content = content
+        self.appends = 0
+        self.heads = 0
+        self.lost = False
+
+    def headers(self, **headers) -> dict:
+        headers['x-oss-hash-crc64ecma'] = str(crc64(self.content))
+        return headers
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == 'HEAD':
+            self.heads += 1
+            if not self.content:
+                return httpx.Response(404)
+            return httpx.Response(200, headers=self.headers(**{
+                'Content-Length': str(len(self.content))}))
+        position = int(request.url.params['position'])
+        if position != len(self.content):
+            return httpx.Response(409, text='<Error><Code>PositionNotEqualToLength</Code></Error>')
+        self.appends += 1
+        self.content += request.read()
+        if self.lost:
+            self.lost = False
+            raise httpx.ReadError('connection reset', request=request)
+        return httpx.Response(200, headers=self.headers(**{
+            'x-oss-next-append-position': str(len(self.content))}))
+
+
+class TestAppendWriter(TestCase):
+    def make_client(self, server):
+        return ObjectClient(auth, Session(transport=httpx.MockTransport(server)))
+
+    def test_coalesce_by_size(self):
+        server = FakeAppendable()
+        with AppendWriter(self.make_client(server), 'log.txt', buffer_size=9,
+                          max_delay=60) as writer:
+            for _ in range(7):
+                writer.write(b'abc')
+            self.assertEqual(server.appends, 2)
+        self.assertEqual(server.content, b'abc' * 7)
+        self.assertEqual(server.appends, 3)
+        self.assertEqual(server.heads, 1)
+        self.assertEqual(writer.position, 21)
+        with self.assertRaises(ValueError):
+            writer.write(b'x')
+
+    def test_flush_by_delay(self):
+        server = FakeAppendable()
+        writer = AppendWriter(self.make_client(server), 'log.txt', position=0, max_delay=0)
+        writer.write(b'a')
+        writer.write(b'b')
+        self.assertEqual(server.content, b'ab')
+        self.assertEqual(server.appends, 2)
+        self.assertEqual(server.heads, 0)
+
+    def test_position_conflict(self):
+        server = FakeAppendable(b'other writer\n')
+        writer = AppendWriter(self.make_client(server), 'log.txt', position=0)
+        writer.write(b'mine\n')
+        with self.assertRaises(AppendConflictError):
+            writer.flush()
+        self.assertEqual(server.content, b'other writer\n')
+        self.assertEqual(bytes(writer._buffer), b'mine\n')
+
+    def test_lost_response(self):
+        server = FakeAppendable()
+        writer = AppendWriter(self.make_client(server), 'log.txt', position=0)
+        writer.write(b'first')
+        writer.flush()
+        writer.write(b'second')
+        server.lost = True
+        with self.assertRaises(httpx.ReadError):
+            writer.flush()
+        writer.flush()
+        self.assertEqual(server.content, b'firstsecond')
+        self.assertEqual(server.appends, 2)
+        self.assertEqual(writer.position, 11)
+        self.assertFalse(writer._buffer)
+
+    def test_lost_response_changed(self):
+        server = FakeAppendable()
+        writer = AppendWriter(self.make_client(server), 'log.txt', position=0)
+        writer.write(b'data')
+        server.lost = True
+        with self.assertRaises(httpx.ReadError):
+            writer.flush()
+        server.content = b'DATA'
+        with self.assertRaises(AppendConflictError):
+            writer.flush()
+
+    def test_error_keeps_buffer(self):
+        def handler(request):
+            return httpx.Response(403)
+        client = ObjectClient(auth, Session(transport=httpx.MockTransport(handler), retry=None))
+        writer = AppendWriter(client, 'log.txt', position=0)
+        writer.write(b'data')
+        with self.assertRaises(httpx.HTTPStatusError):
+            writer.flush()
+        self.assertEqual(bytes(writer._buffer), b'data')
+
+
+class TestAsyncAppendWriter(IsolatedAsyncioTestCase):
+    def make_client(self, server):
+        return ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(server)))
+
+    async def test_coalesce_by_size(self):
+        server = FakeAppendable()
+        async with AsyncAppendWriter(self.make_client(server), 'log.txt', buffer_size=9,
+                                     max_delay=60) as writer:
+            for _ in range(7):
+                await writer.write(b'abc')
+        self.assertEqual(server.content, b'abc' * 7)
+        self.assertEqual(server.appends, 3)
+
+    async def test_flush_by_timer(self):
+        server = FakeAppendable()
+        writer = AsyncAppendWriter(self.make_client(server), 'log.txt', max_delay=0.01)
+        await writer.write(b'tick')
+        self.assertEqual(server.appends, 0)
+        await asyncio.sleep(0.1)
+        self.assertEqual(server.content, b'tick')
+        await writer.close()
+        self.assertEqual(server.appends, 1)
+
+    async def test_position_conflict(self):
+        server = FakeAppendable(b'head')
+        writer = AsyncAppendWriter(self.make_client(server), 'log.txt', position=0)
+        await writer.write(b'tail')
+        with self.assertRaises(AppendConflictError):
+            await writer.close()
+        self.assertEqual(server.content, b'head')
+
+    async def test_lost_response(self):
+        server = FakeAppendable(b'head')
+        writer = AsyncAppendWriter(self.make_client(server), 'log.txt')
+        await writer.write(b'tail')
+        server.lost = True
+        with self.assertRaises(httpx.ReadError):
+            await writer.flush()
+        await writer.close()
+        self.assertEqual(server.content, b'headtail')
+        self.assertEqual(writer.position, 8)
+
+    async def test_timer_error(self):
+        def handler(request):
+            return httpx.Response(403)
+        client = ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(handler),
+                                                      retry=None))
+        writer = AsyncAppendWriter(client, 'log.txt', position=0, max_delay=0.01)
+        await writer.write(b'tick')
+        await asyncio.sleep(0.1)
+        with self.assertRaises(httpx.HTTPStatusError):
+            await writer.write(b'tock')
+        self.assertEqual(bytes(writer._buffer), b'tick')
@@ -0,0 +1,87 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_auth
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/5 2:30 下午
+@Desc   ：
+==================================================
+"""
+import hmac
+import time
+import base64
+import hashlib
+from unittest import TestCase
+import httpx
+from httpx import Request
+from oss.auth import Auth
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+def expected(request: Request, resource: str) -> str:
+    headers = request.headers
+    oss_headers = ''.join(f'{k}:{v.strip()}\n' for k, v in sorted(headers.items())
+                          if k.startswith('x-oss-'))
+    message = (f'{request.method}\n{headers.get("content-md5", "")}\n'
+               f'{headers.get("content-type", "")}\n{headers["date"]}\n{oss_headers}{resource}')
+    digest = hmac.new(b'YouAccessKeySecret', message.encode(), hashlib.sha1).digest()
+    return f'OSS YouAccessKeyId:{base64.b64encode(digest).decode()}'
+
+
+class TestAuth(TestCase):
+    def test_signature(self):
+        r = Request('PUT', 'https://bucket.endpoing/dir/a.txt',
+                    headers={'Content-Type': 'text/plain', 'Content-MD5': 'md5',
+                             'X-OSS-Meta-B': ' 2 ', 'x-oss-meta-a': '1'})
+        auth.signature(r)
+        self.assertRegex(r.headers['Date'], r'^\w{3}, \d{2} \w{3} \d{4} \d{2}:\d{2}:\d{2} GMT$')
+        self.assertEqual(r.headers['Authorization'], expected(r, '/bucket/dir/a.txt'))
+
+    def test_signature_bucket(self):
+        r = Request('GET', 'https://other.endpoing/?acl')
+        auth.signature(r, bucket='other')
+        self.assertEqual(r.headers['Authorization'], expected(r, '/other/?acl'))
+
+    def test_canonical_query(self):
+        self.assertEqual(Auth.canonical_query(''), '')
+        self.assertEqual(Auth.canonical_query('max-keys=10&prefix=a'), '')
+        self.assertEqual(Auth.canonical_query('append&position=10'), '?append&position=10')
+        self.assertEqual(Auth.canonical_query('uploadId=u1&partNumber=3&max-parts=5'),
+                         '?partNumber=3&uploadId=u1')
+        self.assertEqual(Auth.canonical_query('x-oss-process=image%2Fresize%2Cw_100'),
+                         '?x-oss-process=image/resize,w_100')
+
+    def test_secret_change(self):
+        client = Auth('id', 'secret1', 'bucket', 'endpoing')
+        first = client._sign(b'message')
+        client.accessKeySecret = 'secret2'
+        self.assertNotEqual(client._sign(b'message'), first)
+
+    def test_presign(self):
+        url = httpx.URL(auth.presign('GET', '/dir/a b.jpg', 60,
+                                     {'x-oss-process': 'image/resize,w_100', 'foo': '1'}))
+        self.assertEqual(url.host, 'bucket.endpoing')
+        self.assertEqual(url.path, '/dir/a b.jpg')
+        params = url.params
+        self.assertEqual(params['OSSAccessKeyId'], 'YouAccessKeyId')
+        self.assertAlmostEqual(int(params['Expires']), time.time() + 60, delta=2)
+        message = (f'GET\n\n\n{params["Expires"]}\n'
+                   f'/bucket/dir/a b.jpg?x-oss-process=image/resize,w_100')
+        digest = hmac.new(b'YouAccessKeySecret', message.encode(), hashlib.sha1).digest()
+        self.assertEqual(params['Signature'], base64.b64encode(digest).decode())
+        self.assertEqual(params['x-oss-process'], 'image/resize,w_100')
+
+    def test_presign_many(self):
+        keys = [f'img/{i}.png' for i in range(100)]
+        urls = auth.presign_many(keys, 'PUT', 300)
+        self.assertEqual(len(urls), 100)
+        for key, url in zip(keys, urls):
+            url = httpx.URL(url)
+            self.assertEqual(url.path, f'/{key}')
+            message = f'PUT\n\n\n{url.params["Expires"]}\n/bucket/{key}'
+            digest = hmac.new(b'YouAccessKeySecret', message.encode(), hashlib.sha1).digest()
+            self.assertEqual(url.params['Signature'], base64.b64encode(digest).decode())
@@ -7,9 +7,15 @@
 @Desc   ：
 ==================================================
 """
-from unittest import TestCase
+import httpx
+import asyncio
+from urllib.parse import quote
+from unittest import TestCase, IsolatedAsyncioTestCase
 from oss.auth import Auth
-from oss.bucket import Bucket
+from oss.emulator import Emulator
+from oss.session import Session, AsyncSession
+from oss.bucket import Bucket, AsyncBucket
+from oss.object import ObjectClient
 
 auth = Auth(
     'YouAccessKeyId', 'YouAccessKeySecret',
@@ -42,3 +48,179 @@ class TestBucket(TestCase):
     def test_get_bucket_worm(self):
         r = self.client.get_bucket_info('xiaosdq31')
         self.assertIn(r.status_code, [200, ])
+
+
+class FakeListing:
+    """模拟ListObjects接口 按marker/prefix/delimiter分页返回url编码的结果"""
+
+    def __init__(self, keys):
+        self.keys = sorted(keys)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        self.requests.append(params)
+        prefix = params.get('prefix', '')
+        marker = params.get('marker', '')
+        delimiter = params.get('delimiter', '')
+        limit = int(params.get('max-keys', 100))
+        contents, prefixes = [], []
+        for key in self.keys:
+            if not key.startswith(prefix) or key <= marker:
+                continue
+            if delimiter and delimiter in key[len(prefix):]:
+                common = key[:key.index(delimiter, len(prefix)) + 1]
+                if common <= marker or (prefixes and prefixes[-1] == common):
+                    continue
+                prefixes.append(common)
+            else:
+                contents.append(key)
+            if len(contents) + len(prefixes) == limit:
+                break
+        last = max(contents + prefixes) if contents or prefixes else ''
+        truncated = any(k > last and k.startswith(prefix) for k in self.keys) and bool(last)
+        if delimiter and truncated and last in prefixes:
+            truncated = any(k > last and not k.startswith(last) and k.startswith(prefix)
+                            for k in self.keys)
+        body = ''.join(f'<Contents><Key>{quote(k)}</Key><ETag>"e"</ETag>'
+                       f'<Size>{len(k)}</Size></Contents>' for k in contents)
+        body += ''.join(f'<CommonPrefixes><Prefix>{quote(p)}</Prefix></CommonPrefixes>'
+                        for p in prefixes)
+        marker = f'<NextMarker>{quote(last)}</NextMarker>' if truncated else ''
+        return httpx.Response(200, text=f'<ListBucketResult><EncodingType>url</EncodingType>'
+                                        f'<IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                                        f'{marker}{body}</ListBucketResult>')
+
+
+KEYS = [f'logs/2021/{i:03d} a+b.log' for i in range(25)] + \
+       [f'data/{i}/part.bin' for i in range(5)] + ['readme.txt']
+
+
+class InFlight(httpx.AsyncBaseTransport):
+    """记录每个请求开始时已有多少请求在进行"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+        self.active = 0
+        self.started = []
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.started.append(self.active)
+        self.active += 1
+        try:
+            return await self.transport.handle_async_request(request)
+        finally:
+            self.active -= 1
+
+
+WORM = (b'<WormConfiguration><WormId>1666E2CF</WormId><State>InProgress</State>'
+        b'<RetentionPeriodInDays>1</RetentionPeriodInDays></WormConfiguration>')
+
+
+def worm_handler(request: httpx.Request) -> httpx.Response:
+    if request.url.host.startswith('missing.'):
+        return httpx.Response(404, text='<Error><Code>NoSuchBucket</Code></Error>')
+    return httpx.Response(200, content=WORM)
+
+
+class TestParsedResults(TestCase):
+    def test_bucket_info_and_acl(self):
+        with Session(transport=Emulator(endpoint=auth.endpoint)) as session:
+            client = Bucket(auth, session)
+            info = client.bucket_info()
+            self.assertEqual((info.name, info.redundancy_type, info.acl),
+                             ('bucket', 'LRS', 'private'))
+            self.assertEqual(client.bucket_acl().grant, 'private')
+            with self.assertRaises(httpx.HTTPStatusError):
+                client.bucket_info('missing')
+
+    def test_bucket_worm(self):
+        client = Bucket(auth, Session(transport=httpx.MockTransport(worm_handler)))
+        worm = client.bucket_worm()
+        self.assertEqual((worm.worm_id, worm.state, worm.retention_days),
+                         ('1666E2CF', 'InProgress', 1))
+        with self.assertRaises(httpx.HTTPStatusError):
+            client.bucket_worm('missing')
+
+
+class TestAsyncParsedResults(IsolatedAsyncioTestCase):
+    async def test_parsed(self):
+        async with AsyncSession(transport=Emulator(endpoint=auth.endpoint)) as session:
+            client = AsyncBucket(auth, session)
+            self.assertEqual((await client.bucket_info()).name, 'bucket')
+            self.assertEqual((await client.bucket_acl()).grant, 'private')
+        client = AsyncBucket(auth, AsyncSession(transport=httpx.MockTransport(worm_handler)))
+        self.assertEqual((await client.bucket_worm()).worm_id, '1666E2CF')
+
+
+class TestIterObjects(TestCase):
+    def test_iter_objects(self):
+        server = FakeListing(KEYS)
+        client = Bucket(auth, Session(transport=httpx.MockTransport(server)))
+        keys = [x.key for x in client.iter_objects(page_size=7)]
+        self.assertEqual(keys, sorted(KEYS))
+        self.assertEqual(len(server.requests), 5)
+
+    def test_iter_objects_delimiter(self):
+        client = Bucket(auth, Session(transport=httpx.MockTransport(FakeListing(KEYS))))
+        entries = list(client.iter_objects(delimiter='/', page_size=2))
+        self.assertEqual([(x.key, x.is_prefix) for x in entries],
+                         [('data/', True), ('logs/', True), ('readme.txt', False)])
+
+
+class TestAsyncIterObjects(IsolatedAsyncioTestCase):
+    async def test_iter_objects(self):
+        server = FakeListing(KEYS)
+        client = AsyncBucket(auth, AsyncSession(transport=httpx.MockTransport(server)))
+        keys = [x.key async for x in client.iter_objects(prefix='logs/', page_size=10)]
+        self.assertEqual(keys, sorted(k for k in KEYS if k.startswith('logs/')))
+        self.assertEqual(len(server.requests), 3)
+
+    async def test_iter_objects_partitioned(self):
+        client = AsyncBucket(auth, AsyncSession(transport=httpx.MockTransport(FakeListing(KEYS))))
+        keys = [x.key async for x in client.iter_objects_partitioned(page_size=4)]
+        self.assertEqual(keys, sorted(KEYS))
+        split_points = ['data/3', 'logs/2021/010', 'logs/2021/020 a+b.log']
+        keys = [x.key async for x in client.iter_objects_partitioned(
+            split_points=split_points, concurrency=2, page_size=3)]
+        self.assertEqual(keys, sorted(KEYS))
+
+    async def test_iter_objects_partitioned_error(self):
+        def handler(request):
+            if request.url.params.get('marker') == 'logs/':
+                return httpx.Response(500)
+            return FakeListing(KEYS)(request)
+
+        client = AsyncBucket(auth, AsyncSession(transport=httpx.MockTransport(handler)))
+        with self.assertRaises(httpx.HTTPStatusError):
+            [x async for x in client.iter_objects_partitioned()]
+
+    async def test_iter_objects_partitioned_overlap(self):
+        emulator = Emulator(latency=0.01, endpoint=auth.endpoint)
+        prefixes = ['a/', 'b/', 'c/', 'd/']
+        keys = sorted(f'{p}{i:03d}' for p in prefixes for i in range(40))
+        with Session(transport=emulator) as session:
+            writer = ObjectClient(auth, session, verify=False)
+            for key in keys:
+                writer.put_object(key, b'')
+        transport = InFlight(emulator)
+        client = AsyncBucket(auth, AsyncSession(transport=transport))
+        result = [x.key async for x in client.iter_objects_partitioned(
+            split_points=['a/~', 'b/~', 'c/~'], concurrency=4, page_size=5, ordered=False)]
+        self.assertEqual(sorted(result), keys)
+        # 每个区间8页 除了最后几页外 请求发出时应有其他区间的请求在进行
+        overlapped = sum(1 for n in transport.started if n > 0)
+        self.assertGreater(overlapped, len(transport.started) * 0.75)
+        self.assertLessEqual(max(transport.started), 3)
+
+        transport = InFlight(emulator)
+        client = AsyncBucket(auth, AsyncSession(transport=transport))
+        entries = client.iter_objects_partitioned(
+            split_points=['a/~', 'b/~', 'c/~'], concurrency=4, page_size=5)
+        result = [(await entries.__anext__()).key]
+        await asyncio.sleep(0.2)
+        # 暂停读取时每个区间最多缓存两页加上等待放入的一页 第一个区间已取走一页
+        self.assertLessEqual(len(transport.started), 4 + 3 * 3)
+        self.assertGreater(min(transport.started[1:4]), 0)
+        result += [x.key async for x in entries]
+        self.assertEqual(result, keys)
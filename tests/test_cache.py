@@ -0,0 +1,287 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_cache
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/12 10:30 上午
+@Desc   ：
+==================================================
+"""
+import os
+import time
+import httpx
+import tempfile
+import threading
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
+from oss.auth import Auth
+from oss.cache import MetaCache, DiskCache
+from oss.session import Session, AsyncSession
+from oss.object import ObjectClient, ObjectAsyncClient
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+class FakeMeta:
+    """每次写操作后ETag加1 记录HEAD请求次数"""
+
+    def __init__(self):
+        self.version = 1
+        self.heads = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.method == 'HEAD':
+            self.heads += 1
+            return httpx.Response(200, headers={'ETag': f'"v{self.version}"'})
+        self.version += 1
+        return httpx.Response(200)
+
+
+class TestMetaCache(TestCase):
+    def test_lru(self):
+        cache = MetaCache(maxsize=2)
+        for key in 'abc':
+            cache.set(('b', key, 'head'), httpx.Response(200))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(('b', 'a', 'head')))
+        self.assertIsNotNone(cache.get(('b', 'b', 'head')))
+        cache.set(('b', 'd', 'head'), httpx.Response(200))
+        self.assertIsNotNone(cache.get(('b', 'b', 'head')))
+        self.assertIsNone(cache.get(('b', 'c', 'head')))
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+    def test_ttl(self):
+        cache = MetaCache(ttl=0.01)
+        cache.set(('b', 'a', 'head'), httpx.Response(200))
+        time.sleep(0.02)
+        self.assertIsNone(cache.get(('b', 'a', 'head')))
+        self.assertEqual(len(cache), 0)
+
+    def test_stale_version(self):
+        cache = MetaCache()
+        version = cache.version
+        cache.invalidate('b', 'a')
+        cache.set(('b', 'a', 'head'), httpx.Response(200), version)
+        self.assertEqual(len(cache), 0)
+
+
+    def test_threads(self):
+        cache = MetaCache(maxsize=8)
+        errors = []
+
+        def work(n):
+            try:
+                for i in range(2000):
+                    key = ('b', str((i + n) % 16), 'head')
+                    cache.set(key, httpx.Response(200))
+                    cache.get(key)
+                    cache.invalidate('b', str(i % 16))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(cache), 8)
+        self.assertEqual(cache.hits + cache.misses, 8 * 2000)
+
+
+class TestCachedObjectClient(TestCase):
+    def setUp(self) -> None:
+        self.server = FakeMeta()
+        self.cache = MetaCache()
+        session = Session(transport=httpx.MockTransport(self.server))
+        self.client = ObjectClient(auth, session, meta_cache=self.cache)
+
+    def test_hit(self):
+        for _ in range(3):
+            self.assertEqual(self.client.head_object('/a.txt').headers['ETag'], '"v1"')
+        self.client.get_object_meta('a.txt')
+        self.assertEqual(self.server.heads, 2)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 2))
+
+    def test_invalidate_on_write(self):
+        self.client.head_object('a.txt')
+        self.client.put_object('a.txt', b'data')
+        self.assertEqual(self.client.head_object('a.txt').headers['ETag'], '"v2"')
+        self.client.put_object_acl('a.txt', 'private')
+        self.assertEqual(self.client.head_object('a.txt').headers['ETag'], '"v3"')
+        self.assertEqual(self.server.heads, 3)
+
+    def test_kwargs_bypass(self):
+        self.client.head_object('a.txt', headers={'If-Match': '"v1"'})
+        self.client.head_object('a.txt', headers={'If-Match': '"v1"'})
+        self.assertEqual(self.server.heads, 2)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_disabled(self):
+        client = ObjectClient(auth, Session(transport=httpx.MockTransport(self.server)))
+        client.head_object('a.txt')
+        client.head_object('a.txt')
+        self.assertEqual(self.server.heads, 2)
+
+
+class TestCachedObjectAsyncClient(IsolatedAsyncioTestCase):
+    async def test_hit_and_invalidate(self):
+        server, cache = FakeMeta(), MetaCache()
+        session = AsyncSession(transport=httpx.MockTransport(server))
+        client = ObjectAsyncClient(auth, session, meta_cache=cache)
+        self.assertEqual((await client.get_object_meta('a.txt')).headers['ETag'], '"v1"')
+        self.assertEqual((await client.get_object_meta('a.txt')).headers['ETag'], '"v1"')
+        await client.delete_object('a.txt')
+        self.assertEqual((await client.get_object_meta('a.txt')).headers['ETag'], '"v2"')
+        self.assertEqual(server.heads, 2)
+        self.assertEqual(cache.hits, 1)
+
+
+class FakeBlob:
+    """支持If-None-Match的GetObject"""
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.etag = '"e1"'
+        self.sent = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.headers.get('If-None-Match') == self.etag:
+            return httpx.Response(304, headers={'ETag': self.etag})
+        content = self.content
+        if 'Range' in request.headers:
+            start, end = map(int, request.headers['Range'][6:].split('-'))
+            content = content[start:end + 1]
+        self.sent += len(content)
+        status = 206 if 'Range' in request.headers else 200
+        return httpx.Response(status, headers={'ETag': self.etag}, content=content)
+
+
+class TestDiskCache(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = FakeBlob(b'model weights' * 100)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def make_client(self, max_bytes: int = 1024 ** 2):
+        return ObjectClient(auth, Session(transport=httpx.MockTransport(self.server)),
+                            disk_cache=DiskCache(self.tmp.name, max_bytes))
+
+    def test_revalidate(self):
+        client = self.make_client()
+        self.assertEqual(client.get_object('model.bin').content, self.server.content)
+        # 另一个进程的客户端共用缓存目录
+        other = self.make_client()
+        resp = other.get_object('/model.bin')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.content, self.server.content)
+        self.assertEqual(resp.headers['ETag'], '"e1"')
+        self.assertEqual(self.server.sent, len(self.server.content))
+        self.assertEqual((other.disk_cache.hits, other.disk_cache.misses), (1, 0))
+
+    def test_changed(self):
+        client = self.make_client()
+        client.get_object('model.bin')
+        self.server.content, self.server.etag = b'new weights', '"e2"'
+        # 文件已变化时不读取缓存的内容
+        with mock.patch.object(DiskCache, '_content') as content:
+            self.assertEqual(client.get_object('model.bin').content, b'new weights')
+        content.assert_not_called()
+        self.assertEqual(client.get_object('model.bin').content, b'new weights')
+        self.assertEqual(client.disk_cache.hits, 1)
+
+    def test_range(self):
+        client = self.make_client()
+        self.assertEqual(client.get_object('model.bin', 'bytes=0-4').content, b'model')
+        resp = client.get_object('model.bin', 'bytes=0-4')
+        self.assertEqual((resp.status_code, resp.content), (206, b'model'))
+        self.assertEqual(client.get_object('model.bin').content, self.server.content)
+        self.assertEqual(client.disk_cache.hits, 1)
+
+    def test_evict(self):
+        client = self.make_client(max_bytes=3000)
+        for i in range(3):
+            client.get_object(f'{i}.bin')
+            time.sleep(0.01)
+        files = os.listdir(self.tmp.name)
+        self.assertEqual(len(files), 2)
+        self.assertIsNone(client.disk_cache.get('bucket', '0.bin'))
+
+    def test_evict_without_rescan(self):
+        client = self.make_client(max_bytes=3000)
+        with mock.patch('oss.cache.os.scandir') as scandir:
+            for i in range(5):
+                client.get_object(f'{i}.bin')
+                time.sleep(0.01)
+            client.get_object('3.bin')
+        scandir.assert_not_called()
+        self.assertEqual(len(os.listdir(self.tmp.name)), 2)
+        self.assertLessEqual(client.disk_cache._total, 3000)
+        # 新建的DiskCache从目录中恢复使用顺序
+        cache = DiskCache(self.tmp.name, 3000)
+        self.assertEqual(cache._total, client.disk_cache._total)
+
+    def test_removed_after_revalidate(self):
+        client = self.make_client()
+        client.get_object('model.bin')
+        path = client.disk_cache._path('bucket', 'model.bin')
+        response = DiskCache.response
+
+        def remove_first(cache, *args):
+            # 模拟其他进程在304返回前淘汰了缓存文件
+            if os.path.exists(path):
+                os.remove(path)
+            return response(cache, *args)
+
+        with mock.patch.object(DiskCache, 'response', remove_first):
+            resp = client.get_object('model.bin')
+        self.assertEqual((resp.status_code, resp.content), (200, self.server.content))
+        self.assertEqual(self.server.sent, len(self.server.content) * 2)
+
+    def test_corrupt_entry(self):
+        client = self.make_client()
+        client.get_object('model.bin')
+        path = client.disk_cache._path('bucket', 'model.bin')
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 1)
+        self.assertEqual(client.get_object('model.bin').content, self.server.content)
+        self.assertEqual(client.disk_cache.hits, 0)
+
+
+class TestAsyncDiskCache(IsolatedAsyncioTestCase):
+    async def test_revalidate(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            server = FakeBlob(b'config')
+            client = ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(server)),
+                                       disk_cache=DiskCache(tmp))
+            await client.get_object('app.yaml')
+            resp = await client.get_object('app.yaml')
+            self.assertEqual(resp.content, b'config')
+            self.assertEqual(client.disk_cache.hits, 1)
+            await client.aclose()
+
+    async def test_file_io_in_executor(self):
+        threads = set()
+
+        class RecordingCache(DiskCache):
+            def meta(self, *args):
+                threads.add(threading.current_thread())
+                return super().meta(*args)
+
+            def set(self, *args):
+                threads.add(threading.current_thread())
+                return super().set(*args)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            server = FakeBlob(b'config')
+            client = ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(server)),
+                                       disk_cache=RecordingCache(tmp))
+            await client.get_object('app.yaml')
+            self.assertEqual((await client.get_object('app.yaml')).content, b'config')
+            await client.aclose()
+        self.assertTrue(threads)
+        self.assertNotIn(threading.current_thread(), threads)
@@ -0,0 +1,248 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_checkpoint
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/15 3:20 下午
+@Desc   ：
+==================================================
+"""
+import os
+import re
+import json
+import httpx
+import tempfile
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.checkpoint import Checkpoint
+from oss.session import Session, AsyncSession
+from oss.object import ObjectClient, ObjectAsyncClient
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+PART = 100 * 1024
+
+
+class FakeResumable:
+    """支持分片上传、ListParts和Range读取的OSS fail为需要失败的分片号或分段偏移"""
+
+    def __init__(self, data: bytes = b'', etag: str = '"v1"'):
+        self.data = data
+        self.etag = etag
+        self.fail = set()
+        self.uploads = {}
+        self.objects = {}
+        self.initiated = 0
+        self.aborted = []
+        self.requested = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        if request.method == 'POST' and 'uploads' in params:
+            self.initiated += 1
+            upload_id = f'u{self.initiated}'
+            self.uploads[upload_id] = {}
+            return httpx.Response(200, text='<InitiateMultipartUploadResult>'
+                                            f'<UploadId>{upload_id}</UploadId>'
+                                            '</InitiateMultipartUploadResult>')
+        upload_id = params.get('uploadId')
+        if upload_id is not None and upload_id not in self.uploads:
+            return httpx.Response(404, text='<Error><Code>NoSuchUpload</Code></Error>')
+        if request.method == 'PUT' and 'partNumber' in params:
+            number = int(params['partNumber'])
+            self.requested.append(number)
+            if number in self.fail:
+                return httpx.Response(403)
+            self.uploads[upload_id][number] = request.read()
+            return httpx.Response(200, headers={'ETag': f'"p{number}"'})
+        if request.method == 'GET' and upload_id:
+            return httpx.Response(200, text='<ListPartsResult></ListPartsResult>')
+        if request.method == 'POST' and upload_id:
+            numbers = re.findall(r'<PartNumber>(\d+)</PartNumber>', request.read().decode())
+            parts = self.uploads.pop(upload_id)
+            self.objects[request.url.path] = b''.join(parts[int(n)] for n in numbers)
+            return httpx.Response(200)
+        if request.method == 'DELETE' and upload_id:
+            self.aborted.append(upload_id)
+            self.uploads.pop(upload_id)
+            return httpx.Response(204)
+        if request.method == 'HEAD':
+            return httpx.Response(200, headers={'ETag': self.etag,
+                                                'Content-Length': str(len(self.data))})
+        if request.headers.get('If-Match', self.etag) != self.etag:
+            return httpx.Response(412)
+        start, end = map(int, re.match(r'bytes=(\d+)-(\d+)', request.headers['Range']).groups())
+        self.requested.append(start)
+        if start in self.fail:
+            return httpx.Response(403)
+        return httpx.Response(206, headers={'ETag': self.etag}, content=self.data[start:end + 1])
+
+
+class TestCheckpoint(TestCase):
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cp')
+            record = Checkpoint(path, {'size': 1}, upload_id='u1')
+            record.mark(1, ['"e"', None])
+            loaded = Checkpoint.load(path, {'size': 1})
+            self.assertEqual(loaded.state, {'upload_id': 'u1'})
+            self.assertEqual(loaded.done, {'1': ['"e"', None]})
+            self.assertIsNone(Checkpoint.load(path, {'size': 2}))
+            with open(path, 'w') as f:
+                f.write('{broken')
+            self.assertIsNone(Checkpoint.load(path, {'size': 1}))
+            self.assertIsNone(Checkpoint.peek(os.path.join(tmp, 'missing')))
+
+    def test_append_log(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cp')
+            record = Checkpoint(path, {'size': 1}, upload_id='u1')
+            record.save()
+            with open(path) as f:
+                header = f.read()
+            for i in range(1, 4):
+                record.mark(i, [f'"e{i}"', i])
+            with open(path) as f:
+                content = f.read()
+            # mark只追加 不重写之前的内容
+            self.assertTrue(content.startswith(header))
+            self.assertEqual(content.count('\n'), 4)
+            with open(path, 'a') as f:
+                f.write('["4", ["e')
+            loaded = Checkpoint.load(path, {'size': 1})
+            self.assertEqual(loaded.done, {'1': ['"e1"', 1], '2': ['"e2"', 2], '3': ['"e3"', 3]})
+            loaded.save()
+            with open(path) as f:
+                self.assertEqual(json.loads(f.read())['done'], loaded.done)
+
+
+class TestResumableUpload(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp.name, 'big.bin')
+        self.data = os.urandom(PART * 3 + 10)
+        with open(self.file, 'wb') as f:
+            f.write(self.data)
+        self.server = FakeResumable()
+        session = Session(transport=httpx.MockTransport(self.server), retry=None)
+        self.client = ObjectClient(auth, session, verify=False)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def upload(self):
+        return self.client.resumable_upload('big.bin', self.file, part_size=PART, concurrency=1)
+
+    def test_resume(self):
+        self.server.fail = {3}
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.upload()
+        done = set(Checkpoint.peek(f'{self.file}.ucp')['done'])
+        self.assertTrue({'1', '2'} <= done)
+        self.assertNotIn('3', done)
+        self.server.fail = set()
+        self.server.requested.clear()
+        self.upload()
+        self.assertEqual(self.server.requested, [n for n in (3, 4) if str(n) not in done])
+        self.assertEqual(self.server.initiated, 1)
+        self.assertEqual(self.server.objects['/big.bin'], self.data)
+        self.assertFalse(os.path.exists(f'{self.file}.ucp'))
+
+    def test_source_changed(self):
+        self.server.fail = {2}
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.upload()
+        with open(self.file, 'ab') as f:
+            f.write(b'more')
+        self.server.fail = set()
+        self.upload()
+        self.assertEqual(self.server.aborted, ['u1'])
+        self.assertEqual(self.server.initiated, 2)
+        self.assertEqual(self.server.objects['/big.bin'], self.data + b'more')
+
+    def test_upload_expired(self):
+        self.server.fail = {2}
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.upload()
+        self.server.uploads.clear()
+        self.server.fail = set()
+        self.upload()
+        self.assertEqual(self.server.initiated, 2)
+        self.assertEqual(self.server.objects['/big.bin'], self.data)
+
+
+class TestResumableDownload(TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.tmp.name, 'out.bin')
+        self.server = FakeResumable(os.urandom(PART * 3 + 10))
+        session = Session(transport=httpx.MockTransport(self.server), retry=None)
+        self.client = ObjectClient(auth, session, verify=True)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def download(self):
+        return self.client.resumable_download('big.bin', self.file, part_size=PART, concurrency=1)
+
+    def test_resume(self):
+        self.server.fail = {PART * 2}
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.download()
+        self.assertFalse(os.path.exists(self.file))
+        done = set(Checkpoint.peek(f'{self.file}.dcp')['done'])
+        self.assertNotIn(str(PART * 2), done)
+        self.server.fail = set()
+        self.server.requested.clear()
+        self.download()
+        self.assertEqual(self.server.requested,
+                         [n for n in (PART * 2, PART * 3) if str(n) not in done])
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.server.data)
+        self.assertEqual(os.listdir(self.tmp.name), ['out.bin'])
+
+    def test_remote_changed(self):
+        self.server.fail = {PART}
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.download()
+        self.server.data, self.server.etag = os.urandom(PART * 2), '"v2"'
+        self.server.fail = set()
+        self.server.requested.clear()
+        self.download()
+        self.assertEqual(self.server.requested, [0, PART])
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.server.data)
+
+
+class TestAsyncResumable(IsolatedAsyncioTestCase):
+    async def test_upload_and_download(self):
+        server = FakeResumable()
+        session = AsyncSession(transport=httpx.MockTransport(server), retry=None)
+        client = ObjectAsyncClient(auth, session, verify=False)
+        data = os.urandom(PART * 2 + 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            src, dst = os.path.join(tmp, 'src'), os.path.join(tmp, 'dst')
+            with open(src, 'wb') as f:
+                f.write(data)
+            server.fail = {2}
+            with self.assertRaises(httpx.HTTPStatusError):
+                await client.resumable_upload('obj', src, part_size=PART, concurrency=1)
+            server.fail = set()
+            server.requested.clear()
+            await client.resumable_upload('obj', src, part_size=PART, concurrency=2)
+            self.assertNotIn(1, server.requested)
+            self.assertEqual(server.objects['/obj'], data)
+
+            server.data = data
+            server.fail = {PART}
+            with self.assertRaises(httpx.HTTPStatusError):
+                await client.resumable_download('obj', dst, part_size=PART, concurrency=1)
+            server.fail = set()
+            server.requested.clear()
+            await client.resumable_download('obj', dst, part_size=PART)
+            self.assertNotIn(0, server.requested)
+            with open(dst, 'rb') as f:
+                self.assertEqual(f.read(), data)
+        await session.aclose()
@@ -0,0 +1,138 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_copy
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/16 11:10 上午
+@Desc   ：
+==================================================
+"""
+import os
+import re
+import httpx
+from unittest import TestCase, IsolatedAsyncioTestCase, mock
+from oss.auth import Auth
+from oss.crc import crc64, ChecksumError
+from oss.session import Session, AsyncSession
+from oss.object import ObjectClient, ObjectAsyncClient
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+PART = 100 * 1024
+
+
+class FakeCopy:
+    """支持跨储存桶HEAD、CopyObject和UploadPartCopy的OSS 数据只在服务端流动"""
+
+    def __init__(self, data: bytes, corrupt: bool = False):
+        self.objects = {('src', '/big'): data}
+        self.etag = '"v1"'
+        self.corrupt = corrupt
+        self.fail = set()
+        self.parts = {}
+        self.copied = []
+        self.initiated = []
+        self.aborted = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        bucket = request.url.host.split('.')[0]
+        key = request.url.path
+        params = request.url.params
+        if request.method == 'HEAD':
+            data = self.objects[(bucket, key)]
+            return httpx.Response(200, headers={
+                'Content-Length': str(len(data)), 'ETag': self.etag,
+                'Content-Type': 'video/mp4', 'x-oss-meta-owner': 'sw',
+                'x-oss-hash-crc64ecma': str(crc64(data))})
+        if request.method == 'POST' and 'uploads' in params:
+            self.initiated.append(dict(request.headers))
+            return httpx.Response(200, text='<InitiateMultipartUploadResult>'
+                                            '<UploadId>u1</UploadId>'
+                                            '</InitiateMultipartUploadResult>')
+        if request.method == 'PUT' and 'partNumber' in params:
+            number = int(params['partNumber'])
+            if number in self.fail:
+                return httpx.Response(403)
+            if request.headers['x-oss-copy-source-if-match'] != self.etag:
+                return httpx.Response(412)
+            src_bucket, _, src_key = request.headers['x-oss-copy-source'].lstrip('/').partition('/')
+            start, end = map(int, re.match(r'bytes=(\d+)-(\d+)',
+                                           request.headers['x-oss-copy-source-range']).groups())
+            self.parts[number] = self.objects[(src_bucket, f'/{src_key}')][start:end + 1]
+            return httpx.Response(200, text=f'<CopyPartResult><ETag>"p{number}"</ETag>'
+                                            '</CopyPartResult>')
+        if request.method == 'POST' and 'uploadId' in params:
+            numbers = re.findall(r'<PartNumber>(\d+)</PartNumber>', request.read().decode())
+            data = b''.join(self.parts[int(n)] for n in numbers)
+            self.objects[(bucket, key)] = data
+            crc = crc64(data) ^ 1 if self.corrupt else crc64(data)
+            return httpx.Response(200, headers={'x-oss-hash-crc64ecma': str(crc)})
+        if request.method == 'DELETE':
+            self.aborted += 1
+            return httpx.Response(204)
+        if request.method == 'PUT':
+            src_bucket, _, src_key = request.headers['x-oss-copy-source'].lstrip('/').partition('/')
+            self.copied.append(key)
+            self.objects[(bucket, key)] = self.objects[(src_bucket, f'/{src_key}')]
+            return httpx.Response(200)
+        return httpx.Response(405)
+
+
+class TestCopyLarge(TestCase):
+    def make_client(self, server):
+        return ObjectClient(auth, Session(transport=httpx.MockTransport(server), retry=None),
+                            verify=True)
+
+    def test_multipart_copy(self):
+        data = os.urandom(PART * 3 + 7)
+        server = FakeCopy(data)
+        self.make_client(server).copy_large('/src/big', 'copy', part_size=PART, concurrency=2)
+        self.assertEqual(server.objects[('bucket', '/copy')], data)
+        self.assertEqual(len(server.parts), 4)
+        headers = server.initiated[0]
+        self.assertEqual((headers['content-type'], headers['x-oss-meta-owner']), ('video/mp4', 'sw'))
+
+    def test_small_object(self):
+        server = FakeCopy(b'small')
+        self.make_client(server).copy_large('/src/big', 'copy', part_size=PART)
+        self.assertEqual(server.copied, ['/copy'])
+        self.assertEqual(server.initiated, [])
+
+    def test_copy_object_limit(self):
+        server = FakeCopy(os.urandom(PART * 3))
+        # 分片大小超过CopyObject的上限时 不能因为文件不超过一个分片就使用copy_object
+        with mock.patch('oss.object.MAX_COPY_SIZE', PART), \
+                mock.patch('oss.object.MAX_PART_SIZE', PART * 2):
+            self.make_client(server).copy_large('/src/big', 'copy', part_size=PART * 10)
+        self.assertEqual(server.copied, [])
+        self.assertEqual(len(server.parts), 2)
+        self.assertEqual(server.objects[('bucket', '/copy')], server.objects[('src', '/big')])
+
+    def test_failure_aborts(self):
+        server = FakeCopy(os.urandom(PART * 2 + 1))
+        server.fail = {2}
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.make_client(server).copy_large('/src/big', 'copy', part_size=PART)
+        self.assertEqual(server.aborted, 1)
+
+    def test_crc_mismatch(self):
+        server = FakeCopy(os.urandom(PART * 2 + 1), corrupt=True)
+        with self.assertRaises(ChecksumError):
+            self.make_client(server).copy_large('/src/big', 'copy', part_size=PART)
+        self.assertEqual(server.aborted, 1)
+
+
+class TestAsyncCopyLarge(IsolatedAsyncioTestCase):
+    async def test_multipart_copy(self):
+        data = os.urandom(PART * 4 + 3)
+        server = FakeCopy(data)
+        async with AsyncSession(transport=httpx.MockTransport(server), retry=None) as session:
+            client = ObjectAsyncClient(auth, session, verify=True)
+            await client.copy_large('/src/big', 'copy', part_size=PART, concurrency=3)
+            self.assertEqual(server.objects[('bucket', '/copy')], data)
+            server.fail = {3}
+            with self.assertRaises(httpx.HTTPStatusError):
+                await client.copy_large('/src/big', 'again', part_size=PART)
+            self.assertEqual(server.aborted, 1)
@@ -0,0 +1,204 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_crc
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/14 2:30 下午
+@Desc   ：
+==================================================
+"""
+import os
+import re
+import io
+import httpx
+import tempfile
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.crc import crc64, crc64_combine, Crc64, ChecksumError, content_md5
+from oss.session import Session, AsyncSession
+from oss.object import ObjectClient, ObjectAsyncClient
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+class TestCrc64(TestCase):
+    def test_check_value(self):
+        self.assertEqual(crc64(b'123456789'), 0x995DC9BBDF1939FA)
+        self.assertEqual(crc64(b''), 0)
+
+    def test_incremental(self):
+        data = os.urandom(4096)
+        crc = Crc64()
+        for i in range(0, len(data), 1000):
+            crc.update(data[i:i + 1000])
+        self.assertEqual(crc.crc, crc64(data))
+        self.assertEqual(crc.size, len(data))
+
+    def test_combine(self):
+        parts = [os.urandom(n) for n in (1, 1000, 0, 4097)]
+        total = Crc64()
+        for part in parts:
+            total.combine(crc64(part), len(part))
+        self.assertEqual(total.crc, crc64(b''.join(parts)))
+        self.assertEqual(crc64_combine(crc64(b'abc'), 0, 0), crc64(b'abc'))
+
+
+class FakeCrcStore:
+    """返回x-oss-hash-crc64ecma的OSS接口 corrupt为True时返回错误的数据"""
+
+    def __init__(self, data: bytes = b'', corrupt: bool = False):
+        self.objects = {'/obj': data}
+        self.parts = {}
+        self.corrupt = corrupt
+        self.md5 = []
+
+    def headers(self, data: bytes) -> dict:
+        return {'x-oss-hash-crc64ecma': str(crc64(data)), 'ETag': '"e"'}
+
+    def body(self, data: bytes) -> bytes:
+        if self.corrupt and data:
+            return bytes([data[0] ^ 1]) + data[1:]
+        return data
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        key = request.url.path
+        if 'Content-MD5' in request.headers:
+            body = request.read()
+            assert request.headers['Content-MD5'] == content_md5(body)
+            self.md5.append(key)
+        if request.method == 'POST' and 'uploads' in params:
+            return httpx.Response(200, text='<InitiateMultipartUploadResult>'
+                                            '<UploadId>u1</UploadId>'
+                                            '</InitiateMultipartUploadResult>')
+        if request.method == 'PUT' and 'partNumber' in params:
+            data = self.parts[int(params['partNumber'])] = request.read()
+            return httpx.Response(200, headers=self.headers(self.body(data)))
+        if request.method == 'POST' and 'uploadId' in params:
+            numbers = re.findall(r'<PartNumber>(\d+)</PartNumber>', request.read().decode())
+            data = self.objects[key] = b''.join(self.parts[int(n)] for n in numbers)
+            return httpx.Response(200, headers=self.headers(self.body(data)))
+        if request.method == 'DELETE':
+            return httpx.Response(204)
+        if request.method == 'PUT':
+            data = self.objects[key] = request.read()
+            return httpx.Response(200, headers=self.headers(self.body(data)))
+        data = self.objects[key]
+        headers = self.headers(data)
+        if request.method == 'HEAD':
+            headers['Content-Length'] = str(len(data))
+            return httpx.Response(200, headers=headers)
+        if 'Range' in request.headers:
+            start, end = re.match(r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()
+            return httpx.Response(206, headers=headers,
+                                  content=self.body(data)[int(start):int(end) + 1])
+        return httpx.Response(200, headers=headers, content=self.body(data))
+
+
+class TestVerifiedTransfer(TestCase):
+    def setUp(self) -> None:
+        self.data = os.urandom(250 * 1024)
+        fd, self.file = tempfile.mkstemp()
+        os.write(fd, self.data)
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        if os.path.exists(self.file):
+            os.remove(self.file)
+
+    def make_client(self, server, verify=True):
+        return ObjectClient(auth, Session(transport=httpx.MockTransport(server)), verify=verify)
+
+    def test_put_object(self):
+        server = FakeCrcStore()
+        client = self.make_client(server)
+        client.put_object('a', b'bytes')
+        client.put_object('b', io.BytesIO(self.data))
+        self.assertEqual(server.md5, ['/a'])
+        self.assertEqual(server.objects['/b'], self.data)
+        with self.assertRaises(ChecksumError):
+            self.make_client(FakeCrcStore(corrupt=True)).put_object('c', self.file)
+
+    def test_get_object(self):
+        self.assertEqual(self.make_client(FakeCrcStore(self.data)).get_object('obj').content,
+                         self.data)
+        with self.assertRaises(ChecksumError):
+            self.make_client(FakeCrcStore(self.data, corrupt=True)).get_object('obj')
+        # 部分内容无法校验
+        client = self.make_client(FakeCrcStore(self.data, corrupt=True))
+        self.assertEqual(client.get_object('obj', 'bytes=1-3').status_code, 206)
+
+    def test_default_verify(self):
+        # 没有crcmod时也默认校验 使用纯python实现
+        client = ObjectClient(auth, Session(transport=httpx.MockTransport(
+            FakeCrcStore(self.data, corrupt=True))))
+        self.assertTrue(client.verify_crc)
+        with self.assertRaises(ChecksumError):
+            client.get_object('obj')
+
+    def test_iter_object(self):
+        client = self.make_client(FakeCrcStore(self.data, corrupt=True))
+        with self.assertRaises(ChecksumError):
+            list(client.iter_object('obj'))
+        client = self.make_client(FakeCrcStore(self.data, corrupt=True), verify=False)
+        self.assertEqual(len(b''.join(client.iter_object('obj'))), len(self.data))
+
+    def test_multipart_combine(self):
+        server = FakeCrcStore()
+        self.make_client(server).upload_file('big', self.file, part_size=100 * 1024)
+        self.assertEqual(server.objects['/big'], self.data)
+        self.assertEqual(len(server.md5), 3)
+        with self.assertRaises(ChecksumError):
+            self.make_client(FakeCrcStore(corrupt=True)).upload_file(
+                'big', self.file, part_size=100 * 1024)
+
+    def test_download_file_combine(self):
+        self.make_client(FakeCrcStore(self.data)).download_file('obj', self.file, 100 * 1024)
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+        server = FakeCrcStore(self.data, corrupt=True)
+        with self.assertRaises(ChecksumError):
+            self.make_client(server).download_file('obj', self.file, 100 * 1024)
+        self.assertFalse(os.path.exists(self.file))
+
+
+class TestAsyncVerifiedTransfer(IsolatedAsyncioTestCase):
+    def make_client(self, server):
+        return ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(server)),
+                                 verify=True)
+
+    async def test_put_and_iter(self):
+        data = os.urandom(300 * 1024)
+        server = FakeCrcStore()
+        client = self.make_client(server)
+        await client.put_object('obj', io.BytesIO(data))
+        chunks = [chunk async for chunk in client.iter_object('obj')]
+        self.assertEqual(b''.join(chunks), data)
+        server.corrupt = True
+        with self.assertRaises(ChecksumError):
+            await client.get_object('obj')
+
+    async def test_download_file_combine(self):
+        data = os.urandom(250 * 1024)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'out')
+            await self.make_client(FakeCrcStore(data)).download_file('obj', path, 100 * 1024)
+            with open(path, 'rb') as f:
+                self.assertEqual(f.read(), data)
+            with self.assertRaises(ChecksumError):
+                await self.make_client(FakeCrcStore(data, corrupt=True)).download_file(
+                    'obj', path, 100 * 1024)
+            self.assertFalse(os.path.exists(path))
+
+    async def test_upload_file_combine(self):
+        data = os.urandom(250 * 1024)
+        server = FakeCrcStore()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'in')
+            with open(path, 'wb') as f:
+                f.write(data)
+            await self.make_client(server).upload_file('big', path, part_size=100 * 1024)
+        self.assertEqual(server.objects['/big'], data)
@@ -0,0 +1,174 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_emulator
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/22 3:10 下午
+@Desc   ：
+==================================================
+"""
+import os
+import time
+import asyncio
+import tempfile
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.bucket import Bucket
+from oss.emulator import Emulator
+from oss.models import parse_error
+from oss.retry import RetryPolicy
+from oss.session import Session, AsyncSession
+from oss.object import ObjectClient, ObjectAsyncClient
+
+ENDPOINT = 'oss-cn-hangzhou.aliyuncs.com'
+auth = Auth('YouAccessKeyId', 'YouAccessKeySecret', 'bucket', ENDPOINT)
+PART = 100 * 1024
+
+
+def make_emulator(**kwargs) -> Emulator:
+    return Emulator({auth.accessKeyId: auth.accessKeySecret}, endpoint=ENDPOINT, **kwargs)
+
+
+class TestEmulator(TestCase):
+    def setUp(self) -> None:
+        self.emulator = make_emulator(crc=True)
+        self.session = Session(transport=self.emulator, retry=RetryPolicy(backoff=0.001))
+        self.client = ObjectClient(auth, self.session, verify=True)
+        self.bucket = Bucket(auth, self.session)
+
+    def tearDown(self) -> None:
+        self.session.close()
+
+    def test_signature(self):
+        self.client.put_object('a.txt', b'hello')
+        wrong = ObjectClient(Auth(auth.accessKeyId, 'wrong', 'bucket', ENDPOINT), self.session)
+        resp = wrong.get_object('a.txt')
+        self.assertEqual(resp.status_code, 403)
+        self.assertEqual(parse_error(resp.content).code, 'SignatureDoesNotMatch')
+        unknown = ObjectClient(Auth('other', 'secret', 'bucket', ENDPOINT), self.session)
+        self.assertEqual(parse_error(unknown.get_object('a.txt').content).code,
+                         'InvalidAccessKeyId')
+        resp = self.session.client.get(auth.presign('GET', 'a.txt'))
+        self.assertEqual(resp.content, b'hello')
+        expired = self.session.client.get(auth.presign('GET', 'a.txt', expires=-10))
+        self.assertEqual(expired.status_code, 403)
+
+    def test_object(self):
+        resp = self.client.put_object('dir/a.txt', b'0123456789',
+                                      headers={'Content-Type': 'text/plain',
+                                               'x-oss-meta-owner': 'sw'})
+        etag = resp.headers['ETag']
+        resp = self.client.get_object('dir/a.txt')
+        self.assertEqual(resp.content, b'0123456789')
+        self.assertEqual(resp.headers['Content-Type'], 'text/plain')
+        self.assertEqual(resp.headers['x-oss-meta-owner'], 'sw')
+        resp = self.client.get_object('dir/a.txt', _range='bytes=2-4')
+        self.assertEqual((resp.status_code, resp.content), (206, b'234'))
+        self.assertEqual(resp.headers['Content-Range'], 'bytes 2-4/10')
+        resp = self.client.head_object('dir/a.txt')
+        self.assertEqual((resp.headers['Content-Length'], resp.headers['ETag']), ('10', etag))
+        resp = self.client.get_object('dir/a.txt', headers={'If-None-Match': etag})
+        self.assertEqual(resp.status_code, 304)
+        resp = self.client.put_object('bad', b'data',
+                                      headers={'Content-MD5': 'AAAAAAAAAAAAAAAAAAAAAA=='})
+        self.assertEqual(parse_error(resp.content).code, 'InvalidDigest')
+        self.assertEqual(self.client.delete_object('dir/a.txt').status_code, 204)
+        self.assertEqual(self.client.get_object('dir/a.txt').status_code, 404)
+
+    def test_append(self):
+        self.assertEqual(self.client.append_object('log', b'abc').status_code, 200)
+        resp = self.client.append_object('log', b'def', position=1)
+        self.assertEqual(resp.status_code, 409)
+        self.assertEqual(resp.headers['x-oss-next-append-position'], '3')
+        self.client.append_object('log', b'def', position=3)
+        self.assertEqual(self.client.get_object('log').content, b'abcdef')
+
+    def test_list(self):
+        keys = ['a/1', 'a/2', 'b', 'c/d/e', 'c/x', 'sp ace&<>', '中文']
+        for key in keys:
+            self.client.put_object(key, b'x')
+        self.assertEqual([o.key for o in self.bucket.iter_objects(page_size=2)], keys)
+        entries = [(o.key, o.is_prefix) for o in self.bucket.iter_objects(delimiter='/',
+                                                                          page_size=1)]
+        self.assertEqual(entries, [('a/', True), ('b', False), ('c/', True),
+                                   ('sp ace&<>', False), ('中文', False)])
+        self.assertEqual([o.key for o in self.bucket.iter_objects(prefix='c/', delimiter='/')],
+                         ['c/d/', 'c/x'])
+        resp = self.bucket.get_bucket(prefix='a/')
+        self.assertIn(b'<Key>a/1</Key>', resp.content)
+        self.assertEqual(self.client.delete_many(keys), {})
+        self.assertEqual(list(self.bucket.iter_objects()), [])
+
+    def test_multipart(self):
+        data = os.urandom(PART * 2 + 7)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'big')
+            with open(path, 'wb') as f:
+                f.write(data)
+            resp = self.client.upload_file('big', path, part_size=PART, concurrency=2)
+        self.assertTrue(resp.headers['ETag'].endswith('-3"'))
+        self.assertEqual(self.client.get_object('big').content, data)
+        self.assertEqual(self.client.head_object('big').headers['x-oss-object-type'], 'Multipart')
+        self.client.copy_large('/bucket/big', 'copy', part_size=PART)
+        self.assertEqual(self.client.get_object('copy').content, data)
+        self.assertEqual(self.emulator.uploads, {})
+
+        upload_id = self.client._initiate_multipart_upload('small')
+        etag = self.client.upload_part('small', upload_id, 1, b'a').headers['ETag']
+        self.client.upload_part('small', upload_id, 2, b'b')
+        self.assertIn(b'<PartNumber>2</PartNumber>',
+                      self.client.list_parts('small', upload_id).content)
+        resp = self.client.complete_multipart_upload('small', upload_id, [(1, etag), (2, etag)])
+        self.assertEqual(parse_error(resp.content).code, 'InvalidPart')
+        self.assertEqual(self.client.abort_multipart_upload('small', upload_id).status_code, 204)
+        resp = self.client.upload_part('small', upload_id, 3, b'c')
+        self.assertEqual(parse_error(resp.content).code, 'NoSuchUpload')
+
+    def test_bucket(self):
+        self.assertEqual(self.bucket.put_bucket('other').status_code, 200)
+        self.client.put_object('x', b'1')
+        self.assertEqual(self.bucket.delete_bucket('bucket').status_code, 409)
+        self.assertEqual(self.bucket.delete_bucket('other').status_code, 204)
+        self.assertIn(b'<Name>bucket</Name>', self.bucket.get_bucket_info().content)
+        self.assertEqual(self.bucket.get_bucket('missing').status_code, 404)
+
+    def test_faults(self):
+        self.client.put_object('k', b'v')
+        self.emulator.fail_next(503, 2)
+        self.assertEqual(self.client.get_object('k').status_code, 200)
+        self.assertEqual(self.emulator.injected, 2)
+        self.emulator.fail_next(500, 3)
+        resp = self.client.get_object('k')
+        self.assertEqual(parse_error(resp.content).code, 'InternalError')
+
+        seeded = [make_emulator(throttle_rate=0.3, error_rate=0.2, seed=7) for _ in range(2)]
+        statuses = []
+        for emulator in seeded:
+            with Session(transport=emulator, retry=None) as session:
+                client = ObjectClient(auth, session)
+                statuses.append([client.get_object('k').status_code for _ in range(50)])
+        self.assertEqual(statuses[0], statuses[1])
+        self.assertTrue({500, 503, 404} <= set(statuses[0]))
+
+    def test_latency(self):
+        emulator = make_emulator(latency=0.02, bandwidth=1024 * 1024)
+        with Session(transport=emulator) as session:
+            client = ObjectClient(auth, session, verify=False)
+            start = time.perf_counter()
+            client.put_object('k', b'x' * 51200)
+            self.assertGreaterEqual(time.perf_counter() - start, 0.02 + 0.048)
+
+
+class TestAsyncEmulator(IsolatedAsyncioTestCase):
+    async def test_concurrent(self):
+        emulator = make_emulator(latency=0.05)
+        session = AsyncSession(transport=emulator)
+        client = ObjectAsyncClient(auth, session, verify=False)
+        start = time.perf_counter()
+        await asyncio.gather(*(client.put_object(f'k{i}', b'%d' % i) for i in range(20)))
+        # 延迟使用asyncio.sleep 并发请求之间不会互相阻塞
+        self.assertLess(time.perf_counter() - start, 0.05 * 10)
+        resp = await client.get_object('k7')
+        self.assertEqual(resp.content, b'7')
+        self.assertEqual(len(emulator.buckets['bucket'].objects), 20)
+        await session.aclose()
@@ -0,0 +1,74 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_limiter
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/10 3:30 下午
+@Desc   ：
+==================================================
+"""
+import httpx
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.limiter import AdaptiveLimiter
+from oss.object import ObjectAsyncClient
+from oss.session import AsyncSession
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+class TestAdaptiveLimiter(IsolatedAsyncioTestCase):
+    async def test_increase_and_decrease(self):
+        limiter = AdaptiveLimiter(initial=4, max_limit=6)
+        for _ in range(20):
+            limiter.release(await limiter.acquire(), 0.01)
+        self.assertEqual(limiter.limit, 6)
+        epochs = [await limiter.acquire() for _ in range(3)]
+        for epoch in epochs:
+            limiter.release(epoch, 0.01, throttled=True)
+        self.assertEqual(limiter.limit, 3)
+        self.assertEqual(limiter.throttled, 3)
+
+    async def test_latency_target(self):
+        limiter = AdaptiveLimiter(initial=4, latency_target=0.1)
+        for _ in range(10):
+            limiter.release(await limiter.acquire(), 0.5)
+        self.assertEqual(limiter.limit, 4)
+
+    async def test_wait_for_slot(self):
+        limiter = AdaptiveLimiter(initial=2)
+        epoch = await limiter.acquire()
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiter.done())
+        limiter.release(epoch, 0.01)
+        await asyncio.wait_for(waiter, 1)
+        self.assertEqual(limiter.in_flight, 2)
+
+    async def test_session_limiter(self):
+        active = 0
+        peak = 0
+
+        async def handler(request):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.002)
+            active -= 1
+            return httpx.Response(503 if active >= 8 else 200)
+
+        limiter = AdaptiveLimiter(initial=32)
+        session = AsyncSession(transport=httpx.MockTransport(handler), retry=None,
+                               limiter=limiter)
+        client = ObjectAsyncClient(auth, session)
+        with limiter.job('head') as job:
+            await asyncio.gather(*(client.head_object(f'{i}.txt') for i in range(300)))
+        self.assertEqual(job.requests, 300)
+        self.assertGreater(job.throttled, 0)
+        self.assertLess(job.limit, 16)
+        self.assertEqual(limiter.in_flight, 0)
@@ -0,0 +1,148 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_metrics
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/19 3:30 下午
+@Desc   ：
+==================================================
+"""
+import httpx
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.retry import RetryPolicy
+from oss.session import Session, AsyncSession
+from oss.service import Service
+from oss.bucket import Bucket
+from oss.object import ObjectClient, ObjectAsyncClient
+from oss.metrics import RequestEvent, Histogram, MetricsAggregator, operation_name
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path == '/flaky' and request.headers.get('x-attempt') != 'ok':
+        request.headers['x-attempt'] = 'ok'
+        return httpx.Response(503)
+    if request.method == 'POST' and 'uploads' in request.url.params:
+        return httpx.Response(200, text='<InitiateMultipartUploadResult>'
+                                        '<UploadId>u1</UploadId>'
+                                        '</InitiateMultipartUploadResult>')
+    if request.method == 'GET':
+        return httpx.Response(200, content=b'x' * 10)
+    return httpx.Response(200)
+
+
+class TestOperationName(TestCase):
+    def test_names(self):
+        base = 'https://bucket.endpoint'
+        cases = [
+            (httpx.Request('GET', f'{base}/a'), 'GetObject'),
+            (httpx.Request('GET', f'{base}/?prefix=a'), 'ListObjects'),
+            (httpx.Request('PUT', f'{base}/a?partNumber=1&uploadId=u'), 'UploadPart'),
+            (httpx.Request('PUT', f'{base}/a?partNumber=1&uploadId=u',
+                           headers={'x-oss-copy-source': '/b/k'}), 'UploadPartCopy'),
+            (httpx.Request('PUT', f'{base}/a', headers={'x-oss-copy-source': '/b/k'}),
+             'CopyObject'),
+            (httpx.Request('GET', f'{base}/?acl'), 'GetBucketAcl'),
+            (httpx.Request('PUT', f'{base}/a?acl'), 'PutObjectAcl'),
+            (httpx.Request('DELETE', f'{base}/a?uploadId=u'), 'AbortMultipartUpload'),
+            (httpx.Request('POST', f'{base}/a?x-oss-process=csv/select'), 'SelectObject'),
+            (httpx.Request('HEAD', f'{base}/a'), 'HeadObject'),
+            (httpx.Request('HEAD', f'{base}/a?objectMeta'), 'GetObjectMeta'),
+        ]
+        for request, name in cases:
+            self.assertEqual(operation_name(request), name)
+
+
+class TestRequestEvent(TestCase):
+    def test_trace_phases(self):
+        event = RequestEvent(httpx.Request('GET', 'https://bucket.endpoint/a'), 'bucket')
+        for name in ('connection.connect_tcp', 'connection.start_tls',
+                     'http11.send_request_headers', 'http11.receive_response_headers'):
+            event.trace(f'{name}.started', {})
+            event.trace(f'{name}.complete', {})
+        event.trace('http11.send_request_body.started', {})
+        event.trace('http11.send_request_body.failed', {})
+        event.trace('connection.close.started', {})
+        self.assertEqual(set(event.phases), {'connect', 'tls', 'send', 'wait'})
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for i in range(1, 1001):
+            histogram.add(i / 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, delta=0.5 * 0.05)
+        self.assertAlmostEqual(histogram.percentile(99), 0.99, delta=0.99 * 0.05)
+        self.assertEqual(histogram.percentile(100), 1.0)
+        self.assertEqual(Histogram().percentile(50), 0.0)
+
+
+class TestHooks(TestCase):
+    def setUp(self) -> None:
+        self.events = []
+        self.metrics = MetricsAggregator()
+        self.session = Session(transport=httpx.MockTransport(handler),
+                               retry=RetryPolicy(backoff=0),
+                               hooks=[self.metrics, self.events.append])
+
+    def test_clients(self):
+        client = ObjectClient(auth, self.session)
+        client.put_object('a', b'12345')
+        client.get_object('a')
+        client.get_object('flaky')
+        Bucket(auth, self.session).get_bucket()
+        Service(auth, self.session).get_service()
+        self.assertEqual([e.operation for e in self.events],
+                         ['PutObject', 'GetObject', 'GetObject', 'ListObjects', 'ListBuckets'])
+        put, get, flaky = self.events[:3]
+        self.assertEqual((put.bytes_sent, put.status), (5, 200))
+        self.assertEqual(get.bytes_received, 10)
+        self.assertEqual((flaky.attempts, flaky.retries), (2, 1))
+        summary = self.metrics.summary()
+        self.assertEqual((summary['GetObject']['count'], summary['GetObject']['retries']), (2, 1))
+        self.assertIn('PutObject', self.metrics.report())
+
+    def test_error_event(self):
+        def broken(request):
+            raise httpx.ConnectError('refused')
+        session = Session(transport=httpx.MockTransport(broken), retry=None,
+                          hooks=[self.events.append])
+        with self.assertRaises(httpx.ConnectError):
+            ObjectClient(auth, session).get_object('a')
+        self.assertIsInstance(self.events[0].error, httpx.ConnectError)
+
+    def test_streamed_body(self):
+        client = ObjectClient(auth, self.session, verify=False)
+        client.put_object('a', iter([b'12', b'345', b'6']))
+        client.get_object_meta('a')
+        put, meta = self.events
+        self.assertEqual(put.bytes_sent, 6)
+        self.assertEqual(meta.operation, 'GetObjectMeta')
+
+    def test_disabled(self):
+        session = Session(transport=httpx.MockTransport(handler))
+        resp = ObjectClient(auth, session).get_object('a')
+        self.assertNotIn('trace', resp.request.extensions)
+
+
+class TestAsyncHooks(IsolatedAsyncioTestCase):
+    async def test_operations(self):
+        metrics = MetricsAggregator()
+        async with AsyncSession(transport=httpx.MockTransport(handler), hooks=[metrics]) as s:
+            client = ObjectAsyncClient(auth, s, verify=False)
+            await client.get_object('a')
+            await client.delete_object('a')
+        self.assertEqual(sorted(metrics.summary()), ['DeleteObject', 'GetObject'])
+
+    async def test_streamed_body(self):
+        async def body():
+            for chunk in (b'12', b'345'):
+                yield chunk
+
+        events = []
+        async with AsyncSession(transport=httpx.MockTransport(handler), hooks=[events.append]) as s:
+            await ObjectAsyncClient(auth, s, verify=False).put_object('a', body())
+        self.assertEqual(events[0].bytes_sent, 5)
@@ -0,0 +1,101 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_models
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/18 10:40 上午
+@Desc   ：
+==================================================
+"""
+from urllib.parse import quote
+from unittest import TestCase
+from oss.models import (parse_list_objects, ListObjectsParser, parse_list_buckets,
+                        parse_bucket_info, parse_acl, parse_worm, parse_error, parse_upload_id)
+
+KEYS = [f'dir/文件 {i:03d}+.txt' for i in range(50)]
+LIST_OBJECTS = (
+    '<?xml version="1.0" encoding="UTF-8"?><ListBucketResult><Name>b</Name>'
+    '<Prefix>dir/</Prefix><Marker></Marker><MaxKeys>50</MaxKeys>'
+    '<IsTruncated>true</IsTruncated><NextMarker>' + quote(KEYS[-1]) + '</NextMarker>'
+    + ''.join(f'<Contents><Key>{quote(k)}</Key><LastModified>2021-02-18T02:40:00.000Z'
+              f'</LastModified><ETag>"E{i}"</ETag><Type>Normal</Type><Size>{i}</Size>'
+              f'<StorageClass>Standard</StorageClass><Owner><ID>1</ID></Owner></Contents>'
+              for i, k in enumerate(KEYS))
+    + '<CommonPrefixes><Prefix>dir/sub%20dir/</Prefix></CommonPrefixes>'
+    '<EncodingType>url</EncodingType></ListBucketResult>').encode()
+
+
+class TestListObjectsParser(TestCase):
+    def test_matches_dom(self):
+        expected = parse_list_objects(LIST_OBJECTS)
+        for size in (1, 7, 4096, len(LIST_OBJECTS)):
+            parser = ListObjectsParser()
+            for i in range(0, len(LIST_OBJECTS), size):
+                parser.feed(LIST_OBJECTS[i:i + size])
+            page = parser.close()
+            self.assertEqual([(x.key, x.etag, x.size, x.storage_class) for x in page.objects],
+                             [(x.key, x.etag, x.size, x.storage_class) for x in expected.objects])
+            self.assertEqual([x.key for x in page.prefixes], ['dir/sub dir/'])
+            self.assertEqual((page.is_truncated, page.next_marker), (True, KEYS[-1]))
+
+    def test_objects_available_early(self):
+        parser = ListObjectsParser()
+        parser.feed(LIST_OBJECTS[:len(LIST_OBJECTS) // 2])
+        self.assertTrue(parser.objects)
+
+
+class TestModels(TestCase):
+    def test_list_buckets(self):
+        page = parse_list_buckets(
+            b'<ListAllMyBucketsResult><Prefix>a</Prefix><Marker></Marker><MaxKeys>1</MaxKeys>'
+            b'<IsTruncated>true</IsTruncated><NextMarker>app-1</NextMarker>'
+            b'<Owner><ID>512</ID><DisplayName>sw</DisplayName></Owner><Buckets><Bucket>'
+            b'<CreationDate>2021-01-21T02:00:00.000Z</CreationDate>'
+            b'<ExtranetEndpoint>oss-cn-hangzhou.aliyuncs.com</ExtranetEndpoint>'
+            b'<Location>oss-cn-hangzhou</Location><Name>app-1</Name>'
+            b'<Region>cn-hangzhou</Region><StorageClass>IA</StorageClass>'
+            b'</Bucket></Buckets></ListAllMyBucketsResult>')
+        self.assertEqual((page.owner_id, page.is_truncated, page.next_marker),
+                         ('512', True, 'app-1'))
+        bucket, = page.buckets
+        self.assertEqual((bucket.name, bucket.region, bucket.storage_class),
+                         ('app-1', 'cn-hangzhou', 'IA'))
+
+    def test_bucket_info(self):
+        info = parse_bucket_info(
+            b'<BucketInfo><Bucket><CreationDate>2021-01-21T02:00:00.000Z</CreationDate>'
+            b'<Location>oss-cn-hangzhou</Location><Name>app-1</Name>'
+            b'<StorageClass>Standard</StorageClass><DataRedundancyType>ZRS</DataRedundancyType>'
+            b'<Owner><DisplayName>sw</DisplayName><ID>512</ID></Owner>'
+            b'<AccessControlList><Grant>private</Grant></AccessControlList>'
+            b'</Bucket></BucketInfo>')
+        self.assertEqual((info.name, info.redundancy_type, info.acl, info.owner_name),
+                         ('app-1', 'ZRS', 'private', 'sw'))
+        with self.assertRaises(ValueError):
+            parse_bucket_info(b'<BucketInfo></BucketInfo>')
+
+    def test_acl_and_worm(self):
+        acl = parse_acl(b'<AccessControlPolicy><Owner><ID>512</ID></Owner><AccessControlList>'
+                        b'<Grant>public-read</Grant></AccessControlList></AccessControlPolicy>')
+        self.assertEqual((acl.grant, acl.owner_id), ('public-read', '512'))
+        worm = parse_worm(b'<WormConfiguration><WormId>1666E2CF</WormId><State>Locked</State>'
+                          b'<RetentionPeriodInDays>7</RetentionPeriodInDays>'
+                          b'</WormConfiguration>')
+        self.assertEqual((worm.worm_id, worm.state, worm.retention_days),
+                         ('1666E2CF', 'Locked', 7))
+
+    def test_error(self):
+        error = parse_error(b'<Error><Code>NoSuchKey</Code><Message>missing</Message>'
+                            b'<RequestId>5C3D</RequestId></Error>', 404)
+        self.assertEqual((error.status, error.code, error.request_id), (404, 'NoSuchKey', '5C3D'))
+        self.assertIsNone(parse_error(b''))
+        self.assertIsNone(parse_error(b'<Other/>'))
+
+    def test_upload_id(self):
+        self.assertEqual(parse_upload_id(b'<InitiateMultipartUploadResult><Bucket>b</Bucket>'
+                                         b'<UploadId>0004B9894A22E5B1888A1E29F823</UploadId>'
+                                         b'</InitiateMultipartUploadResult>'),
+                         '0004B9894A22E5B1888A1E29F823')
+        with self.assertRaises(ValueError):
+            parse_upload_id(b'<InitiateMultipartUploadResult><Bucket>b</Bucket>'
+                            b'</InitiateMultipartUploadResult>')
@@ -7,8 +7,18 @@
 @Desc   ：
 ==================================================
 """
+import io
+import os
+import re
+import base64
+import hashlib
+import httpx
+import tempfile
+from urllib.parse import quote
+from xml.sax.saxutils import unescape
 from unittest import TestCase, IsolatedAsyncioTestCase
 from oss.auth import Auth
+from oss.session import Session, AsyncSession
 from oss.object import ObjectAsyncClient, ObjectClient
 
 auth = Auth(
@@ -107,3 +117,350 @@ class TestObjectClient(TestCase):
     def test__initiate_multipart_upload(self):
         uid = self.client._initiate_multipart_upload('test.py')
         print(uid)
+
+
+class FakeMultipart:
+    """模拟OSS分片上传接口"""
+
+    def __init__(self, fail_part: int = None):
+        self.fail_part = fail_part
+        self.parts = {}
+        self.objects = {}
+        self.aborted = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        params = request.url.params
+        key = request.url.path
+        if request.method == 'POST' and 'uploads' in params:
+            return httpx.Response(200, text='<InitiateMultipartUploadResult>'
+                                            '<UploadId>u1</UploadId>'
+                                            '</InitiateMultipartUploadResult>')
+        if request.method == 'PUT' and 'partNumber' in params:
+            number = int(params['partNumber'])
+            if number == self.fail_part:
+                return httpx.Response(500)
+            self.parts[number] = request.read()
+            return httpx.Response(200, headers={'ETag': f'"etag{number}"'})
+        if request.method == 'POST' and 'uploadId' in params:
+            numbers = [int(n) for n in re.findall(r'<PartNumber>(\d+)</PartNumber>',
+                                                  request.read().decode())]
+            self.objects[key] = b''.join(self.parts[n] for n in numbers)
+            return httpx.Response(200)
+        if request.method == 'DELETE' and 'uploadId' in params:
+            self.aborted.append(params['uploadId'])
+            return httpx.Response(204)
+        if request.method == 'PUT':
+            self.objects[key] = request.read()
+            return httpx.Response(200)
+        return httpx.Response(404)
+
+
+class TestUploadFile(TestCase):
+    def setUp(self) -> None:
+        self.data = os.urandom(350 * 1024)
+        fd, self.file = tempfile.mkstemp()
+        os.write(fd, self.data)
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        os.remove(self.file)
+
+    def make_client(self, server):
+        client = ObjectClient(auth, Session(transport=httpx.MockTransport(server)))
+        return client
+
+    def test_upload_file(self):
+        server = FakeMultipart()
+        r = self.make_client(server).upload_file('big.bin', self.file, part_size=100 * 1024)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len(server.parts), 4)
+        self.assertEqual(server.objects['/big.bin'], self.data)
+
+    def test_upload_small_file(self):
+        server = FakeMultipart()
+        self.make_client(server).upload_file('small.bin', self.file)
+        self.assertEqual(server.parts, {})
+        self.assertEqual(server.objects['/small.bin'], self.data)
+
+    def test_upload_file_abort(self):
+        server = FakeMultipart(fail_part=2)
+        with self.assertRaises(httpx.HTTPStatusError):
+            self.make_client(server).upload_file('big.bin', self.file, part_size=100 * 1024)
+        self.assertEqual(server.aborted, ['u1'])
+        self.assertNotIn('/big.bin', server.objects)
+
+
+class TestAsyncUploadFile(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.data = os.urandom(350 * 1024)
+        fd, self.file = tempfile.mkstemp()
+        os.write(fd, self.data)
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        os.remove(self.file)
+
+    def make_client(self, server):
+        client = ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(server)))
+        return client
+
+    async def test_upload_file(self):
+        server = FakeMultipart()
+        client = self.make_client(server)
+        r = await client.upload_file('big.bin', self.file, part_size=100 * 1024, concurrency=3)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(server.objects['/big.bin'], self.data)
+
+    async def test_upload_file_abort(self):
+        server = FakeMultipart(fail_part=3)
+        client = self.make_client(server)
+        with self.assertRaises(httpx.HTTPStatusError):
+            await client.upload_file('big.bin', self.file, part_size=100 * 1024)
+        self.assertEqual(server.aborted, ['u1'])
+
+
+def ranged_server(data: bytes, etag: str = '"v1"'):
+    """模拟支持Range和If-Match的OSS读接口"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        headers = {'ETag': etag}
+        if request.method == 'HEAD':
+            headers['Content-Length'] = str(len(data))
+            return httpx.Response(200, headers=headers)
+        if request.headers.get('If-Match', etag) != etag:
+            return httpx.Response(412)
+        start, end = re.match(r'bytes=(\d+)-(\d+)', request.headers['Range']).groups()
+        return httpx.Response(206, headers=headers, content=data[int(start):int(end) + 1])
+
+    return handler
+
+
+class TestDownloadFile(TestCase):
+    def setUp(self) -> None:
+        self.data = os.urandom(350 * 1024 + 7)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.file = os.path.join(tmp.name, 'download.bin')
+
+    def test_download_file(self):
+        transport = httpx.MockTransport(ranged_server(self.data))
+        client = ObjectClient(auth, Session(transport=transport))
+        r = client.download_file('big.bin', self.file, part_size=100 * 1024)
+        self.assertEqual(r.status_code, 200)
+        with open(self.file, 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_download_file_failed(self):
+        def handler(request):
+            if request.method == 'GET' and request.headers['Range'].startswith('bytes=0-'):
+                return httpx.Response(500)
+            return ranged_server(self.data)(request)
+
+        client = ObjectClient(auth, Session(transport=httpx.MockTransport(handler)))
+        with self.assertRaises(httpx.HTTPStatusError):
+            client.download_file('big.bin', self.file, part_size=100 * 1024)
+        self.assertFalse(os.path.exists(self.file))
+
+
+class TestAsyncDownloadFile(IsolatedAsyncioTestCase):
+    async def test_download_file(self):
+        data = os.urandom(350 * 1024 + 7)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        file = os.path.join(tmp.name, 'download.bin')
+        transport = httpx.MockTransport(ranged_server(data))
+        client = ObjectAsyncClient(auth, AsyncSession(transport=transport))
+        await client.download_file('big.bin', file, part_size=100 * 1024, concurrency=3)
+        with open(file, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+
+class RecordingServer:
+    """记录收到的请求头和请求体"""
+
+    def __init__(self):
+        self.headers = None
+        self.body = b''
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.headers = request.headers
+        self.body = request.read()
+        return httpx.Response(200)
+
+
+class TestStreamingPutObject(TestCase):
+    def setUp(self) -> None:
+        self.data = os.urandom(600 * 1024)
+        self.server = RecordingServer()
+        self.client = ObjectClient(auth, Session(transport=httpx.MockTransport(self.server)))
+
+    def test_put_path(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(self.data)
+            f.flush()
+            self.client.put_object('a.bin', f.name)
+        self.assertEqual(self.server.headers['Content-Length'], str(len(self.data)))
+        self.assertNotIn('Transfer-Encoding', self.server.headers)
+        self.assertEqual(self.server.body, self.data)
+
+    def test_put_file_object(self):
+        f = io.BytesIO(self.data)
+        f.seek(100)
+        self.client.put_object('a.bin', f)
+        self.assertEqual(self.server.headers['Content-Length'], str(len(self.data) - 100))
+        self.assertEqual(self.server.body, self.data[100:])
+
+    def test_put_iterator(self):
+        chunks = (self.data[i:i + 1000] for i in range(0, len(self.data), 1000))
+        self.client.put_object('a.bin', chunks, size=len(self.data))
+        self.assertEqual(self.server.headers['Content-Length'], str(len(self.data)))
+        self.assertEqual(self.server.body, self.data)
+
+    def test_put_unsupported(self):
+        with self.assertRaises(TypeError):
+            self.client.put_object('a.bin', 123)
+
+
+class TestAsyncStreamingPutObject(IsolatedAsyncioTestCase):
+    async def test_put_async_iterator(self):
+        data = os.urandom(300 * 1024)
+        server = RecordingServer()
+        client = ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(server)))
+
+        async def chunks():
+            for i in range(0, len(data), 4096):
+                yield data[i:i + 4096]
+
+        await client.put_object('a.bin', chunks(), size=len(data))
+        self.assertEqual(server.headers['Content-Length'], str(len(data)))
+        self.assertEqual(server.body, data)
+        await client.put_object('b.bin', io.BytesIO(data))
+        self.assertEqual(server.body, data)
+        await client.put_object('c.bin', [data[:10], data[10:]], size=len(data))
+        self.assertEqual(server.body, data)
+
+
+class TrackedStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """记录是否被关闭的响应流"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.closed = False
+
+    def __iter__(self):
+        for i in range(0, len(self.data), 1000):
+            yield self.data[i:i + 1000]
+
+    async def __aiter__(self):
+        for chunk in self:
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+    async def aclose(self):
+        self.closed = True
+
+
+class TestIterObject(TestCase):
+    def setUp(self) -> None:
+        self.data = os.urandom(10000)
+        self.stream = TrackedStream(self.data)
+        self.client = ObjectClient(auth, Session(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, stream=self.stream))))
+
+    def test_iter_object(self):
+        chunks = list(self.client.iter_object('a.bin', chunk_size=4096))
+        self.assertEqual([len(c) for c in chunks], [4096, 4096, 1808])
+        self.assertEqual(b''.join(chunks), self.data)
+        self.assertTrue(self.stream.closed)
+
+    def test_iter_object_stop_early(self):
+        chunks = self.client.iter_object('a.bin', chunk_size=1024)
+        next(chunks)
+        chunks.close()
+        self.assertTrue(self.stream.closed)
+
+    def test_download_to(self):
+        f = io.BytesIO()
+        self.assertEqual(self.client.download_to('a.bin', f), len(self.data))
+        self.assertEqual(f.getvalue(), self.data)
+
+    def test_iter_object_error(self):
+        client = ObjectClient(auth, Session(transport=httpx.MockTransport(
+            lambda request: httpx.Response(404, text='<Error/>'))))
+        with self.assertRaises(httpx.HTTPStatusError):
+            list(client.iter_object('missing.bin'))
+
+
+class TestAsyncIterObject(IsolatedAsyncioTestCase):
+    async def test_iter_object(self):
+        data = os.urandom(10000)
+        stream = TrackedStream(data)
+        client = ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, stream=stream))))
+        chunks = client.iter_object('a.bin', chunk_size=4096)
+        self.assertEqual(len(await chunks.__anext__()), 4096)
+        await chunks.aclose()
+        self.assertTrue(stream.closed)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        file = os.path.join(tmp.name, 'a.bin')
+        self.assertEqual(await client.download_to('a.bin', file), len(data))
+        with open(file, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+
+class FakeDelete:
+    """模拟DeleteMultipleObjects接口 以undeletable开头的文件删除失败"""
+
+    def __init__(self, fail_batch: int = None):
+        self.fail_batch = fail_batch
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = request.read()
+        digest = base64.b64encode(hashlib.md5(body).digest()).decode()
+        assert request.headers['Content-MD5'] == digest
+        self.requests.append(body)
+        if len(self.requests) == self.fail_batch:
+            return httpx.Response(503, text='<Error><Code>SlowDown</Code></Error>')
+        keys = re.findall(r'<Key>(.*?)</Key>', body.decode())
+        deleted = ''.join(f'<Deleted><Key>{quote(unescape(key))}</Key></Deleted>'
+                          for key in keys if not key.startswith('undeletable'))
+        return httpx.Response(200, text=f'<DeleteResult>{deleted}</DeleteResult>')
+
+
+class TestDeleteObjects(TestCase):
+    def make_client(self, server):
+        session = Session(transport=httpx.MockTransport(server), retry=None)
+        client = ObjectClient(auth, session)
+        return client
+
+    def test_delete_objects(self):
+        server = FakeDelete()
+        r = self.make_client(server).delete_objects(['/a&b.txt', 'c.txt'])
+        self.assertEqual(r.status_code, 200)
+        self.assertIn(b'<Quiet>true</Quiet>', server.requests[0])
+        self.assertIn(b'<Key>a&amp;b.txt</Key>', server.requests[0])
+
+    def test_delete_objects_limit(self):
+        with self.assertRaises(ValueError):
+            self.make_client(FakeDelete()).delete_objects([str(i) for i in range(1001)])
+
+    def test_delete_many(self):
+        server = FakeDelete(fail_batch=2)
+        keys = (f'key{i}' for i in range(2500))
+        failures = self.make_client(server).delete_many(keys)
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(failures, {f'key{i}': 'SlowDown' for i in range(1000, 2000)})
+
+
+class TestAsyncDeleteObjects(IsolatedAsyncioTestCase):
+    async def test_delete_many(self):
+        server = FakeDelete()
+        client = ObjectAsyncClient(auth, AsyncSession(transport=httpx.MockTransport(server)))
+        keys = [f'key{i}' for i in range(2100)] + ['undeletable 1']
+        failures = await client.delete_many(keys, batch_size=500, concurrency=3)
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(failures, {'undeletable 1': 'NotDeleted'})
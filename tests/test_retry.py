@@ -0,0 +1,158 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_retry
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/9 4:10 下午
+@Desc   ：
+==================================================
+"""
+import time
+import httpx
+import asyncio
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.object import ObjectClient, ObjectAsyncClient
+from oss.retry import RetryPolicy
+from oss.session import Session, AsyncSession
+
+
+class CountingAuth(Auth):
+    def __init__(self):
+        super().__init__('YouAccessKeyId', 'YouAccessKeySecret', 'bucket', 'endpoing')
+        self.signed = 0
+
+    def signature(self, request, *, bucket=None):
+        self.signed += 1
+        super().signature(request, bucket=bucket)
+
+
+class Flaky:
+    """前failures次请求返回status或抛出连接异常"""
+
+    def __init__(self, failures: int, status: int = 503):
+        self.failures = failures
+        self.status = status
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        assert 'Authorization' in request.headers
+        if self.calls <= self.failures:
+            if self.status is None:
+                raise httpx.ConnectError('reset', request=request)
+            return httpx.Response(self.status)
+        return httpx.Response(200)
+
+
+def make_client(server, **kwargs):
+    kwargs.setdefault('retry', RetryPolicy(backoff=0.001))
+    auth = CountingAuth()
+    return ObjectClient(auth, Session(transport=httpx.MockTransport(server), **kwargs)), auth
+
+
+class TestRetryPolicy(TestCase):
+    def test_retry_status(self):
+        server = Flaky(2)
+        client, auth = make_client(server)
+        self.assertEqual(client.get_object('a.txt').status_code, 200)
+        self.assertEqual(server.calls, 3)
+        self.assertEqual(auth.signed, 3)
+
+    def test_retry_exhausted(self):
+        server = Flaky(5, 500)
+        client, _ = make_client(server)
+        self.assertEqual(client.head_object('a.txt').status_code, 500)
+        self.assertEqual(server.calls, 3)
+
+    def test_retry_connect_error(self):
+        server = Flaky(1, None)
+        client, _ = make_client(server)
+        self.assertEqual(client.delete_object('a.txt').status_code, 200)
+        self.assertEqual(server.calls, 2)
+
+    def test_no_retry_post(self):
+        server = Flaky(1)
+        client, _ = make_client(server)
+        self.assertEqual(client.append_object('a.log', b'x').status_code, 503)
+        self.assertEqual(server.calls, 1)
+
+    def test_no_retry_stream_body(self):
+        server = Flaky(1)
+        client, _ = make_client(server)
+        self.assertEqual(client.put_object('a.txt', iter([b'x']), size=1).status_code, 503)
+        self.assertEqual(server.calls, 1)
+
+    def test_no_retry_client_error(self):
+        server = Flaky(1, 404)
+        client, _ = make_client(server)
+        self.assertEqual(client.get_object('a.txt').status_code, 404)
+        self.assertEqual(server.calls, 1)
+
+    def test_deadline(self):
+        server = Flaky(5)
+        client, _ = make_client(server, retry=RetryPolicy(max_attempts=10, backoff=1,
+                                                          deadline=0.01))
+        start = time.monotonic()
+        self.assertEqual(client.get_object('a.txt').status_code, 503)
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_deadline_timeout(self):
+        timeouts = []
+        server = Flaky(1)
+
+        def handler(request):
+            timeouts.append(request.extensions['timeout'])
+            return server(request)
+
+        client, _ = make_client(handler, timeout=httpx.Timeout(2.0, pool=None),
+                                retry=RetryPolicy(backoff=0.001, deadline=60))
+        self.assertEqual(client.get_object('a.txt').status_code, 200)
+        # 每次尝试仍使用配置的超时 不会放大到整个deadline
+        self.assertEqual(timeouts, [{'connect': 2.0, 'read': 2.0, 'write': 2.0, 'pool': None}] * 2)
+        timeouts.clear()
+        client, _ = make_client(handler, timeout=2.0, retry=RetryPolicy(deadline=0.5))
+        client.get_object('a.txt')
+        self.assertLessEqual(max(timeouts[0].values()), 0.5)
+
+    def test_disabled(self):
+        server = Flaky(1)
+        client, _ = make_client(server, retry=None)
+        self.assertEqual(client.get_object('a.txt').status_code, 503)
+        self.assertEqual(server.calls, 1)
+
+
+class TestAsyncRetryPolicy(IsolatedAsyncioTestCase):
+    async def test_retry_status(self):
+        server = Flaky(1)
+        session = AsyncSession(transport=httpx.MockTransport(server),
+                               retry=RetryPolicy(backoff=0.001))
+        client = ObjectAsyncClient(CountingAuth(), session)
+        self.assertEqual((await client.get_object('a.txt')).status_code, 200)
+        self.assertEqual(server.calls, 2)
+
+    async def test_hedge(self):
+        calls = []
+
+        async def handler(request):
+            calls.append(time.monotonic())
+            if len(calls) == 1:
+                await asyncio.sleep(5)
+            return httpx.Response(200, text=str(len(calls)))
+
+        session = AsyncSession(transport=httpx.MockTransport(handler),
+                               retry=RetryPolicy(hedge_after=0.05))
+        client = ObjectAsyncClient(CountingAuth(), session)
+        start = time.monotonic()
+        r = await client.get_object('a.txt')
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(r.text, '2')
+        self.assertEqual(len(calls), 2)
+
+    async def test_hedge_fast_response(self):
+        server = Flaky(0)
+        session = AsyncSession(transport=httpx.MockTransport(server),
+                               retry=RetryPolicy(hedge_after=1))
+        client = ObjectAsyncClient(CountingAuth(), session)
+        self.assertEqual((await client.head_object('a.txt')).status_code, 200)
+        self.assertEqual(server.calls, 1)
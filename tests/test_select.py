@@ -0,0 +1,245 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_select
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/17 3:10 下午
+@Desc   ：
+==================================================
+"""
+import re
+import zlib
+import asyncio
+import base64
+import struct
+import httpx
+from xml.etree import ElementTree
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.crc import ChecksumError
+from oss.session import Session, AsyncSession
+from oss.object import ObjectClient, ObjectAsyncClient
+from oss.select import (select_request, FrameDecoder, SelectError, SelectFrame, DATA_FRAME,
+                        CONTINUOUS_FRAME, END_FRAME, META_END_CSV_FRAME, META_END_JSON_FRAME)
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+def frame(type_: int, payload: bytes, crc: bool = True) -> bytes:
+    checksum = zlib.crc32(payload) if crc else 0
+    return (struct.pack('>II4x', (1 << 24) | type_, len(payload)) + payload +
+            struct.pack('>I', checksum))
+
+
+def data_frame(offset: int, data: bytes) -> bytes:
+    return frame(DATA_FRAME, struct.pack('>Q', offset) + data)
+
+
+def end_frame(offset: int, status: int = 200, error: bytes = b'') -> bytes:
+    return frame(END_FRAME, struct.pack('>QQI', offset, offset, status) + error)
+
+
+class TestSelectRequest(TestCase):
+    def test_csv(self):
+        root = ElementTree.fromstring(select_request('select * from ossobject', header='USE',
+                                                     _range='line-range=0-9'))
+        self.assertEqual(base64.b64decode(root.findtext('Expression')),
+                         b'select * from ossobject')
+        csv = root.find('InputSerialization/CSV')
+        self.assertEqual(csv.findtext('FileHeaderInfo'), 'USE')
+        self.assertEqual(base64.b64decode(csv.findtext('FieldDelimiter')), b',')
+        self.assertEqual(csv.findtext('Range'), 'line-range=0-9')
+        self.assertEqual(root.findtext('OutputSerialization/EnablePayloadCrc'), 'true')
+
+    def test_json(self):
+        root = ElementTree.fromstring(select_request('select s.a from ossobject s',
+                                                     'JSON', json_type='LINES'))
+        self.assertEqual(root.findtext('InputSerialization/JSON/Type'), 'LINES')
+        with self.assertRaises(ValueError):
+            select_request('select 1', 'parquet')
+
+
+class TestFrameDecoder(TestCase):
+    def test_split_feed(self):
+        body = (data_frame(10, b'a,1\n') + frame(CONTINUOUS_FRAME, struct.pack('>Q', 20)) +
+                data_frame(30, b'b,2\n') + end_frame(30))
+        decoder = FrameDecoder()
+        frames = []
+        for i in range(len(body)):
+            frames.extend(decoder.feed(body[i:i + 1]))
+        self.assertEqual([f.type for f in frames],
+                         [DATA_FRAME, CONTINUOUS_FRAME, DATA_FRAME, END_FRAME])
+        self.assertEqual(frames[2].data, b'b,2\n')
+        self.assertEqual(decoder.close().status, 200)
+
+    def test_checksum(self):
+        body = bytearray(data_frame(0, b'abc'))
+        body[-5] ^= 1
+        with self.assertRaises(ChecksumError):
+            FrameDecoder().feed(bytes(body))
+        self.assertEqual(len(FrameDecoder(verify=False).feed(bytes(body))), 1)
+        # 未开启EnablePayloadCrc时校验值为0
+        self.assertEqual(len(FrameDecoder().feed(frame(DATA_FRAME, bytes(9), crc=False))), 1)
+
+    def test_meta_end(self):
+        payload = struct.pack('>QQIIQI', 100, 100, 200, 3, 1000, 5)
+        result, = FrameDecoder().feed(frame(META_END_CSV_FRAME, payload))
+        self.assertEqual((result.splits, result.rows, result.columns), (3, 1000, 5))
+
+    def test_truncated(self):
+        decoder = FrameDecoder()
+        decoder.feed(data_frame(0, b'abc')[:-2])
+        with self.assertRaises(SelectError):
+            decoder.close()
+
+
+class FakeSelect:
+    def __init__(self, body: bytes, headers: dict = None):
+        self.body = body
+        self.headers = headers or {}
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(206, headers=self.headers, content=self.body)
+
+
+class TestIterSelect(TestCase):
+    def make_client(self, server):
+        return ObjectClient(auth, Session(transport=httpx.MockTransport(server)))
+
+    def test_records(self):
+        body = data_frame(5, b'a,1\nb,') + data_frame(9, b'2\nc,3') + end_frame(12)
+        server = FakeSelect(body)
+        progress = []
+        records = list(self.make_client(server).iter_select(
+            'data.csv', select_request('select * from ossobject'), 'csv', delimiter=b'\n',
+            progress=progress.append))
+        self.assertEqual(records, [b'a,1', b'b,2', b'c,3'])
+        self.assertEqual([f.type for f in progress], [END_FRAME])
+        self.assertEqual(server.requests[0].url.params['x-oss-process'], 'csv/select')
+
+    def test_end_error(self):
+        body = data_frame(5, b'a\n') + end_frame(5, 400, b'InvalidCsvLine')
+        chunks = self.make_client(FakeSelect(body)).iter_select('data.csv', '')
+        self.assertEqual(next(chunks), b'a\n')
+        with self.assertRaises(SelectError) as ctx:
+            next(chunks)
+        self.assertEqual(ctx.exception.message, 'InvalidCsvLine')
+
+    def test_raw_output(self):
+        server = FakeSelect(b'a,1\n', {'x-oss-select-output-raw': 'true'})
+        self.assertEqual(list(self.make_client(server).iter_select('data.csv', '')), [b'a,1\n'])
+        # 无法从请求体判断格式时与select_object一样使用json
+        self.assertEqual(server.requests[0].url.params['x-oss-process'], 'json/select')
+
+    def test_default_type(self):
+        server = FakeSelect(data_frame(5, b'a,1\n') + end_frame(5))
+        client = self.make_client(server)
+        # 两个函数都使用默认格式时 按请求体中的InputSerialization选择x-oss-process
+        list(client.iter_select('data.csv', select_request('select * from ossobject')))
+        client.select_object('data.csv', select_request('select * from ossobject'))
+        client.select_object('data.json', select_request('select * from ossobject', 'json'))
+        self.assertEqual([r.url.params['x-oss-process'] for r in server.requests],
+                         ['csv/select', 'csv/select', 'json/select'])
+
+
+class TestAsyncIterSelect(IsolatedAsyncioTestCase):
+    async def test_records(self):
+        body = data_frame(5, b'{"a":1}\n') + data_frame(9, b'{"a":2}\n') + end_frame(12)
+        async with AsyncSession(transport=httpx.MockTransport(FakeSelect(body))) as session:
+            client = ObjectAsyncClient(auth, session)
+            records = [r async for r in client.iter_select(
+                'data.json', select_request('select * from ossobject', 'json'),
+                'json', delimiter=b'\n')]
+        self.assertEqual(records, [b'{"a":1}', b'{"a":2}'])
+
+
+class FakeSplitSelect:
+    """每个split两行的csv文件 第一个区间响应最慢"""
+
+    def __init__(self, lines: int = 20):
+        self.rows = [f'{i},v{i}'.encode() for i in range(lines)]
+        self.ranges = []
+        self.meta_calls = 0
+        self.fail = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        process = request.url.params['x-oss-process']
+        if process == 'csv/meta':
+            self.meta_calls += 1
+            splits = (len(self.rows) + 1) // 2
+            payload = struct.pack('>QQIIQI', 0, 0, 200, splits, len(self.rows), 2)
+            return httpx.Response(200, content=frame(META_END_CSV_FRAME, payload))
+        root = ElementTree.fromstring(request.read())
+        unit, first, last = re.match(r'(split|line)-range=(\d+)-(\d+)',
+                                     root.findtext('InputSerialization/CSV/Range')).groups()
+        first, last = int(first), int(last)
+        self.ranges.append((unit, first, last))
+        if unit == 'split':
+            first, last = first * 2, last * 2 + 1
+        if self.fail == first:
+            return httpx.Response(403)
+        await asyncio.sleep(0.05 if first == 0 else 0)
+        body = b''.join(data_frame(n, row + b'\n')
+                        for n, row in enumerate(self.rows[first:last + 1]))
+        return httpx.Response(206, content=body + end_frame(last))
+
+
+class TestSelectParallel(IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.server = FakeSplitSelect()
+        self.session = AsyncSession(transport=httpx.MockTransport(self.server))
+        self.client = ObjectAsyncClient(auth, self.session)
+
+    async def asyncTearDown(self) -> None:
+        await self.session.aclose()
+
+    async def test_meta(self):
+        meta = await self.client.create_select_object_meta('data.csv')
+        self.assertEqual((meta.splits, meta.rows, meta.columns), (10, 20, 2))
+
+    async def test_ordered(self):
+        records = [r async for r in self.client.select_parallel(
+            'data.csv', 'select * from ossobject', concurrency=3, parts=5, delimiter=b'\n')]
+        self.assertEqual(records, self.server.rows)
+        self.assertEqual(sorted(r[1:] for r in self.server.ranges),
+                         [(0, 1), (2, 3), (4, 5), (6, 7), (8, 9)])
+
+    async def test_unordered_by_line(self):
+        meta = await self.client.create_select_object_meta('data.csv')
+        records = [r async for r in self.client.select_parallel(
+            'data.csv', 'select * from ossobject', concurrency=4, ordered=False,
+            delimiter=b'\n', unit='line', meta=meta)]
+        self.assertEqual(sorted(records), sorted(self.server.rows))
+        self.assertNotEqual(records, self.server.rows)
+        self.assertEqual(self.server.meta_calls, 1)
+        self.assertEqual({r[0] for r in self.server.ranges}, {'line'})
+
+    async def test_failure(self):
+        self.server.fail = 8
+        with self.assertRaises(httpx.HTTPStatusError):
+            async for _ in self.client.select_parallel('data.csv', 'select * from ossobject',
+                                                       parts=5):
+                pass
+
+    async def test_json_lines(self):
+        server = FakeSelect(data_frame(0, b'{"a":1}\n') + end_frame(0))
+        meta = SelectFrame(META_END_JSON_FRAME, 0)
+        meta.splits, meta.rows = 2, 2
+        async with AsyncSession(transport=httpx.MockTransport(server)) as session:
+            client = ObjectAsyncClient(auth, session)
+            records = [r async for r in client.select_parallel(
+                'data.json', 'select * from ossobject', 'json', parts=2, meta=meta)]
+            self.assertEqual(len(records), 2)
+            types = {ElementTree.fromstring(r.read()).findtext('InputSerialization/JSON/Type')
+                     for r in server.requests}
+            self.assertEqual(types, {'LINES'})
+            with self.assertRaises(ValueError):
+                async for _ in client.select_parallel('data.json', 'select * from ossobject',
+                                                      'json', meta=meta, json_type='DOCUMENT'):
+                    pass
+        self.assertEqual(len(server.requests), 2)
@@ -7,9 +7,11 @@
 @Desc   ：
 ==================================================
 """
-from unittest import IsolatedAsyncioTestCase
+import httpx
+from unittest import TestCase, IsolatedAsyncioTestCase
 from oss.auth import Auth
-from oss.service import AsyncService
+from oss.session import Session
+from oss.service import Service, AsyncService
 
 auth = Auth(
     'YouAccessKeyId', 'YouAccessKeySecret',
@@ -25,3 +27,20 @@ class TestAsyncService(IsolatedAsyncioTestCase):
         r = await self.client.get_service(prefix='se', max_keys=1000)
         print(r.text)
         self.assertEqual(r.status_code, 200)
+
+
+class TestIterBuckets(TestCase):
+    def test_pages(self):
+        names = [f'app-{i}' for i in range(5)]
+
+        def handler(request):
+            marker = request.url.params.get('marker', '')
+            page = [n for n in names if n > marker][:2]
+            truncated = page[-1] != names[-1]
+            body = ''.join(f'<Bucket><Name>{n}</Name></Bucket>' for n in page)
+            return httpx.Response(200, text=f'<ListAllMyBucketsResult>'
+                                            f'<IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                                            f'<NextMarker>{page[-1]}</NextMarker>'
+                                            f'<Buckets>{body}</Buckets></ListAllMyBucketsResult>')
+        client = Service(auth, Session(transport=httpx.MockTransport(handler)))
+        self.assertEqual([b.name for b in client.iter_buckets(page_size=2)], names)
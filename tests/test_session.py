@@ -0,0 +1,66 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_session
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/8 11:20 上午
+@Desc   ：
+==================================================
+"""
+import httpx
+from unittest import TestCase, IsolatedAsyncioTestCase
+from oss.auth import Auth
+from oss.bucket import Bucket, AsyncBucket
+from oss.object import ObjectClient, ObjectAsyncClient
+from oss.service import Service, AsyncService
+from oss.session import Session, AsyncSession
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+def ok(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200)
+
+
+class TestSession(TestCase):
+    def test_shared_session(self):
+        with Session(max_connections=10, transport=httpx.MockTransport(ok)) as session:
+            clients = [Service(auth, session), Bucket(auth, session), ObjectClient(auth, session)]
+            self.assertTrue(all(c.client is session.client for c in clients))
+            self.assertEqual(clients[2].head_object('a.txt').status_code, 200)
+            for client in clients:
+                client.close()
+            self.assertFalse(session.is_closed)
+        self.assertTrue(session.is_closed)
+
+    def test_own_session(self):
+        with ObjectClient(auth) as client:
+            self.assertIsInstance(client.session, Session)
+        self.assertTrue(client.client.is_closed)
+
+    def test_session_type(self):
+        with self.assertRaises(TypeError):
+            ObjectAsyncClient(auth, Session())
+        with self.assertRaises(TypeError):
+            Bucket(auth, AsyncSession())
+
+
+class TestAsyncSession(IsolatedAsyncioTestCase):
+    async def test_shared_session(self):
+        async with AsyncSession(transport=httpx.MockTransport(ok)) as session:
+            service = AsyncService(auth, session)
+            bucket = AsyncBucket(auth, session)
+            async with ObjectAsyncClient(auth, session) as client:
+                r = await client.head_object('a.txt')
+                self.assertEqual(r.status_code, 200)
+            self.assertIs(service.client, bucket.client)
+            self.assertFalse(session.is_closed)
+        self.assertTrue(session.is_closed)
+
+    async def test_own_session(self):
+        async with AsyncBucket(auth) as bucket:
+            self.assertIsInstance(bucket.session, AsyncSession)
+        self.assertTrue(bucket.client.is_closed)
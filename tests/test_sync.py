@@ -0,0 +1,206 @@
+"""
+=================================================
+@Project -> File   ：aliyun -> test_sync
+@IDE    ：PyCharm
+@Author ：sw
+@Date   ：2021/2/13 4:10 下午
+@Desc   ：
+==================================================
+"""
+import os
+import re
+import time
+import httpx
+import hashlib
+import tempfile
+import threading
+from urllib.parse import quote, unquote
+from unittest import IsolatedAsyncioTestCase, mock
+from oss.auth import Auth
+from oss.session import AsyncSession
+from oss.sync import DirectorySync, UPLOAD, DELETE_REMOTE, _file_md5
+
+auth = Auth(
+    'YouAccessKeyId', 'YouAccessKeySecret',
+    'bucket', 'endpoing'
+)
+
+
+class FakeStore:
+    """内存中的储存桶 支持ListObjects PutObject GetObject DeleteMultipleObjects"""
+
+    def __init__(self):
+        self.objects = {}
+        self.puts = []
+        self.gets = []
+
+    def put(self, key: str, data: bytes, mtime: float = None):
+        mtime = time.time() if mtime is None else mtime
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(mtime))
+        self.objects[key] = (data, f'"{hashlib.md5(data).hexdigest().upper()}"', stamp)
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        key = unquote(request.url.path.lstrip('/'))
+        if request.method == 'GET' and not key:
+            params = request.url.params
+            prefix = params.get('prefix', '')
+            marker = params.get('marker', '')
+            limit = int(params.get('max-keys', 100))
+            keys = [k for k in sorted(self.objects) if k.startswith(prefix) and k > marker]
+            page, truncated = keys[:limit], len(keys) > limit
+            body = ''.join(f'<Contents><Key>{quote(k)}</Key><ETag>{self.objects[k][1]}</ETag>'
+                           f'<Size>{len(self.objects[k][0])}</Size>'
+                           f'<LastModified>{self.objects[k][2]}</LastModified></Contents>'
+                           for k in page)
+            marker = f'<NextMarker>{quote(page[-1])}</NextMarker>' if truncated else ''
+            return httpx.Response(200, text=f'<ListBucketResult><EncodingType>url</EncodingType>'
+                                            f'<IsTruncated>{str(truncated).lower()}</IsTruncated>'
+                                            f'{marker}{body}</ListBucketResult>')
+        if request.method == 'PUT':
+            self.puts.append(key)
+            self.put(key, request.read())
+            return httpx.Response(200, headers={'ETag': self.objects[key][1]})
+        if request.method == 'GET':
+            self.gets.append(key)
+            return httpx.Response(200, content=self.objects[key][0])
+        if request.method == 'POST' and 'delete' in request.url.params:
+            keys = re.findall(r'<Key>(.*?)</Key>', request.read().decode())
+            for k in keys:
+                self.objects.pop(k, None)
+            deleted = ''.join(f'<Deleted><Key>{quote(k)}</Key></Deleted>' for k in keys)
+            return httpx.Response(200, text=f'<DeleteResult>{deleted}</DeleteResult>')
+        return httpx.Response(405)
+
+
+def write(path: str, data: bytes, mtime: float = None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestDirectorySync(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+        self.store = FakeStore()
+        self.session = AsyncSession(transport=httpx.MockTransport(self.store))
+
+    async def asyncTearDown(self) -> None:
+        await self.session.aclose()
+        self.tmp.cleanup()
+
+    def make_sync(self, **kwargs):
+        return DirectorySync(auth, self.session, concurrency=4, **kwargs)
+
+    async def test_upload_incremental(self):
+        old = time.time() - 3600
+        write(os.path.join(self.root, 'a.txt'), b'a', old)
+        write(os.path.join(self.root, 'sub', 'b.txt'), b'bb', old)
+        stats = await self.make_sync().upload(self.root, 'build')
+        self.assertEqual(stats.uploaded, 2)
+        self.assertEqual(sorted(self.store.objects), ['build/a.txt', 'build/sub/b.txt'])
+
+        write(os.path.join(self.root, 'sub', 'b.txt'), b'changed')
+        write(os.path.join(self.root, 'c.txt'), b'c')
+        stats = await self.make_sync().upload(self.root, 'build/')
+        self.assertEqual((stats.uploaded, stats.skipped), (2, 1))
+        self.assertEqual(self.store.objects['build/sub/b.txt'][0], b'changed')
+        self.assertEqual(stats.bytes, len(b'changed') + 1)
+        self.assertFalse(stats.failed)
+
+    async def test_dry_run_and_delete(self):
+        write(os.path.join(self.root, 'keep.txt'), b'k', time.time() - 3600)
+        self.store.put('out/keep.txt', b'k')
+        self.store.put('out/stale.txt', b's')
+        stats = await self.make_sync(delete=True, dry_run=True).upload(self.root, 'out')
+        self.assertEqual([(a.op, a.key) for a in stats.actions],
+                         [(DELETE_REMOTE, 'out/stale.txt')])
+        self.assertIn('out/stale.txt', self.store.objects)
+        stats = await self.make_sync(delete=True).upload(self.root, 'out')
+        self.assertEqual(stats.deleted, 1)
+        self.assertEqual(list(self.store.objects), ['out/keep.txt'])
+
+    async def test_md5_compare(self):
+        path = os.path.join(self.root, 'same.txt')
+        write(path, b'same')
+        self.store.put('same.txt', b'same', time.time() - 3600)
+        stats = await self.make_sync(compare='md5').upload(self.root)
+        self.assertEqual((stats.uploaded, stats.skipped), (0, 1))
+        stats = await self.make_sync().upload(self.root)
+        self.assertEqual(stats.actions[0].op, UPLOAD)
+
+    async def test_md5_compare_parallel(self):
+        old = time.time() - 3600
+        for i in range(8):
+            write(os.path.join(self.root, f'{i}.txt'), b'%d' % i)
+            self.store.put(f'{i}.txt', b'%d' % i if i % 2 else b'X', old)
+        lock = threading.Lock()
+        active = [0, 0]
+
+        def slow_md5(path):
+            with lock:
+                active[0] += 1
+                active[1] = max(active)
+            time.sleep(0.05)
+            with lock:
+                active[0] -= 1
+            return _file_md5(path)
+
+        with mock.patch('oss.sync._file_md5', slow_md5):
+            stats = await self.make_sync(compare='md5', dry_run=True).upload(self.root)
+        self.assertEqual(sorted(a.key for a in stats.actions), ['0.txt', '2.txt', '4.txt', '6.txt'])
+        self.assertEqual(stats.skipped, 4)
+        self.assertGreater(active[1], 1)
+
+    async def test_download(self):
+        self.store.put('data/x/1.bin', b'one', time.time() - 7200)
+        self.store.put('data/2.bin', b'two')
+        write(os.path.join(self.root, 'extra.bin'), b'extra')
+        sync = self.make_sync(delete=True)
+        stats = await sync.download('data', self.root)
+        self.assertEqual((stats.downloaded, stats.deleted), (2, 1))
+        with open(os.path.join(self.root, 'x', '1.bin'), 'rb') as f:
+            self.assertEqual(f.read(), b'one')
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'extra.bin')))
+
+        self.store.gets.clear()
+        stats = await sync.download('data', self.root)
+        self.assertEqual((stats.downloaded, stats.skipped), (0, 2))
+        self.assertEqual(self.store.gets, [])
+        self.assertIn('skipped=2', stats.summary())
+
+    async def test_download_unsafe_key(self):
+        directory = os.path.join(self.root, 'dest')
+        for key in ('pre/../escaped.txt', 'pre/a//b.txt', 'pre/./c.txt', 'pre/ok.txt'):
+            self.store.put(key, b'x')
+        stats = await self.make_sync(dry_run=True).download('pre', directory)
+        self.assertEqual([a.key for a in stats.actions], ['pre/ok.txt'])
+        self.assertEqual(sorted(stats.failed),
+                         ['pre/../escaped.txt', 'pre/./c.txt', 'pre/a//b.txt'])
+        stats = await self.make_sync().download('pre', directory)
+        self.assertEqual(stats.downloaded, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'escaped.txt')))
+        # 目录中指向外部的符号链接
+        os.symlink(self.root, os.path.join(directory, 'link'))
+        self.store.put('pre/link/d.txt', b'x')
+        stats = await self.make_sync(dry_run=True).download('pre', directory)
+        self.assertIn('pre/link/d.txt', stats.failed)
+
+    async def test_failure_recorded(self):
+        write(os.path.join(self.root, 'a.txt'), b'a')
+        write(os.path.join(self.root, 'b.txt'), b'b')
+
+        def handler(request):
+            if request.method == 'PUT' and request.url.path.endswith('b.txt'):
+                return httpx.Response(403)
+            return self.store(request)
+        async with AsyncSession(transport=httpx.MockTransport(handler)) as session:
+            stats = await DirectorySync(auth, session).upload(self.root)
+        self.assertEqual(stats.uploaded, 1)
+        self.assertEqual(list(stats.failed), ['b.txt'])
+
+    def test_compare_option(self):
+        with self.assertRaises(ValueError):
+            DirectorySync(auth, self.session, compare='size')